@@ -0,0 +1,198 @@
+"""
+An asyncio interface for running HERA programs, for applications like web services that
+run many programs concurrently and must not block their event loop:
+
+    result = await hera.aio.run_async(source, stdin="5\n", throttle=10000, timeout=2)
+
+Programs are loaded and executed in a pool of worker threads. Each virtual machine has
+its own output and input streams, so that programs do not interfere with one another. A
+program is executed in slices of a fixed number of operations with
+`VirtualMachine.step`, each of which is a separate job in the pool, and its timeout is
+checked between slices. When a run is cancelled or times out, no further slices are
+executed, so the virtual machine stops within one slice instead of running on in the
+background. A semaphore limits the number of programs that run at once, and the others
+wait their turn without occupying a worker.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import asyncio
+import copy
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+from .data import Settings
+from .loader import load_program
+from .optimizer import optimize
+from .runner import STATUS_ERROR, STATUS_TIMED_OUT, flags_to_dict
+from .vm import STEP_BUDGET_EXHAUSTED, VirtualMachine
+
+
+# The default number of operations that a program executes in each slice.
+DEFAULT_QUANTUM = 10000
+
+
+class RunResult(
+    namedtuple(
+        "RunResult",
+        [
+            "status",
+            "registers",
+            "flags",
+            "op_count",
+            "warnings",
+            "stdout",
+            "stderr",
+            "time",
+        ],
+    )
+):
+    """
+    The result of running a program with `run_async`. `status` is one of `STEP_HALTED`
+    and `STEP_THROTTLED` from `hera/vm.py`, `STATUS_TIMED_OUT` or `STATUS_ERROR` from
+    `hera/runner.py`. `registers` and `flags` are None if the program could not be
+    loaded. `time` is the wall time of the run in seconds, not counting the time spent
+    waiting for the semaphore.
+    """
+
+
+class AsyncRunner:
+    """Runs programs in a pool of worker threads, at most `max_concurrency` at once."""
+
+    def __init__(
+        self, max_concurrency: "Optional[int]" = None, *, quantum: int = DEFAULT_QUANTUM
+    ) -> None:
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+
+        self.max_concurrency = max_concurrency
+        self.quantum = quantum
+        self.executor = ThreadPoolExecutor(max_concurrency)
+        # Semaphores belong to an event loop, so the semaphore is created the first
+        # time that the runner is used in each loop.
+        self.loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self.semaphore = None  # type: Optional[asyncio.Semaphore]
+
+    async def run(
+        self,
+        source: str,
+        *,
+        stdin: str = "",
+        throttle=False,
+        timeout: "Optional[float]" = None,
+        settings: "Optional[Settings]" = None
+    ) -> RunResult:
+        """
+        Run the program in `source`, with `stdin` as its standard input, and return its
+        result. The program is stopped after `throttle` operations (unless `throttle` is
+        False) or `timeout` seconds (unless `timeout` is None). If `settings` is
+        provided, the program is run with a copy of it, with `throttle` replacing its
+        own throttle.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        settings = copy.copy(settings) if settings is not None else Settings()
+        settings.color = False
+        settings.throttle = throttle
+        async with self.semaphore:
+            return await self.execute(loop, source, stdin, settings, timeout)
+
+    async def execute(self, loop, source, stdin, settings, timeout) -> RunResult:
+        """Run the program once the semaphore has been acquired."""
+        stdout = StringIO()
+        stderr = StringIO()
+        vm = VirtualMachine(settings, stdout=stdout, stderr=stderr)
+        start = time.monotonic()
+
+        loaded = await loop.run_in_executor(
+            self.executor, start_program, vm, source, stdin
+        )
+        if loaded:
+            status = STEP_BUDGET_EXHAUSTED
+            while status == STEP_BUDGET_EXHAUSTED:
+                if timeout is not None and time.monotonic() - start >= timeout:
+                    status = STATUS_TIMED_OUT
+                    break
+
+                # If the run is cancelled while a slice is executing, the slice runs to
+                # completion in its worker, but no further slices are started.
+                status = await loop.run_in_executor(
+                    self.executor, step_program, vm, self.quantum
+                )
+        else:
+            status = STATUS_ERROR
+
+        return RunResult(
+            status=status,
+            registers=vm.registers.copy() if loaded else None,
+            flags=flags_to_dict(vm) if loaded else None,
+            op_count=vm.op_count,
+            warnings=settings.warning_count + vm.warning_count,
+            stdout=stdout.getvalue(),
+            stderr=stderr.getvalue(),
+            time=time.monotonic() - start,
+        )
+
+    def close(self) -> None:
+        """Shut down the worker threads of the runner."""
+        self.executor.shutdown()
+
+
+def start_program(vm: VirtualMachine, source: str, stdin: str) -> bool:
+    """
+    Load the program and prepare to execute it on the virtual machine. Return False if
+    the program could not be loaded.
+    """
+    try:
+        program = load_program(source, vm.settings, file=vm.stderr)
+    except SystemExit:
+        return False
+
+    if vm.settings.optimize:
+        program = optimize(program, vm.settings, counted=True)
+
+    vm.start(program)
+    vm.feed_input(stdin)
+    vm.close_input()
+    return True
+
+
+def step_program(vm: VirtualMachine, quantum: int) -> str:
+    """Execute a slice of the program, and return its status."""
+    try:
+        return vm.step(quantum)
+    except SystemExit:
+        # Fatal errors during execution exit the interpreter.
+        return STATUS_ERROR
+
+
+# The runner that `run_async` uses, created when it is first called.
+_default_runner = None  # type: Optional[AsyncRunner]
+
+
+async def run_async(
+    source: str,
+    *,
+    stdin: str = "",
+    throttle=False,
+    timeout: "Optional[float]" = None,
+    settings: "Optional[Settings]" = None
+) -> RunResult:
+    """
+    Run a program with a shared `AsyncRunner`, with one worker per CPU. See
+    `AsyncRunner.run` for the meaning of the arguments.
+    """
+    global _default_runner
+
+    if _default_runner is None:
+        _default_runner = AsyncRunner()
+
+    return await _default_runner.run(
+        source, stdin=stdin, throttle=throttle, timeout=timeout, settings=settings
+    )
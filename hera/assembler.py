@@ -9,7 +9,8 @@ Version: March 2019
 """
 import textwrap
 
-from .data import Program, Settings
+from .data import HERAError, Program, Settings
+from .op import disassemble
 
 
 def assemble(program: Program) -> "Tuple[List[bytes], List[bytes]]":
@@ -82,6 +83,27 @@ def assemble_and_print(program: Program, settings: Settings) -> None:
             f.write(data)
 
 
+def disassemble_text(text: str) -> "List[str]":
+    """
+    Disassemble machine code, expressed as newline-separated hex numbers without the
+    "0x" prefix, and return the lines of the HERA program. Lines that cannot be
+    disassembled are replaced by comments.
+    """
+    lines = []
+    for line in text.splitlines():
+        try:
+            v = int(line, base=16)
+        except ValueError:
+            lines.append("// Invalid hex literal: {}".format(line))
+            continue
+
+        try:
+            lines.append(str(disassemble(v)))
+        except HERAError:
+            lines.append("// Unknown instruction: {}".format(line))
+    return lines
+
+
 def bytes_to_hex(b: bytes) -> str:
     """
     Implementation of the standard Python bytes.hex method, which is not available in
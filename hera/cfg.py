@@ -0,0 +1,144 @@
+"""
+Control-flow analysis of preprocessed HERA programs, for the optimizer.
+
+Most jumps in a preprocessed program go through a register, e.g. `BR(label)` turns into
+SETLO(R11, ...), SETHI(R11, ...) and BR(R11). The target of such a jump is known
+statically as long as the SETLO and SETHI immediately precede it and nothing else jumps
+in between them. The targets of all other register jumps, including every RETURN, are
+unknown, and analyses must assume that they may go anywhere.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+from .data import Label, Program
+from .op import (
+    BR,
+    BRR,
+    CALL,
+    RETURN,
+    SETHI,
+    SETLO,
+    AbstractOperation,
+    FusedOperation,
+    RegisterBranch,
+    RelativeBranch,
+)
+
+
+def successors(program: Program) -> "List[Optional[List[int]]]":
+    """
+    Return the list of the successors of each operation in the program, i.e. of the
+    instruction numbers at which execution may continue after it. The successors of an
+    operation that may jump to an unknown target are None.
+
+    The instruction number `len(program.code)` stands for the end of the program, and
+    is also the successor of operations that halt the machine.
+    """
+    code = program.code
+    n = len(code)
+    entries = entry_points(program)
+    ret = []  # type: List[Optional[List[int]]]
+    for pc, op in enumerate(code):
+        if isinstance(op, RelativeBranch):
+            offset = op.args[0]
+            # BRR(0) is what HALT is preprocessed into.
+            target = pc + offset if offset != 0 and 0 <= pc + offset < n else n
+            ret.append([target] if isinstance(op, BRR) else [target, pc + 1])
+        elif isinstance(op, RegisterBranch):
+            target = constant_register(code, pc, op.args[0], entries)
+            if target is None:
+                ret.append(None)
+            else:
+                target = min(target, n)
+                ret.append([target] if isinstance(op, BR) else [target, pc + 1])
+        elif isinstance(op, CALL):
+            # Execution continues after the CALL only once the function has returned,
+            # which is accounted for by the successors of its RETURN.
+            target = constant_register(code, pc, op.args[1], entries)
+            ret.append(None if target is None else [min(target, n)])
+        elif op.name in ("RETURN", "SWI", "RTI", "__EVAL"):
+            ret.append(None)
+        else:
+            ret.append([pc + 1])
+    return ret
+
+
+def may_jump(op: AbstractOperation) -> bool:
+    """
+    Return True if `op` may jump somewhere other than the next operation, or halt the
+    machine.
+    """
+    ops = op.parts if isinstance(op, FusedOperation) else [op]
+    return any(
+        isinstance(op, (CALL, RETURN, RegisterBranch, RelativeBranch))
+        or op.name == "__EVAL"
+        for op in ops
+    )
+
+
+def straight_line_lengths(code: "List[AbstractOperation]") -> "List[int]":
+    """
+    Return the list of the number of operations that execute in a row starting at each
+    instruction number, up to and including the first one that may jump. Once the
+    operation at `pc` starts executing, the next `lengths[pc]` operations are certain to
+    execute, unless one of them raises an error.
+    """
+    lengths = [0] * len(code)
+    length = 0
+    for pc in reversed(range(len(code))):
+        length = 1 if may_jump(code[pc]) else length + 1
+        lengths[pc] = length
+    return lengths
+
+
+def entry_points(program: Program) -> "Set[int]":
+    """
+    Return a set of instruction numbers that includes every instruction that execution
+    may jump to, assuming that jumps with unknown targets land on a label, just after a
+    CALL, or at an address that the program loads into a register with SETLO and SETHI.
+    """
+    entries = {0}
+    for value in program.symbol_table.values():
+        if isinstance(value, Label):
+            entries.add(value)
+
+    code = program.code
+    for pc, op in enumerate(code):
+        if isinstance(op, RelativeBranch):
+            entries.add(pc + op.args[0])
+        elif isinstance(op, CALL):
+            entries.add(pc + 1)
+        elif isinstance(op, SETHI) and pc > 0:
+            setlo = code[pc - 1]
+            if isinstance(setlo, SETLO) and setlo.args[0] == op.args[0]:
+                entries.add(set_value(setlo, op))
+    return entries
+
+
+def constant_register(
+    code: "List[AbstractOperation]", pc: int, register: int, entries: "Set[int]"
+) -> "Optional[int]":
+    """
+    Return the value of the register just before the operation at `pc` executes, if it
+    is set by a SETLO and SETHI immediately before, or None otherwise. `entries` must
+    include every instruction number that execution may jump to.
+    """
+    if pc < 2 or pc - 1 in entries or pc in entries:
+        return None
+
+    setlo = code[pc - 2]
+    sethi = code[pc - 1]
+    if (
+        isinstance(setlo, SETLO)
+        and isinstance(sethi, SETHI)
+        and setlo.args[0] == register
+        and sethi.args[0] == register
+    ):
+        return set_value(setlo, sethi)
+    else:
+        return None
+
+
+def set_value(setlo: SETLO, sethi: SETHI) -> int:
+    """Return the value that a SETLO followed by a SETHI stores in their register."""
+    return (sethi.args[1] << 8) + (setlo.args[1] & 0xFF)
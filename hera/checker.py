@@ -11,10 +11,12 @@ module contains the code for program-wide type-checking.
 Author:  Ian Fisher (iafisher@fastmail.com)
 Version: Feburary 2019
 """
+from array import array
 from contextlib import suppress
 
 from .data import (
     Constant,
+    DataImage,
     DataLabel,
     DebugInfo,
     Label,
@@ -34,6 +36,7 @@ from .op import (
     RelativeBranch,
 )
 from .utils import out_of_range
+from .vm import VirtualMachine
 
 
 def check(
@@ -73,7 +76,27 @@ def check(
 
             code.append(op)
 
-    return (Program(data, code, symbol_table, debug_info), messages)
+    data_image = build_data_image(data, settings)
+    return (Program(data, code, symbol_table, debug_info, data_image), messages)
+
+
+def build_data_image(
+    data: "List[AbstractOperation]", settings: Settings
+) -> DataImage:
+    """
+    Execute the data statements once, and return the resulting contents of the data
+    segment, so that the virtual machine can copy them into memory in a single step
+    instead of executing the statements on every run.
+    """
+    # The default list memory only extends as far as the last cell that was written to.
+    scratch_settings = Settings()
+    scratch_settings.data_start = settings.data_start
+    vm = VirtualMachine(scratch_settings)
+    for data_op in data:
+        data_op.execute(vm)
+
+    words = array("H", vm.memory[settings.data_start :])
+    return DataImage(settings.data_start, words, vm.dc)
 
 
 def typecheck(
@@ -111,6 +134,8 @@ def typecheck(
             messages.err(
                 "debugging instructions disallowed with --no-debug-ops flag", loc=op.loc
             )
+        elif not settings.allow_eval and op.name == "__EVAL":
+            messages.err("__eval is disallowed without --allow-eval flag", loc=op.loc)
 
         # Add constants to the symbol table as they are encountered, so that each
         # constant is not in scope until after its declaration.
@@ -0,0 +1,210 @@
+"""
+The ahead-of-time HERA compiler.
+
+`hera compile` translates a HERA program into a standalone Python module, which
+executes the program with the same output and final machine state as
+`VirtualMachine.run`, but without the cost of parsing, type-checking and dispatching on
+each operation at run time.
+
+The code of each basic block is generated exactly as by the JIT (see `hera/jit.py`),
+except that all blocks are generated up front. Every operation also gets a
+single-operation function of its own, for jumps into the middle of a block and for
+`--throttle`.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+from .data import HERAError, Label, Program, Settings
+from .jit import BlockBuilder, real_op
+from .op import RelativeBranch
+from .vm import VirtualMachine
+
+
+HEADER = '''\
+"""
+Compiled by {version} from {path}.
+
+Run this module to execute the program and print the state of the virtual machine,
+or call `run(vm)` to execute the program on a `hera.vm.VirtualMachine` object.
+
+This file was generated automatically and should not be edited.
+"""
+import sys
+
+from hera import stdlib
+from hera.data import Location, Settings
+from hera.op import RETURN, compile_eval, eval_namespace
+from hera.utils import format_int, from_u16, to_u32
+from hera.vm import HALTED_PC, VirtualMachine
+
+
+check_return_address = RETURN.check_return_address
+'''
+
+FOOTER = '''\
+def run(vm):
+    """
+    Execute the program on the virtual machine, resetting the machine's state
+    beforehand. Equivalent to `vm.run(program)` for the original program.
+    """
+    vm.reset()
+    if DATA:
+        vm.store_memory_block(DATA_START, DATA)
+    vm.dc = DC
+
+    pc = 0
+    throttle = vm.settings.throttle
+    if throttle is False:
+        while pc < N:
+            pc = BLOCKS[pc](vm)
+    else:
+        op_count = vm.op_count
+        while pc < N and op_count < throttle:
+            length = LENGTHS[pc]
+            if op_count + length <= throttle:
+                pc = BLOCKS[pc](vm)
+                op_count += length
+            else:
+                pc = STEPS[pc](vm)
+                op_count += 1
+        vm.op_count = op_count
+
+    if not vm.halted:
+        vm.pc = pc
+
+
+if __name__ == "__main__":
+    from hera.main import dump_state
+
+    settings = Settings()
+    settings.color = sys.stderr.isatty()
+    settings.data_start = DATA_START
+    vm = VirtualMachine(settings)
+    run(vm)
+    settings.warning_count += vm.warning_count
+    dump_state(vm, settings)
+'''
+
+
+def compile_program(program: Program, settings: Settings, *, version: str) -> str:
+    """
+    Compile the program into the source code of a Python module. `version` is the
+    version string of hera-py, for the module's docstring.
+
+    The module is specific to the `data_start` setting that it was compiled with.
+    """
+    code = program.code
+    blocks = {}  # type: Dict[int, BlockBuilder]
+    leaders = find_leaders(program)
+    queue = sorted(leaders, reverse=True)
+    while queue:
+        start = queue.pop()
+        if start in blocks or start >= len(code):
+            continue
+
+        builder = build(code, settings, start, boundaries=leaders)
+        blocks[start] = builder
+        # Execution may continue from the end of the block, so the next operation needs
+        # a block of its own.
+        if builder.pc not in leaders:
+            leaders.add(builder.pc)
+            queue.append(builder.pc)
+
+    steps = [
+        build(code, settings, pc, max_length=1, name="step_{}".format(pc))
+        for pc in range(len(code))
+    ]
+
+    out = [HEADER.format(version=version, path=settings.path)]
+    out.extend(generate_locations(code))
+
+    vm = VirtualMachine(settings)
+    vm.load_data(program)
+
+    out.append("DATA_START = {}".format(settings.data_start))
+    out.append("DATA = {}".format(vm.memory[settings.data_start :]))
+    out.append("DC = {}".format(vm.dc))
+    out.append("N = {}\n\n".format(len(code)))
+
+    for start in sorted(blocks):
+        out.append(blocks[start].source() + "\n")
+    for step in steps:
+        out.append(step.source() + "\n")
+
+    out.append("BLOCKS = [")
+    for pc, step in enumerate(steps):
+        out.append("    {},".format(blocks[pc].name if pc in blocks else step.name))
+    out.append("]")
+    out.append("STEPS = [")
+    out.extend("    {},".format(step.name) for step in steps)
+    out.append("]")
+    out.append("LENGTHS = [")
+    for pc in range(len(code)):
+        out.append("    {},".format(blocks[pc].length if pc in blocks else 1))
+    out.append("]\n\n")
+
+    out.append(FOOTER)
+    return "\n".join(out)
+
+
+def find_leaders(program: Program) -> "Set[int]":
+    """
+    Return the set of the instruction numbers at which a basic block of the program may
+    begin, as far as can be determined statically.
+    """
+    leaders = {0}
+    for value in program.symbol_table.values():
+        if isinstance(value, Label):
+            leaders.add(value)
+
+    for pc, op in enumerate(program.code):
+        op = real_op(op)
+        if isinstance(op, RelativeBranch):
+            leaders.add(pc + op.args[0])
+
+    return leaders
+
+
+def build(
+    code: "List[AbstractOperation]", settings: Settings, start: int, **kwargs
+) -> BlockBuilder:
+    """
+    Generate the source of the block that begins at `start`. Keyword arguments are
+    passed on to `BlockBuilder`.
+    """
+    builder = BlockBuilder(code, settings, start, **kwargs)
+    if not builder.build():
+        raise HERAError("cannot compile {}".format(code[start]))
+    return builder
+
+
+def generate_locations(code: "List[AbstractOperation]") -> "List[str]":
+    """
+    Generate the definition of the `LOCS` list, which holds the location of each
+    operation in the program, for warning and error messages.
+    """
+    out = []
+    files = {}  # type: Dict[int, str]
+    locs = []
+    for op in code:
+        loc = real_op(op).loc
+        if loc is None:
+            locs.append("None")
+            continue
+
+        # Each file's lines are defined once and shared by all of its locations.
+        key = id(loc.file_lines)
+        if key not in files:
+            files[key] = "FILE_{}".format(len(files))
+            out.append("{} = {!r}".format(files[key], list(loc.file_lines)))
+
+        locs.append(
+            "Location({}, {}, {!r}, {})".format(
+                loc.line, loc.column, str(loc.path), files[key]
+            )
+        )
+
+    out.append("LOCS = [")
+    out.extend("    {},".format(loc) for loc in locs)
+    out.append("]")
+    return out
@@ -14,11 +14,34 @@ VOLUME_QUIET = "quiet"
 VOLUME_NORMAL = "normal"
 VOLUME_VERBOSE = "verbose"
 
+# Execution engines for the interpreter. The default engine executes each operation
+# object directly; the closure engine compiles each operation into a specialized Python
+# closure before the program starts; the JIT engine compiles each basic block into a
+# Python function the first time that it is run; and the tiered engine executes each
+# operation directly until a block has been run often enough to be worth compiling.
+ENGINE_INTERPRETER = "interpreter"
+ENGINE_CLOSURE = "closure"
+ENGINE_JIT = "jit"
+ENGINE_TIERED = "tiered"
+ENGINES = (ENGINE_INTERPRETER, ENGINE_CLOSURE, ENGINE_JIT, ENGINE_TIERED)
+
+# Memory backends for the virtual machine. The list backend starts off small and grows
+# as necessary; the array backend preallocates all 2**16 words in an `array.array` of
+# unsigned 16-bit integers, which takes less space and is faster to copy; and the paged
+# backend shares pages of memory between copies of the machine until they are written
+# (see `hera/memory.py`).
+MEMORY_LIST = "list"
+MEMORY_ARRAY = "array"
+MEMORY_PAGED = "paged"
+MEMORIES = (MEMORY_LIST, MEMORY_ARRAY, MEMORY_PAGED)
+
 
 class Settings:
     """Global settings of the interpreter."""
 
     def __init__(self, *, color=True, mode="", volume=VOLUME_NORMAL):
+        # Is the __eval operation, which executes arbitrary Python code, allowed?
+        self.allow_eval = True
         # Are SWI and RTI operations allowed?
         self.allow_interrupts = False
         # Should the assembler print out code?
@@ -29,25 +52,59 @@ class Settings:
         self.data = False
         # Where is the start of the data segment?
         self.data_start = DEFAULT_DATA_START
+        # Should the interpreter stop programs that are stuck in an infinite loop?
+        self.detect_loops = False
+        # Which execution engine should the virtual machine use?
+        self.engine = ENGINE_INTERPRETER
         # How should the registers of the virtual machine be initialized?
         self.init = []
+        # Which directory of input files should the program be run on? False to run it
+        # once on standard input.
+        self.inputs = False
+        # How many worker processes should run the program on its inputs? None for one
+        # per CPU.
+        self.jobs = None  # type: Optional[int]
+        # Should the interpreter compute the flags of arithmetic operations only when
+        # they are read? Only applies to the default engine.
+        self.lazy_flags = False
+        # Which memory backend should the virtual machine use?
+        self.memory = MEMORY_LIST
         # What is the program's mode (e.g., "debug", "assemble")?
         self.mode = mode
         # Are debugging operations allowed?
         self.no_debug_ops = False
         # Should the preprocessor obfuscate the given code?
         self.obfuscate = False
+        # Should the program be optimized after preprocessing? Only applies when the
+        # program is executed.
+        self.optimize = False
+        # Where should the compiler write its output? False for the default path.
+        self.output = False
         # What path was the program invoked on?
         self.path = None
+        # What paths was hera-py invoked on? Only batch mode takes more than one.
+        self.paths = []  # type: List[str]
+        # Where should the tiered engine load and save its profile of hot blocks? False
+        # for no profile.
+        self.profile_path = False
+        # Which Unix socket should the server listen on? False for standard input and
+        # output.
+        self.socket = False
         # Should the assembler print to standard output?
         self.stdout = False
         # Should the interpreter quit after a certain number of operations have been
         # executed?
         self.throttle = False
+        # Should batch and server mode stop programs that run for more than a certain
+        # number of seconds?
+        self.timeout = False
         # Should warnings be issued for zero-prefixed octal numbers?
         self.warn_octal_on = True
         # Should warnings be issued for un-idiomatic use of the RETURN operation?
         self.warn_return_on = True
+        # How many calls should the virtual machine remember, to check the addresses
+        # that RETURN operations return to?
+        self.call_stack_depth = 2 ** 12
         # How loud should the program be?
         self.volume = volume
         # How many warnings have been issued? This isn't a setting, strictly speaking,
@@ -75,9 +132,17 @@ class Location(namedtuple("Location", ["line", "column", "path", "file_lines"]))
 
 # The data structure that represents a HERA program. `data` and `code` are each a list
 # of AbstractOperations. `symbol_table` and `debug_info` are for the use of the
-# debugger.
-Program = namedtuple("Program", ["data", "code", "symbol_table", "debug_info"])
+# debugger. `data_image` is the DataImage that results from executing `data`, or None
+# if it has not been computed.
+Program = namedtuple(
+    "Program", ["data", "code", "symbol_table", "debug_info", "data_image"]
+)
+Program.__new__.__defaults__ = (None,)
 DebugInfo = namedtuple("DebugInfo", ["labels"])
+# The initial contents of a program's data segment. `words` is an array of the values of
+# the memory cells starting at address `start`, and `dc` is the value of the data
+# counter after all the data statements have been executed.
+DataImage = namedtuple("DataImage", ["start", "words", "dc"])
 
 
 class Token:
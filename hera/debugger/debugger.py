@@ -44,7 +44,9 @@ class Debugger:
         # A map from instruction numbers (i.e., possible values of the program counter)
         # to human-readable line numbers.
         self.breakpoints = {}  # type: Dict[int, str]
-        self.vm = VirtualMachine()
+        vm_settings = Settings()
+        vm_settings.memory = settings.memory
+        self.vm = VirtualMachine(vm_settings)
         # How many CALLs without RETURNs?
         self.calls = 0
         # Back-up of the debugger's state, to implement the "undo" command. Implicitly
@@ -54,8 +56,7 @@ class Debugger:
 
         # In the future, step-by-step execution of data operations may be supported, but
         # for now they're just executed before interactive debugging starts.
-        for data_op in self.program.data:
-            data_op.execute(self.vm)
+        self.vm.load_data(self.program)
 
     def save(self) -> None:
         self.old = copy.copy(self)
@@ -107,6 +108,7 @@ class Debugger:
     def reset(self) -> None:
         """Reset the internal state of the debugger."""
         self.vm.reset()
+        self.vm.load_data(self.program)
 
     def op(self, index=None) -> AbstractOperation:
         """
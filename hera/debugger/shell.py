@@ -768,7 +768,7 @@ class Shell:
         """
         restart
           Restart execution of the program from the beginning. All registers and
-          memory cells are reset.
+          memory cells are reset, and the data segment is reloaded.
         """
         if len(args) != 0:
             print("restart takes no arguments.")
@@ -872,6 +872,12 @@ class Shell:
         vm = self.debugger.vm
         if vm.expected_returns:
             print("Call stack (last call at bottom)")
+            if vm.expected_returns.forgotten:
+                print(
+                    "  ({} earlier calls not shown)".format(
+                        vm.expected_returns.forgotten
+                    )
+                )
             for call_address, return_address in vm.expected_returns:
                 fname = self.debugger.find_label(call_address)
                 floc = self.debugger.instruction_number_to_location(
@@ -0,0 +1,177 @@
+"""
+Infinite-loop detection, enabled with --detect-loops.
+
+The detector executes a program like the default interpreter, but every time that the
+program counter reaches the target of a backward branch (the top of a loop), it compares
+the state of the machine with a saved state. If the two are identical, the program must
+be in an infinite loop, since execution is deterministic, and the detector stops it
+instead of letting it run until it is throttled.
+
+States are saved using Brent's cycle-detection algorithm: the saved state is replaced
+after 1, 2, 4, 8, ... visits to loop tops, so that a cycle of any length is found after
+a bounded number of extra iterations while only one state is kept at a time. Saving a
+state does not copy memory. Instead, the detector keeps the old value of each memory
+cell that has been written since the state was saved, and memory is compared only on
+those cells, and only if the registers and flags already match.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import sys
+
+from .cfg import successors
+from .data import Label, Program, Settings
+from .jit import real_op
+from .op import RegisterBranch, RelativeBranch
+from .vm import VirtualMachine
+
+
+class LoopDetector:
+    """The infinite-loop detector for a single program."""
+
+    def __init__(self, program: Program, settings: Settings) -> None:
+        self.code = program.code
+        self.settings = settings
+        self.symbol_table = program.symbol_table
+        # Whether each instruction is the target of a backward branch.
+        self.loop_tops = [False] * len(self.code)
+        for pc in loop_tops(program):
+            self.loop_tops[pc] = True
+
+        # The state of the machine the last time that it was saved (see `save`).
+        self.saved = None  # type: Optional[Tuple[Any, ...]]
+        # The old values of the memory cells written since the state was saved.
+        self.old_memory = {}  # type: Dict[int, int]
+        # The number of lines read from standard input. Input that has been read is not
+        # part of the machine's state, but the rest of the input may differ.
+        self.lines_read = 0
+        self.visits = 0
+        self.limit = 1
+
+    def run(self, vm: VirtualMachine) -> None:
+        """Execute the program on the virtual machine, starting at its current state."""
+        # The hooks are instance attributes, so they shadow the machine's methods only
+        # for the duration of the run.
+        vm.store_memory = self.store_memory_hook(vm)
+        vm.readline = self.readline_hook(vm)
+        try:
+            self.run_detecting(vm)
+        finally:
+            del vm.store_memory
+            del vm.readline
+
+    def run_detecting(self, vm: VirtualMachine) -> None:
+        code = self.code
+        n = len(code)
+        loop_tops = self.loop_tops
+        throttle = self.settings.throttle
+        if throttle is False:
+            throttle = float("inf")
+
+        while not vm.halted and vm.pc < n and vm.op_count < throttle:
+            pc = vm.pc
+            if loop_tops[pc] and self.visit(vm):
+                # An infinite loop is a fatal error, like the other errors that stop a
+                # program before it halts.
+                self.report(vm, pc)
+                sys.exit(3)
+
+            op = code[pc]
+            vm.location = op.loc
+            # Operations are counted before they execute, like in
+            # `VirtualMachine.run_throttled`.
+            if self.settings.throttle is not False:
+                vm.op_count += 1
+            op.execute(vm)
+
+    def visit(self, vm: VirtualMachine) -> bool:
+        """
+        Called when execution reaches the top of a loop. Return True if the machine is
+        in the same state as when it was last saved.
+        """
+        if self.saved is not None and self.same_state(vm):
+            return True
+
+        self.visits += 1
+        if self.visits == self.limit:
+            self.save(vm)
+            self.visits = 0
+            self.limit *= 2
+
+        return False
+
+    def save(self, vm: VirtualMachine) -> None:
+        """Save the state of the machine."""
+        self.saved = self.state(vm)
+        self.old_memory = {}
+
+    def same_state(self, vm: VirtualMachine) -> bool:
+        """Return True if the machine is in the same state as when it was saved."""
+        # The program counter and the registers are the most likely to differ.
+        saved = self.saved
+        if vm.pc != saved[0] or vm.registers != saved[1] or self.state(vm) != saved:
+            return False
+
+        return all(vm.memory[a] == v for a, v in self.old_memory.items())
+
+    def state(self, vm: VirtualMachine) -> "Tuple[Any, ...]":
+        """Return the state of the machine, not including memory."""
+        return (
+            vm.pc,
+            vm.registers.copy(),
+            vm.flags,
+            vm.dc,
+            vm.input_buffer,
+            vm.input_pos,
+            self.lines_read,
+            vm.expected_returns.copy(),
+        )
+
+    def store_memory_hook(self, vm: VirtualMachine) -> "Callable[[int, int], None]":
+        """
+        Return a replacement for `vm.store_memory` that records the old value of each
+        memory cell that is written to.
+        """
+        store_memory = VirtualMachine.store_memory
+        load_memory = vm.load_memory
+
+        def hook(address, value):
+            address &= 0xFFFF
+            if address not in self.old_memory:
+                self.old_memory[address] = load_memory(address)
+            store_memory(vm, address, value)
+
+        return hook
+
+    def readline_hook(self, vm: VirtualMachine) -> "Callable[[], None]":
+        """Return a replacement for `vm.readline` that counts the lines read."""
+        readline = VirtualMachine.readline
+
+        def hook():
+            self.lines_read += 1
+            readline(vm)
+
+        return hook
+
+    def report(self, vm: VirtualMachine, pc: int) -> None:
+        """Print the error message for an infinite loop at `pc`."""
+        for symbol, value in self.symbol_table.items():
+            if value == pc and isinstance(value, Label):
+                where = "`{}`".format(symbol)
+                break
+        else:
+            where = "instruction {}".format(pc)
+
+        vm.error("infinite loop detected at {}".format(where), self.code[pc].loc)
+
+
+def loop_tops(program: Program) -> "Set[int]":
+    """Return the set of instruction numbers that are targets of backward branches."""
+    # Superinstructions and other optimized operations hide the branches behind them.
+    code = [real_op(op) for op in program.code]
+    tops = set()
+    for pc, targets in enumerate(successors(program._replace(code=code))):
+        op = code[pc]
+        if targets is not None and isinstance(op, (RegisterBranch, RelativeBranch)):
+            tops.update(target for target in targets if target <= pc)
+    return tops
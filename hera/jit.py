@@ -0,0 +1,694 @@
+"""
+The basic-block compiler ("JIT") execution engine.
+
+The JIT splits a preprocessed program into basic blocks, i.e. straight-line runs of
+operations that end at a branch, and generates the source of a Python function for
+each block the first time that it is entered. Inside the generated function, registers
+and flags live in local variables, and are only written back to the virtual machine when
+the block exits, so that the dispatch loop in `JIT.run` runs once per block instead of
+once per operation.
+
+Operations that the JIT does not know how to generate code for (e.g., debugging
+operations) are executed on their own, using the closures from the closure engine. See
+the docstring of `AbstractOperation.compile` in `hera/op.py`.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import re
+import sys
+
+from . import stdlib
+from .data import MEMORY_ARRAY, MEMORY_PAGED, Program, Settings
+from .memory import PAGE_BITS, PAGE_MASK
+from .op import (
+    COUNTED_LOOP,
+    RETURN,
+    AbstractOperation,
+    FlaglessOperation,
+    FusedOperation,
+    RegisterBranch,
+    RelativeBranch,
+    compile_eval,
+    eval_namespace,
+)
+from .utils import format_int, from_u16, to_u32
+from .vm import (
+    FLAG_CARRY,
+    FLAG_CARRY_BLOCK,
+    FLAG_OVERFLOW,
+    FLAG_SIGN,
+    FLAG_ZERO,
+    HALTED_PC,
+    VirtualMachine,
+)
+
+
+# The maximum number of operations in a single block. Long stretches of straight-line
+# code are split up so that the generated functions do not get too big.
+MAX_BLOCK_LENGTH = 256
+
+# Map from the local variable names of the flags in generated code to the corresponding
+# bits of the virtual machine's `flags` attribute.
+FLAG_NAMES = {
+    "fs": FLAG_SIGN,
+    "fz": FLAG_ZERO,
+    "fv": FLAG_OVERFLOW,
+    "fc": FLAG_CARRY,
+    "fcb": FLAG_CARRY_BLOCK,
+}
+
+# Operations that may read or modify any part of the virtual machine's state, and so
+# must be compiled into a block of their own.
+BARRIERS = ("__EVAL", "__INTRINSIC")
+
+# The branching condition of each branch operation, as a Python expression over the flag
+# variables. These mirror the `should` methods of the branch classes in `hera/op.py`.
+CONDITIONS = {
+    "BR": "True",
+    "BL": "fs ^ fv",
+    "BGE": "not (fs ^ fv)",
+    "BLE": "(fs ^ fv) or fz",
+    "BG": "not (fs ^ fv) and not fz",
+    "BULE": "not fc or fz",
+    "BUG": "fc and not fz",
+    "BZ": "fz",
+    "BNZ": "not fz",
+    "BC": "fc",
+    "BNC": "not fc",
+    "BS": "fs",
+    "BNS": "not fs",
+    "BV": "fv",
+    "BNV": "not fv",
+}
+
+
+class JIT:
+    """
+    The JIT for a single program. Blocks are compiled lazily and cached, so a `JIT`
+    object may be used to run the same program any number of times.
+    """
+
+    def __init__(self, program: Program, settings: Settings) -> None:
+        self.code = program.code
+        self.settings = settings
+        # Map from the starting instruction number of each block that has been compiled
+        # so far to the compiled function.
+        self.blocks = {}  # type: Dict[int, Callable[[VirtualMachine], int]]
+        # Map from starting instruction numbers to the number of operations that the
+        # block executes.
+        self.lengths = {}  # type: Dict[int, int]
+        # Single-operation closures, for when the throttle does not leave enough budget
+        # to run an entire block.
+        self.closures = {}  # type: Dict[int, Callable[[VirtualMachine], int]]
+        # The global namespace of the generated functions.
+        self.namespace = make_namespace([real_op(op).loc for op in self.code])
+
+    def run(self, vm: VirtualMachine) -> None:
+        """Execute the program on the virtual machine, starting at its current state."""
+        n = len(self.code)
+        blocks = self.blocks
+        pc = vm.pc
+        if self.settings.throttle is False:
+            while pc < n:
+                try:
+                    block = blocks[pc]
+                except KeyError:
+                    block = self.compile_block(pc)
+                pc = block(vm)
+        else:
+            throttle = self.settings.throttle
+            lengths = self.lengths
+            op_count = vm.op_count
+            while pc < n and op_count < throttle:
+                try:
+                    block = blocks[pc]
+                except KeyError:
+                    block = self.compile_block(pc)
+
+                length = lengths[pc]
+                if op_count + length <= throttle:
+                    pc = block(vm)
+                    op_count += length
+                else:
+                    pc = self.closure(pc)(vm)
+                    op_count += 1
+            vm.op_count = op_count
+
+        if not vm.halted:
+            vm.pc = pc
+
+    def closure(self, pc: int) -> "Callable[[VirtualMachine], int]":
+        """Return the single-operation closure for the operation at `pc`."""
+        try:
+            return self.closures[pc]
+        except KeyError:
+            closure = self.closures[pc] = real_op(self.code[pc]).compile(pc)
+            return closure
+
+    def compile_block(self, start: int) -> "Callable[[VirtualMachine], int]":
+        """Compile the block that begins at `start`, and cache it."""
+        builder = BlockBuilder(self.code, self.settings, start)
+        if builder.build():
+            block = builder.function(self.namespace)
+        else:
+            # The first operation of the block cannot be compiled to Python source, so
+            # it gets a block of its own.
+            block = self.closure(start)
+
+        self.blocks[start] = block
+        self.lengths[start] = max(builder.length, 1)
+        return block
+
+
+def make_namespace(locs: "List[Location]") -> "Dict[str, Any]":
+    """
+    Return the global namespace for generated functions. `locs` is the list of the
+    locations of each operation in the program, for warning and error messages.
+    """
+    return {
+        "HALTED_PC": HALTED_PC,
+        "LOCS": locs,
+        "check_return_address": RETURN.check_return_address,
+        "compile_eval": compile_eval,
+        "eval_namespace": eval_namespace,
+        "format_int": format_int,
+        "from_u16": from_u16,
+        "stdlib": stdlib,
+        "sys": sys,
+        "to_u32": to_u32,
+    }
+
+
+def real_op(op: AbstractOperation) -> AbstractOperation:
+    """
+    Return the operation that the JIT should compile in place of `op`. Superinstructions
+    are replaced by the first operation in their sequence, since the rest of the
+    sequence follows them in the code anyway. Flag-free variants are replaced by the
+    original operation, since setting flags that are never read is harmless, and so are
+    the heads of counted loops, which are just executed normally.
+    """
+    if isinstance(op, FusedOperation):
+        return op.parts[0]
+    elif isinstance(op, FlaglessOperation):
+        return op.op
+    elif isinstance(op, COUNTED_LOOP):
+        return real_op(op.op)
+    else:
+        return op
+
+
+class BlockBuilder:
+    """
+    A helper class to generate the Python source of a single block.
+
+    The source of an operation is generated by the `emit_<NAME>` method of this class,
+    where <NAME> is the operation's name, or by `emit_branch` for branch operations. An
+    emitter method should read registers and flags through `reg` and `flag` and write
+    them through `set_reg` and `set_flag`, so that the builder knows which values to
+    load at the start of the block and which to write back at the end. Emitters for
+    operations that end the block should call `exit`.
+
+    The block ends after `max_length` operations, or just before any instruction number
+    in `boundaries`, if it has not ended already.
+    """
+
+    def __init__(
+        self,
+        code: "List[AbstractOperation]",
+        settings: Settings,
+        start: int,
+        *,
+        max_length: int = MAX_BLOCK_LENGTH,
+        boundaries: "Container[int]" = (),
+        name: "Optional[str]" = None
+    ) -> None:
+        self.code = code
+        self.settings = settings
+        self.start = start
+        self.max_length = max_length
+        self.boundaries = boundaries
+        self.name = name or "block_{}".format(start)
+        self.length = 0
+        self.body = []  # type: List[str]
+        self.exit_lines = ["return {}".format(start)]
+        self.registers = set()  # type: Set[int]
+        self.dirty_registers = set()  # type: Set[int]
+        self.flags = set()  # type: Set[str]
+        self.dirty_flags = set()  # type: Set[str]
+        self.uses_memory = False
+        self.pc = start
+        self.finished = False
+
+    def build(self) -> bool:
+        """
+        Generate the body of the block. Return False if not even the first operation of
+        the block could be compiled.
+        """
+        while not self.finished and self.pc < len(self.code):
+            if self.length > 0 and self.pc in self.boundaries:
+                break
+
+            op = real_op(self.code[self.pc])
+            emitter = self.get_emitter(op)
+            if emitter is None or (self.length > 0 and op.name in BARRIERS):
+                break
+
+            self.body.append("# {}: {}".format(self.pc, op))
+            emitter(op)
+            self.length += 1
+            self.pc += 1
+
+            if self.length >= self.max_length:
+                break
+
+        if not self.finished:
+            self.exit("{}".format(self.pc))
+
+        return self.length > 0
+
+    def get_emitter(self, op):
+        if isinstance(op, (RegisterBranch, RelativeBranch)) and op.name != "BRR":
+            return self.emit_branch
+        else:
+            return getattr(self, "emit_" + op.name, None)
+
+    def source(self) -> str:
+        """Return the complete source of the block's function."""
+        lines = ["def {}(vm):".format(self.name)]
+        lines.append("    R = vm.registers")
+        if self.uses_memory:
+            lines.append("    M = vm.memory")
+        for i in sorted(self.registers):
+            lines.append("    r{0} = R[{0}]".format(i))
+        for f in sorted(self.flags):
+            lines.append("    {} = bool(vm.flags & {})".format(f, FLAG_NAMES[f]))
+        lines.extend("    " + line for line in self.body)
+        for line in self.write_back():
+            lines.append("    " + line)
+        lines.extend("    " + line for line in self.exit_lines)
+        return "\n".join(lines) + "\n"
+
+    def function(
+        self, namespace: "Dict[str, Any]"
+    ) -> "Callable[[VirtualMachine], int]":
+        """
+        Compile the source of the block into a Python function, with `namespace` (see
+        `make_namespace`) as its global namespace.
+        """
+        filename = "<hera-jit {}>".format(self.name)
+        exec(compile(self.source(), filename, "exec"), namespace)
+        return namespace[self.name]
+
+    def write_back(self) -> "List[str]":
+        lines = []
+        for i in sorted(self.dirty_registers):
+            lines.append("R[{0}] = r{0}".format(i))
+        if self.dirty_flags:
+            # All the modified flags are written back to the virtual machine at once.
+            keep = 0b11111
+            terms = []
+            for f in sorted(self.dirty_flags):
+                keep &= ~FLAG_NAMES[f]
+                terms.append("({} if {} else 0)".format(FLAG_NAMES[f], f))
+            lines.append(
+                "vm.flags = vm.flags & {} | {}".format(keep, " | ".join(terms))
+            )
+        return lines
+
+    def emit(self, line: str) -> None:
+        self.body.append(line)
+
+    def exit(self, *lines: str) -> None:
+        """
+        End the block. The last line must be an expression for the next value of the
+        program counter, or a complete `return` statement.
+        """
+        *lines, last = lines
+        if not last.startswith("return"):
+            last = "return " + last
+        self.exit_lines = list(lines) + [last]
+        self.finished = True
+
+    def loc(self) -> str:
+        """Return an expression for the location of the current operation."""
+        return "LOCS[{}]".format(self.pc)
+
+    def reg(self, i: int) -> str:
+        """Return an expression for the value of register `i`."""
+        if i == 0:
+            return "0"
+        else:
+            self.registers.add(i)
+            return "r{}".format(i)
+
+    def set_reg(self, i: int, expr: str) -> None:
+        """Assign the expression to register `i`."""
+        if i == 0:
+            return
+
+        self.registers.add(i)
+        self.dirty_registers.add(i)
+        self.emit("r{} = {}".format(i, expr))
+        if i == 15:
+            # Mirror the stack overflow check in `VirtualMachine.store_register`.
+            self.emit(
+                "if r15 >= {} and not vm.warned_for_overflow:".format(
+                    self.settings.data_start
+                )
+            )
+            self.emit("    vm.location = {}".format(self.loc()))
+            self.emit("    vm.store_register(15, r15)")
+
+    def flag(self, f: str) -> str:
+        """Return the name of the local variable for the flag."""
+        self.flags.add(f)
+        return f
+
+    def set_flag(self, f: str, expr: str) -> None:
+        self.flags.add(f)
+        self.dirty_flags.add(f)
+        self.emit("{} = {}".format(f, expr))
+
+    def set_zero_and_sign(self, result: str) -> None:
+        self.set_flag("fz", "{} == 0".format(result))
+        self.set_flag("fs", "bool({} & 0x8000)".format(result))
+
+    def emit_SETLO(self, op):
+        target, value = op.args
+        if value > 127:
+            value -= 256
+        self.set_reg(target, str(value & 0xFFFF))
+
+    def emit_SETHI(self, op):
+        target, value = op.args
+        self.set_reg(target, "{} + ({} & 0x00FF)".format(value << 8, self.reg(target)))
+
+    def emit_ADD(self, op):
+        target, a, b = op.args
+        left = self.reg(a)
+        right = self.reg(b)
+        self.emit(
+            "t = {} + {} + (1 if {} and not {} else 0)".format(
+                left, right, self.flag("fc"), self.flag("fcb")
+            )
+        )
+        self.emit("res = t & 0xFFFF")
+        self.set_flag("fc", "t > 0xFFFF")
+        self.set_flag(
+            "fv", "{} != {} + {}".format(signed("res"), signed(left), signed(right))
+        )
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_SUB(self, op):
+        target, a, b = op.args
+        left = self.reg(a)
+        right = self.reg(b)
+        self.emit(
+            "bw = 0 if {} or {} else 1".format(self.flag("fcb"), self.flag("fc"))
+        )
+        self.emit("res = ({} - {} - bw) & 0xFFFF".format(left, right))
+        self.set_flag("fc", "{} >= {} + bw".format(left, right))
+        self.set_flag(
+            "fv",
+            "{} != {} - {} - bw".format(signed("res"), signed(left), signed(right)),
+        )
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_MUL(self, op):
+        target, a, b = op.args
+        # See `MUL.calculate` in `hera/op.py`.
+        self.emit("a = {}".format(self.reg(a)))
+        self.emit("b = {}".format(self.reg(b)))
+        self.emit("if {} and not {}:".format(self.flag("fs"), self.flag("fcb")))
+        self.emit("    a = to_u32(from_u16(a))")
+        self.emit("    b = to_u32(from_u16(b))")
+        self.emit("    res = ((a * b) & 0xFFFF0000) >> 16")
+        self.emit("else:")
+        self.emit("    res = (a * b) & 0xFFFF")
+        self.set_flag("fc", "res < a * b")
+        self.set_flag("fv", "from_u16(res) != from_u16(a) * from_u16(b)")
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_bitwise(self, op, operator):
+        target, a, b = op.args
+        self.emit("res = {} {} {}".format(self.reg(a), operator, self.reg(b)))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_AND(self, op):
+        self.emit_bitwise(op, "&")
+
+    def emit_OR(self, op):
+        self.emit_bitwise(op, "|")
+
+    def emit_XOR(self, op):
+        self.emit_bitwise(op, "^")
+
+    def emit_INC(self, op):
+        target, value = op.args
+        original = self.reg(target)
+        self.emit("t = {} + {}".format(original, value))
+        self.emit("res = t & 0xFFFF")
+        self.set_flag(
+            "fv", "{} != {} + {}".format(signed("res"), signed(original), value)
+        )
+        self.set_flag("fc", "t > 0xFFFF")
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_DEC(self, op):
+        target, value = op.args
+        original = self.reg(target)
+        self.emit("res = ({} - {}) & 0xFFFF".format(original, value))
+        self.set_flag(
+            "fv", "{} != {} - {}".format(signed("res"), signed(original), value)
+        )
+        self.set_flag("fc", "{} >= {}".format(original, value))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_LSL(self, op):
+        target, a = op.args
+        arg = self.reg(a)
+        self.emit(
+            "res = (({} << 1) + (1 if {} and not {} else 0)) & 0xFFFF".format(
+                arg, self.flag("fc"), self.flag("fcb")
+            )
+        )
+        self.set_flag("fc", "bool({} & 0x8000)".format(arg))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_LSR(self, op):
+        target, a = op.args
+        arg = self.reg(a)
+        self.emit(
+            "res = ({} >> 1) + (0x8000 if {} and not {} else 0)".format(
+                arg, self.flag("fc"), self.flag("fcb")
+            )
+        )
+        self.set_flag("fc", "{} % 2 == 1".format(arg))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_LSL8(self, op):
+        target, a = op.args
+        self.emit("res = ({} << 8) & 0xFFFF".format(self.reg(a)))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_LSR8(self, op):
+        target, a = op.args
+        self.emit("res = {} >> 8".format(self.reg(a)))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_ASL(self, op):
+        target, a = op.args
+        arg = self.reg(a)
+        self.emit(
+            "res = (({} << 1) + (1 if {} and not {} else 0)) & 0xFFFF".format(
+                arg, self.flag("fc"), self.flag("fcb")
+            )
+        )
+        self.set_flag("fc", "bool({} & 0x8000)".format(arg))
+        self.set_flag("fv", "{} & 0x8000 and not res & 0x8000".format(arg))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_ASR(self, op):
+        target, a = op.args
+        arg = self.reg(a)
+        self.emit("res = {0} >> 1 | 0x8000 if {0} & 0x8000 else {0} >> 1".format(arg))
+        self.set_flag("fc", "{} & 0x0001".format(arg))
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_SAVEF(self, op):
+        self.set_reg(
+            op.args[0],
+            "int({}) + 2 * int({}) + 4 * int({}) + 8 * int({}) + 16 * int({})".format(
+                self.flag("fs"),
+                self.flag("fz"),
+                self.flag("fv"),
+                self.flag("fc"),
+                self.flag("fcb"),
+            ),
+        )
+
+    def emit_RSTRF(self, op):
+        self.emit("t = {}".format(self.reg(op.args[0])))
+        self.emit_flags_from("t", 5)
+
+    def emit_flags_from(self, value: str, count: int) -> None:
+        for i, f in enumerate(["fs", "fz", "fv", "fc", "fcb"][:count]):
+            self.set_flag(f, "bool({} & {})".format(value, 1 << i))
+
+    def emit_FON(self, op):
+        for i, f in enumerate(["fs", "fz", "fv", "fc", "fcb"]):
+            if op.args[0] & (1 << i):
+                self.set_flag(f, "{} or True".format(self.flag(f)))
+
+    def emit_FOFF(self, op):
+        for i, f in enumerate(["fs", "fz", "fv", "fc", "fcb"]):
+            if op.args[0] & (1 << i):
+                self.set_flag(f, "{} and False".format(self.flag(f)))
+
+    def emit_FSET5(self, op):
+        self.emit_flags_from(str(op.args[0]), 5)
+
+    def emit_FSET4(self, op):
+        self.emit_flags_from(str(op.args[0]), 4)
+
+    def emit_LOAD(self, op):
+        target, offset, address = op.args
+        self.uses_memory = True
+        self.emit("a = ({} + {}) & 0xFFFF".format(self.reg(address), offset))
+        if self.settings.memory == MEMORY_ARRAY:
+            # The array backend always has all 2**16 words.
+            self.emit("res = M[a]")
+        elif self.settings.memory == MEMORY_PAGED:
+            self.emit("res = M.pages[a >> {}][a & {}]".format(PAGE_BITS, PAGE_MASK))
+        else:
+            self.emit("res = M[a] if a < len(M) else 0")
+        self.set_zero_and_sign("res")
+        self.set_reg(target, "res")
+
+    def emit_STORE(self, op):
+        source, offset, address = op.args
+        self.uses_memory = True
+        self.emit("a = ({} + {}) & 0xFFFF".format(self.reg(address), offset))
+        if self.settings.memory == MEMORY_ARRAY:
+            self.emit("M[a] = {}".format(self.reg(source)))
+        elif self.settings.memory == MEMORY_PAGED:
+            self.emit("M.store(a, {})".format(self.reg(source)))
+        else:
+            self.emit("if a < len(M):")
+            self.emit("    M[a] = {}".format(self.reg(source)))
+            self.emit("else:")
+            self.emit("    vm.store_memory(a, {})".format(self.reg(source)))
+
+    def emit_branch(self, op):
+        # Relative branches have the same condition as their register counterparts.
+        condition = CONDITIONS[op.name if op.name in CONDITIONS else op.name[:-1]]
+        for word in re.findall(r"\w+", condition):
+            if word in FLAG_NAMES:
+                self.flag(word)
+
+        if isinstance(op, RegisterBranch):
+            target = self.reg(op.args[0])
+        else:
+            target = str(self.pc + op.args[0])
+
+        if condition == "True":
+            self.exit(target)
+        else:
+            self.exit("{} if {} else {}".format(target, condition, self.pc + 1))
+
+    def emit_BRR(self, op):
+        if op.args[0] == 0:
+            self.exit(
+                "vm.halted = True",
+                "vm.pc = {}".format(self.pc),
+                "return HALTED_PC",
+            )
+        else:
+            self.exit(str(self.pc + op.args[0]))
+
+    def emit_CALL(self, op):
+        ra, rb = op.args
+        self.emit("t = {}".format(self.reg(rb)))
+        self.emit("vm.expected_returns.push(t, {})".format(self.pc + 1))
+        self.emit_call_and_return(ra, rb)
+        self.exit("t")
+
+    def emit_RETURN(self, op):
+        ra, rb = op.args
+        self.emit("t = {}".format(self.reg(rb)))
+        self.emit("vm.location = {}".format(self.loc()))
+        self.emit("check_return_address(vm, t)")
+        self.emit_call_and_return(ra, rb)
+        self.exit("t")
+
+    def emit_PRINT_REG(self, op):
+        self.emit(
+            'vm.print("R{} = " + format_int({}))'.format(
+                op.args[0], self.reg(op.args[0])
+            )
+        )
+
+    def emit_PRINT(self, op):
+        self.emit('vm.print({!r}, end="")'.format(op.args[0]))
+
+    def emit_PRINTLN(self, op):
+        self.emit("vm.print({!r})".format(op.args[0]))
+
+    def emit___EVAL(self, op):
+        # See `__EVAL.execute` in `hera/op.py`. Since the evaluated code has access to
+        # the whole virtual machine, __eval is always in a block of its own.
+        self.emit("vm.pc = {}".format(self.pc))
+        self.emit("vm.location = {}".format(self.loc()))
+        self.emit("try:")
+        self.emit(
+            "    eval(compile_eval({!r}), {{}}, eval_namespace(vm))".format(op.args[0])
+        )
+        self.emit_python_exception()
+        self.exit("vm.pc += 1", "HALTED_PC if vm.halted else vm.pc")
+
+    def emit___INTRINSIC(self, op):
+        # See `__INTRINSIC.execute` in `hera/op.py`. The standard library functions do
+        # not jump or halt, but they may read and write any register, so the block ends
+        # after them anyway.
+        self.emit("vm.pc = {}".format(self.pc))
+        self.emit("vm.location = {}".format(self.loc()))
+        self.emit("try:")
+        self.emit("    stdlib.{}(vm)".format(op.function.__name__))
+        self.emit_python_exception()
+        self.exit(str(self.pc + 1))
+
+    def emit_python_exception(self) -> None:
+        self.emit("except Exception as e:")
+        self.emit('    vm.error("Python exception: " + str(e), vm.location)')
+        self.emit("    sys.exit(3)")
+
+    def emit_call_and_return(self, ra: int, rb: int) -> None:
+        # See `CALL_AND_RETURN.execute` in `hera/op.py`.
+        self.set_reg(rb, str(self.pc + 1))
+        self.emit("old_fp = {}".format(self.reg(14)))
+        self.set_reg(14, self.reg(ra))
+        self.set_reg(ra, "old_fp")
+
+
+def signed(expr: str) -> str:
+    """
+    Return a Python expression for the signed interpretation of the unsigned 16-bit
+    value of `expr`. Equivalent to `from_u16` in `hera/utils.py`.
+    """
+    if expr.isdigit():
+        return expr
+    else:
+        return "({0} - 0x10000 if {0} & 0x8000 else {0})".format(expr)
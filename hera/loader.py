@@ -11,15 +11,16 @@ from .parser import parse
 from .utils import handle_messages, Path, PATH_STRING, read_file_or_stdin
 
 
-def load_program(text: Path, settings=Settings()) -> Program:
+def load_program(text: Path, settings=Settings(), *, file=None) -> Program:
     """
-    Parse the string into a program, type-check it, and preprocess it.
+    Parse the string into a program, type-check it, and preprocess it. Warnings and
+    errors are printed to standard error, or to `file` if it is provided.
 
     The return value of this function is valid input to the VirtualMachine.run method.
     """
     oplist, parse_messages = parse(text, path=PATH_STRING, settings=settings)
     program, check_messages = check(oplist, settings=settings)
-    handle_messages(settings, parse_messages.extend(check_messages))
+    handle_messages(settings, parse_messages.extend(check_messages), file=file)
     return program
 
 
@@ -0,0 +1,539 @@
+"""
+A lockstep virtual machine that executes many instances of the same program at once.
+
+The lockstep virtual machine holds the register files, flags and memories of N virtual
+machines (called lanes) as NumPy arrays, and executes each operation of the program
+once for all the lanes that have reached it, using vectorized arithmetic. Lanes are
+distinguished only by the initial values of their registers (see `--init`), so it is
+meant for running the same program on many different inputs.
+
+When the lanes diverge at a branch, the lockstep machine always advances the lanes with
+the lowest program counter, so that lanes that went different ways through an
+if-statement or a loop come back together as soon as possible.
+
+Each lane prints to buffers of its own, `stdout[i]` and `stderr[i]`, so that the output
+and warnings of different lanes are never mixed up.
+
+The final state of each lane is available as an ordinary `VirtualMachine` object from
+`LockstepVirtualMachine.lane`, whose streams are the lane's buffers, and is identical to
+the state that the lane's program would have ended in if it had been run on its own.
+
+This module is unrelated to the `hera batch` subcommand (see `hera/runner.py`), which
+runs many different programs in parallel processes.
+
+NumPy is an optional dependency of hera-py, installed with
+`pip install hera-py[lockstep]`.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import copy
+import functools
+from io import StringIO
+from types import SimpleNamespace
+
+from .data import HERAError, Program, Settings
+from .jit import real_op
+from .op import RegisterBranch, RelativeBranch
+from .utils import format_int, print_warning
+from .vm import CallStack, VirtualMachine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# The branching condition of each branch operation, as a function of the sign, zero,
+# overflow and carry flags of the lanes. These mirror the `should` methods of the
+# branch classes in `hera/op.py`.
+CONDITIONS = {
+    "BR": lambda s, z, v, c: s | True,
+    "BL": lambda s, z, v, c: s ^ v,
+    "BGE": lambda s, z, v, c: ~(s ^ v),
+    "BLE": lambda s, z, v, c: (s ^ v) | z,
+    "BG": lambda s, z, v, c: ~(s ^ v) & ~z,
+    "BULE": lambda s, z, v, c: ~c | z,
+    "BUG": lambda s, z, v, c: c & ~z,
+    "BZ": lambda s, z, v, c: z,
+    "BNZ": lambda s, z, v, c: ~z,
+    "BC": lambda s, z, v, c: c,
+    "BNC": lambda s, z, v, c: ~c,
+    "BS": lambda s, z, v, c: s,
+    "BNS": lambda s, z, v, c: ~s,
+    "BV": lambda s, z, v, c: v,
+    "BNV": lambda s, z, v, c: ~v,
+}
+
+
+def run_lockstep(
+    program: Program, inits: "List[List[Tuple[int, int]]]", settings=Settings()
+) -> "List[VirtualMachine]":
+    """
+    Run the program once for each of the initial register assignments in `inits` (in
+    the format returned by `parse_init_string` in `hera/main.py`), and return the final
+    state of each run.
+    """
+    vm = LockstepVirtualMachine(inits, settings)
+    vm.run(program)
+    return [vm.lane(i) for i in range(vm.size)]
+
+
+class LockstepVirtualMachine:
+    """
+    The state of N virtual machines, one for each element of `inits`, a list of
+    initial register assignments. The fields of this class are the same as those of
+    `VirtualMachine`, except that each holds an array (or a list) with one entry per
+    lane.
+    """
+
+    def __init__(self, inits: "List[List[Tuple[int, int]]]", settings=Settings()):
+        if np is None:
+            raise HERAError("the lockstep virtual machine requires NumPy")
+
+        self.settings = settings
+        self.inits = [list(init) for init in inits]
+        self.size = len(self.inits)
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset every lane to its initial state."""
+        n = self.size
+        self.registers = np.zeros((n, 16), dtype=np.int64)
+        for lane, init in enumerate(self.inits):
+            for dest, val in init:
+                self.registers[lane, dest] = val
+        self.pc = np.zeros(n, dtype=np.int64)
+        # All lanes run the same data statements, so the data counter is shared.
+        self.dc = self.settings.data_start
+        self.flag_sign = np.zeros(n, dtype=bool)
+        self.flag_zero = np.zeros(n, dtype=bool)
+        self.flag_overflow = np.zeros(n, dtype=bool)
+        self.flag_carry = np.zeros(n, dtype=bool)
+        self.flag_carry_block = np.zeros(n, dtype=bool)
+        # Like the memory of a `VirtualMachine`, the memory array starts off small and
+        # is expanded as necessary. `memory_size` tracks how far each lane's memory
+        # would have been expanded on its own.
+        self.memory = np.zeros((n, 2 ** 4), dtype=np.int32)
+        self.memory_size = np.full(n, 2 ** 4, dtype=np.int64)
+        self.input_buffer = [""] * n
+        self.input_pos = [0] * n
+        depth = self.settings.call_stack_depth
+        self.expected_returns = [CallStack(depth) for _ in range(n)]
+        self.halted = np.zeros(n, dtype=bool)
+        self.op_count = np.zeros(n, dtype=np.int64)
+        self.warned_for_overflow = np.zeros(n, dtype=bool)
+        self.warning_count = np.zeros(n, dtype=np.int64)
+        self.stdout = [StringIO() for _ in range(n)]
+        self.stderr = [StringIO() for _ in range(n)]
+
+    def run(self, program: Program) -> None:
+        """Execute a program on every lane, resetting their state beforehand."""
+        self.reset()
+
+        # The data statements do not depend on the registers, so they are executed once
+        # and the result is copied to every lane.
+        scratch = VirtualMachine(self.settings)
+        scratch.load_data(program)
+        memory = np.array(scratch.memory, dtype=np.int32)
+        self.memory = np.tile(memory, (self.size, 1))
+        self.memory_size[:] = len(scratch.memory)
+        self.dc = scratch.dc
+
+        # Superinstructions are split back up into their component operations.
+        code = [real_op(op) for op in program.code]
+        executors = [self.get_executor(op) for op in code]
+        throttle = self.settings.throttle
+        while True:
+            active = ~self.halted & (self.pc < len(code))
+            if throttle is not False:
+                active &= self.op_count < throttle
+            if not active.any():
+                break
+
+            pc = int(self.pc[active].min())
+            lanes = np.flatnonzero(active & (self.pc == pc))
+            executors[pc](code[pc], pc, lanes)
+            if throttle is not False:
+                self.op_count[lanes] += 1
+
+    def lane(self, i: int) -> VirtualMachine:
+        """Return the state of the i'th lane as a `VirtualMachine` object."""
+        settings = copy.copy(self.settings)
+        settings.init = self.inits[i]
+        vm = VirtualMachine(settings, stdout=self.stdout[i], stderr=self.stderr[i])
+        vm.registers = [int(v) for v in self.registers[i]]
+        vm.pc = int(self.pc[i])
+        vm.dc = self.dc
+        vm.flag_sign = bool(self.flag_sign[i])
+        vm.flag_zero = bool(self.flag_zero[i])
+        vm.flag_overflow = bool(self.flag_overflow[i])
+        vm.flag_carry = bool(self.flag_carry[i])
+        vm.flag_carry_block = bool(self.flag_carry_block[i])
+        vm.memory = [int(v) for v in self.memory[i, : self.memory_size[i]]]
+        vm.input_buffer = self.input_buffer[i]
+        vm.input_pos = self.input_pos[i]
+        vm.expected_returns = self.expected_returns[i].copy()
+        vm.halted = bool(self.halted[i])
+        vm.op_count = int(self.op_count[i])
+        vm.warned_for_overflow = bool(self.warned_for_overflow[i])
+        vm.warning_count = int(self.warning_count[i])
+        return vm
+
+    def set_lane(self, i: int, vm: VirtualMachine) -> None:
+        """Copy the state of the virtual machine into the i'th lane."""
+        self.registers[i] = vm.registers
+        self.pc[i] = vm.pc
+        self.flag_sign[i] = vm.flag_sign
+        self.flag_zero[i] = vm.flag_zero
+        self.flag_overflow[i] = vm.flag_overflow
+        self.flag_carry[i] = vm.flag_carry
+        self.flag_carry_block[i] = vm.flag_carry_block
+        self.ensure_memory(len(vm.memory))
+        self.memory[i, : len(vm.memory)] = vm.memory
+        self.memory_size[i] = len(vm.memory)
+        self.input_buffer[i] = vm.input_buffer
+        self.input_pos[i] = vm.input_pos
+        self.expected_returns[i] = vm.expected_returns
+        self.halted[i] = vm.halted
+        self.warned_for_overflow[i] = vm.warned_for_overflow
+        self.warning_count[i] = vm.warning_count
+
+    def ensure_memory(self, size: int) -> None:
+        """Expand the memory array of every lane to at least `size` cells."""
+        capacity = self.memory.shape[1]
+        if size > capacity:
+            extra = max(size, 2 * capacity) - capacity
+            self.memory = np.pad(self.memory, ((0, 0), (0, extra)), "constant")
+
+    def store_register(self, lanes, index: int, values, loc) -> None:
+        """Store the values in the target register of the lanes."""
+        if index == 0:
+            return
+
+        self.registers[lanes, index] = values
+        if index == 15:
+            # Mirror the stack overflow check in `VirtualMachine.store_register`.
+            overflowed = lanes[
+                (values >= self.settings.data_start) & ~self.warned_for_overflow[lanes]
+            ]
+            for lane in overflowed:
+                self.warn(lane, "stack has overflowed into data segment", loc)
+            self.warned_for_overflow[overflowed] = True
+
+    def warn(self, lane: int, msg: str, loc) -> None:
+        """Print a warning message to the lane's standard error."""
+        print_warning(self.settings, msg, loc=loc, file=self.stderr[lane])
+        self.warning_count[lane] += 1
+
+    def set_zero_and_sign(self, lanes, values) -> None:
+        self.flag_zero[lanes] = values == 0
+        self.flag_sign[lanes] = (values & 0x8000) != 0
+
+    def get_executor(self, op):
+        if isinstance(op, (RegisterBranch, RelativeBranch)) and op.name != "BRR":
+            return self.exec_branch
+        else:
+            return getattr(self, "exec_" + op.name, self.exec_one_at_a_time)
+
+    def exec_one_at_a_time(self, op, pc, lanes):
+        """
+        Execute an operation that has no vectorized implementation, on each lane in
+        turn.
+        """
+        for lane in lanes:
+            vm = self.lane(lane)
+            vm.location = op.loc
+            op.execute(vm)
+            self.set_lane(lane, vm)
+
+    def exec_SETLO(self, op, pc, lanes):
+        target, value = op.args
+        if value > 127:
+            value -= 256
+        self.store_register(lanes, target, value & 0xFFFF, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_SETHI(self, op, pc, lanes):
+        target, value = op.args
+        values = (value << 8) + (self.registers[lanes, target] & 0x00FF)
+        self.store_register(lanes, target, values, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_ADD(self, op, pc, lanes):
+        target, a, b = op.args
+        left = self.registers[lanes, a]
+        right = self.registers[lanes, b]
+        carry = self.flag_carry[lanes] & ~self.flag_carry_block[lanes]
+        total = left + right + carry
+        result = total & 0xFFFF
+        self.flag_carry[lanes] = result < total
+        self.flag_overflow[lanes] = signed(result) != signed(left) + signed(right)
+        self.set_zero_and_sign(lanes, result)
+        self.store_register(lanes, target, result, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_SUB(self, op, pc, lanes):
+        target, a, b = op.args
+        left = self.registers[lanes, a]
+        right = self.registers[lanes, b]
+        borrow = ~self.flag_carry_block[lanes] & ~self.flag_carry[lanes]
+        result = (left - right - borrow) & 0xFFFF
+        self.flag_carry[lanes] = left >= right + borrow
+        self.flag_overflow[lanes] = (
+            signed(result) != signed(left) - signed(right) - borrow
+        )
+        self.set_zero_and_sign(lanes, result)
+        self.store_register(lanes, target, result, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_MUL(self, op, pc, lanes):
+        target, a, b = op.args
+        left = self.registers[lanes, a]
+        right = self.registers[lanes, b]
+        # See `MUL.calculate` in `hera/op.py`.
+        high = self.flag_sign[lanes] & ~self.flag_carry_block[lanes]
+        left = np.where(high, signed(left) & 0xFFFFFFFF, left)
+        right = np.where(high, signed(right) & 0xFFFFFFFF, right)
+        # Python integers are used for the product of two 32-bit numbers, which may not
+        # fit in 64 bits.
+        product = left.astype(object) * right.astype(object)
+        result = np.where(
+            high, (product & 0xFFFF0000) >> 16, product & 0xFFFF
+        ).astype(np.int64)
+        self.flag_carry[lanes] = result < product
+        self.flag_overflow[lanes] = signed(result) != (
+            signed(left).astype(object) * signed(right).astype(object)
+        )
+        self.set_zero_and_sign(lanes, result)
+        self.store_register(lanes, target, result, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_bitwise(self, op, lanes, result):
+        self.set_zero_and_sign(lanes, result)
+        self.store_register(lanes, op.args[0], result, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_AND(self, op, pc, lanes):
+        _, a, b = op.args
+        result = self.registers[lanes, a] & self.registers[lanes, b]
+        self.exec_bitwise(op, lanes, result)
+
+    def exec_OR(self, op, pc, lanes):
+        _, a, b = op.args
+        result = self.registers[lanes, a] | self.registers[lanes, b]
+        self.exec_bitwise(op, lanes, result)
+
+    def exec_XOR(self, op, pc, lanes):
+        _, a, b = op.args
+        result = self.registers[lanes, a] ^ self.registers[lanes, b]
+        self.exec_bitwise(op, lanes, result)
+
+    def exec_INC(self, op, pc, lanes):
+        target, value = op.args
+        original = self.registers[lanes, target]
+        result = (original + value) & 0xFFFF
+        self.store_register(lanes, target, result, op.loc)
+        self.set_zero_and_sign(lanes, result)
+        self.flag_overflow[lanes] = signed(result) != signed(original) + value
+        self.flag_carry[lanes] = original + value >= 2 ** 16
+        self.pc[lanes] += 1
+
+    def exec_DEC(self, op, pc, lanes):
+        target, value = op.args
+        original = self.registers[lanes, target]
+        result = (original - value) & 0xFFFF
+        self.store_register(lanes, target, result, op.loc)
+        self.set_zero_and_sign(lanes, result)
+        self.flag_overflow[lanes] = signed(result) != signed(original) - value
+        self.flag_carry[lanes] = original >= value
+        self.pc[lanes] += 1
+
+    def exec_shift(self, op, lanes, result):
+        self.set_zero_and_sign(lanes, result)
+        self.store_register(lanes, op.args[0], result, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_LSL(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        carry = self.flag_carry[lanes] & ~self.flag_carry_block[lanes]
+        result = ((arg << 1) + carry) & 0xFFFF
+        self.flag_carry[lanes] = (arg & 0x8000) != 0
+        self.exec_shift(op, lanes, result)
+
+    def exec_LSR(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        carry = self.flag_carry[lanes] & ~self.flag_carry_block[lanes]
+        result = (arg >> 1) + carry * 2 ** 15
+        self.flag_carry[lanes] = arg % 2 == 1
+        self.exec_shift(op, lanes, result)
+
+    def exec_LSL8(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        self.exec_shift(op, lanes, (arg << 8) & 0xFFFF)
+
+    def exec_LSR8(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        self.exec_shift(op, lanes, arg >> 8)
+
+    def exec_ASL(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        carry = self.flag_carry[lanes] & ~self.flag_carry_block[lanes]
+        result = ((arg << 1) + carry) & 0xFFFF
+        self.flag_carry[lanes] = (arg & 0x8000) != 0
+        self.flag_overflow[lanes] = ((arg & 0x8000) != 0) & ((result & 0x8000) == 0)
+        self.exec_shift(op, lanes, result)
+
+    def exec_ASR(self, op, pc, lanes):
+        arg = self.registers[lanes, op.args[1]]
+        result = np.where(arg & 0x8000, arg >> 1 | 0x8000, arg >> 1)
+        self.flag_carry[lanes] = (arg & 0x0001) != 0
+        self.exec_shift(op, lanes, result)
+
+    def exec_SAVEF(self, op, pc, lanes):
+        value = (
+            self.flag_sign[lanes]
+            + 2 * self.flag_zero[lanes].astype(np.int64)
+            + 4 * self.flag_overflow[lanes].astype(np.int64)
+            + 8 * self.flag_carry[lanes].astype(np.int64)
+            + 16 * self.flag_carry_block[lanes].astype(np.int64)
+        )
+        self.store_register(lanes, op.args[0], value, op.loc)
+        self.pc[lanes] += 1
+
+    def set_flags(self, lanes, value, count: int) -> None:
+        """Set the first `count` flags of the lanes from the bits of `value`."""
+        self.flag_sign[lanes] = (value & 1) != 0
+        self.flag_zero[lanes] = (value & 2) != 0
+        self.flag_overflow[lanes] = (value & 4) != 0
+        self.flag_carry[lanes] = (value & 8) != 0
+        if count == 5:
+            self.flag_carry_block[lanes] = (value & 16) != 0
+
+    def exec_RSTRF(self, op, pc, lanes):
+        self.set_flags(lanes, self.registers[lanes, op.args[0]], 5)
+        self.pc[lanes] += 1
+
+    def exec_FSET5(self, op, pc, lanes):
+        self.set_flags(lanes, op.args[0], 5)
+        self.pc[lanes] += 1
+
+    def exec_FSET4(self, op, pc, lanes):
+        self.set_flags(lanes, op.args[0], 4)
+        self.pc[lanes] += 1
+
+    def exec_FON(self, op, pc, lanes):
+        flags = [
+            self.flag_sign,
+            self.flag_zero,
+            self.flag_overflow,
+            self.flag_carry,
+            self.flag_carry_block,
+        ]
+        for i, flag in enumerate(flags):
+            if op.args[0] & (1 << i):
+                flag[lanes] = True
+        self.pc[lanes] += 1
+
+    def exec_FOFF(self, op, pc, lanes):
+        flags = [
+            self.flag_sign,
+            self.flag_zero,
+            self.flag_overflow,
+            self.flag_carry,
+            self.flag_carry_block,
+        ]
+        for i, flag in enumerate(flags):
+            if op.args[0] & (1 << i):
+                flag[lanes] = False
+        self.pc[lanes] += 1
+
+    def exec_LOAD(self, op, pc, lanes):
+        target, offset, address = op.args
+        # Addresses wrap around at 16 bits, as in `VirtualMachine.load_memory`.
+        addresses = (self.registers[lanes, address] + offset) & 0xFFFF
+        inside = addresses < self.memory_size[lanes]
+        values = np.zeros(len(lanes), dtype=np.int64)
+        values[inside] = self.memory[lanes[inside], addresses[inside]]
+        self.set_zero_and_sign(lanes, values)
+        self.store_register(lanes, target, values, op.loc)
+        self.pc[lanes] += 1
+
+    def exec_STORE(self, op, pc, lanes):
+        source, offset, address = op.args
+        addresses = (self.registers[lanes, address] + offset) & 0xFFFF
+        self.ensure_memory(int(addresses.max()) + 1)
+        self.memory[lanes, addresses] = self.registers[lanes, source]
+        self.memory_size[lanes] = np.maximum(self.memory_size[lanes], addresses + 1)
+        self.pc[lanes] += 1
+
+    def exec_branch(self, op, pc, lanes):
+        condition = CONDITIONS[op.name if op.name in CONDITIONS else op.name[:-1]]
+        taken = condition(
+            self.flag_sign[lanes],
+            self.flag_zero[lanes],
+            self.flag_overflow[lanes],
+            self.flag_carry[lanes],
+        )
+        if isinstance(op, RegisterBranch):
+            target = self.registers[lanes, op.args[0]]
+        else:
+            target = pc + op.args[0]
+        self.pc[lanes] = np.where(taken, target, pc + 1)
+
+    def exec_BRR(self, op, pc, lanes):
+        if op.args[0] != 0:
+            self.pc[lanes] += op.args[0]
+        else:
+            self.halted[lanes] = True
+
+    def exec_CALL(self, op, pc, lanes):
+        ra, rb = op.args
+        targets = self.registers[lanes, rb]
+        for lane, target in zip(lanes, targets):
+            self.expected_returns[lane].push(int(target), pc + 1)
+        self.call_and_return(op, pc, lanes)
+
+    def exec_RETURN(self, op, pc, lanes):
+        ra, rb = op.args
+        for lane in lanes:
+            # `check_return_address` only needs these fields of the virtual machine.
+            vm = SimpleNamespace(
+                settings=self.settings,
+                expected_returns=self.expected_returns[lane],
+                location=op.loc,
+                warn=functools.partial(self.warn, lane),
+            )
+            op.check_return_address(vm, int(self.registers[lane, rb]))
+        self.call_and_return(op, pc, lanes)
+
+    def call_and_return(self, op, pc, lanes):
+        # See `CALL_AND_RETURN.execute` in `hera/op.py`.
+        ra, rb = op.args
+        self.pc[lanes] = self.registers[lanes, rb]
+        self.store_register(lanes, rb, pc + 1, op.loc)
+        old_fp = self.registers[lanes, 14]
+        self.store_register(lanes, 14, self.registers[lanes, ra], op.loc)
+        self.store_register(lanes, ra, old_fp, op.loc)
+
+    def exec_PRINT_REG(self, op, pc, lanes):
+        for lane, value in zip(lanes, self.registers[lanes, op.args[0]]):
+            self.stdout[lane].write(
+                "R{} = {}\n".format(op.args[0], format_int(int(value)))
+            )
+        self.pc[lanes] += 1
+
+    def exec_PRINT(self, op, pc, lanes):
+        for lane in lanes:
+            self.stdout[lane].write(op.args[0])
+        self.pc[lanes] += 1
+
+    def exec_PRINTLN(self, op, pc, lanes):
+        for lane in lanes:
+            self.stdout[lane].write(op.args[0] + "\n")
+        self.pc[lanes] += 1
+
+
+def signed(values):
+    """Vectorized version of `from_u16` in `hera/utils.py`."""
+    return np.where(values >= 2 ** 15, values - 2 ** 16, values)
@@ -5,14 +5,32 @@ Author:  Ian Fisher (iafisher@fastmail.com)
 Version: July 2019
 """
 import functools
+import json
+import os
 import sys
 
-from .assembler import assemble_and_print
-from .data import VOLUME_QUIET, VOLUME_VERBOSE, HERAError, Settings
+from .assembler import assemble_and_print, disassemble_text
+from .data import (
+    ENGINE_INTERPRETER,
+    ENGINE_TIERED,
+    ENGINES,
+    MEMORIES,
+    MEMORY_PAGED,
+    VOLUME_QUIET,
+    VOLUME_VERBOSE,
+    HERAError,
+    Program,
+    Settings,
+)
 from .debugger import debug
 from .loader import load_program_from_file
-from .op import disassemble
-from .utils import Path, format_int, read_file_or_stdin, register_to_index
+from .utils import (
+    Path,
+    format_int,
+    print_error,
+    read_file_or_stdin,
+    register_to_index,
+)
 from .vm import VirtualMachine
 
 VERSION = "hera-py 1.0.7 for HERA version 2.4"
@@ -34,7 +52,10 @@ def main(argv: "Optional[List[str]]" = None) -> "Optional[VirtualMachine]":
     is run is returned so that its internal state may be inspected for testing.
     """
     settings = parse_args(argv)
-    if settings.path == "-":
+    if settings.mode == "serve":
+        main_serve(settings)
+        return None
+    elif settings.path == "-":
         path = Path("<stdin>", kind=Path.STDIN)
     else:
         path = Path(settings.path)
@@ -56,6 +77,12 @@ def main(argv: "Optional[List[str]]" = None) -> "Optional[VirtualMachine]":
     elif settings.mode == "disassemble":
         main_disassemble(path, settings)
         return None
+    elif settings.mode == "compile":
+        main_compile(path, settings)
+        return None
+    elif settings.mode == "batch":
+        main_batch(settings)
+        return None
     else:
         return main_execute(path, settings)
 
@@ -66,25 +93,119 @@ def main_debug(path: str, settings: Settings) -> None:
     debug(program, settings)
 
 
-def main_execute(path: str, settings: Settings) -> VirtualMachine:
+def main_execute(path: str, settings: Settings) -> "Optional[VirtualMachine]":
     """Execute the program."""
     program = load_program_from_file(path, settings)
+    if settings.optimize:
+        # Imported here so that programs that are not optimized do not pay for it at
+        # startup.
+        from .optimizer import optimize
+
+        program = optimize(program, settings)
+
+    if settings.inputs is not False:
+        main_execute_inputs(program, settings)
+        return None
 
     vm = VirtualMachine(settings)
     vm.run(program)
+    report_execution(vm, settings)
+    return vm
+
+
+def main_execute_inputs(program: Program, settings: Settings) -> None:
+    """
+    Execute the program on each file in the --inputs directory, in parallel, and print
+    the results in order.
+    """
+    # Imported here so that programs that are run on a single input do not pay for
+    # multiprocessing at startup.
+    from .parallel import list_inputs, run_inputs
+
+    try:
+        paths = list_inputs(settings.inputs)
+    except HERAError as e:
+        print_error(settings, str(e))
+        sys.exit(3)
+
+    jobs = settings.jobs if settings.jobs is not None else os.cpu_count() or 1
+    results = run_inputs(program, settings, paths, jobs=jobs, report=report_execution)
+
+    exit_code = None
+    for result in results:
+        print("==> {} <==".format(result.path))
+        sys.stdout.write(result.stdout)
+        sys.stdout.flush()
+        sys.stderr.write(result.stderr)
+        sys.stderr.flush()
+        if exit_code is None:
+            exit_code = result.exit_code
+
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
+def report_execution(vm: VirtualMachine, settings: Settings, file=None) -> None:
+    """
+    Report the state of the virtual machine after the program has been executed, to
+    standard error or to `file`.
+    """
+    if file is None:
+        file = sys.stderr
 
     # Check if the program exited prematurely due to throttling.
     if settings.throttle is not False and vm.op_count == settings.throttle:
-        sys.stderr.write(
-            "Program throttled after {} instructions.\n".format(vm.op_count)
-        )
+        file.write("Program throttled after {} instructions.\n".format(vm.op_count))
 
     settings.warning_count += vm.warning_count
 
     if settings.volume != VOLUME_QUIET:
-        dump_state(vm, settings)
+        dump_state(vm, settings, file=file)
 
-    return vm
+
+def main_batch(settings: Settings) -> None:
+    """Run each program in batch mode, and print its result as a line of JSON."""
+    # Imported here so that the other modes do not pay for multiprocessing at startup.
+    from .runner import find_programs, run_batch
+
+    # Messages are part of the results, not printed to a terminal.
+    settings.color = False
+    jobs = settings.jobs if settings.jobs is not None else os.cpu_count() or 1
+    for result in run_batch(find_programs(settings.paths), settings, jobs=jobs):
+        print(json.dumps(result))
+        sys.stdout.flush()
+
+
+def main_serve(settings: Settings) -> None:
+    """
+    Serve requests from standard input, or from the Unix socket given by --socket,
+    until the input ends or the server is interrupted.
+    """
+    # Imported here so that the other modes do not pay for multiprocessing and
+    # socketserver at startup.
+    from .server import Server
+
+    jobs = settings.jobs if settings.jobs is not None else os.cpu_count() or 1
+    server = Server(settings, jobs=jobs, allow_eval=settings.allow_eval)
+
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    try:
+        if settings.socket is not False:
+            server.serve_socket(settings.socket)
+        else:
+            server.serve_stream(sys.stdin, write)
+    except KeyboardInterrupt:
+        server.terminate()
+    except OSError as e:
+        # Raised if the socket cannot be created, e.g. because the path is in use.
+        server.terminate()
+        print_error(settings, "could not listen on {}: {}".format(settings.socket, e))
+        sys.exit(3)
+    else:
+        server.close()
 
 
 def main_preprocess(path: str, settings: Settings) -> None:
@@ -118,23 +239,41 @@ def main_assemble(path: str, settings: Settings) -> None:
     assemble_and_print(program, settings)
 
 
+def main_compile(path: str, settings: Settings) -> None:
+    """
+    Compile the program into a standalone Python module, and write it to the output
+    path (by default, the path of the program with "_hera.py" in place of ".hera").
+    """
+    # Imported here so that the other modes do not pay for it at startup.
+    from .compiler import compile_program
+
+    program = load_program_from_file(path, settings)
+    try:
+        source = compile_program(program, settings, version=VERSION)
+    except HERAError as e:
+        print_error(settings, str(e))
+        sys.exit(3)
+
+    output = settings.output
+    if output is False:
+        stem = "stdin" if settings.path == "-" else os.path.splitext(settings.path)[0]
+        output = stem + "_hera.py"
+
+    if output == "-":
+        sys.stdout.write(source)
+    else:
+        with open(output, "w", encoding="ascii") as f:
+            f.write(source)
+
+
 def main_disassemble(path: str, settings: Settings) -> None:
     """
     Disassemble the machine code (expressed as newline-separated hex numbers, without
     the "0x" prefix), and print the HERA output to stdout.
     """
     text = read_file_or_stdin(path, settings)
-    for line in text.splitlines():
-        try:
-            v = int(line, base=16)
-        except ValueError:
-            print("// Invalid hex literal: {}".format(line))
-            continue
-
-        try:
-            print(disassemble(v))
-        except HERAError:
-            print("// Unknown instruction: {}".format(line))
+    for line in disassemble_text(text):
+        print(line)
 
 
 def parse_args(argv: "Optional[List[str]]") -> Settings:
@@ -157,26 +296,78 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
         if longarg == "--":
             after_flags = True
         elif not after_flags and longarg in FLAGS:
-            # --throttle and --init are the only flag that takes an argument.
-            if longarg == "--throttle":
+            # --throttle, --jobs, --timeout, --init, --engine, --inputs, --memory,
+            # --socket and --output are the only flags that take an argument.
+            if longarg in ("--throttle", "--jobs"):
                 if i == len(argv) - 1 or not argv[i + 1].isdigit():
-                    sys.stderr.write("--throttle takes one integer argument.\n")
+                    sys.stderr.write("{} takes one integer argument.\n".format(longarg))
                     sys.exit(1)
                 flags[longarg] = int(argv[i + 1])
                 i += 1
+            elif longarg == "--timeout":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--timeout takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
             elif longarg == "--init":
                 if i == len(argv) - 1:
                     sys.stderr.write("--init takes one argument.\n")
                     sys.exit(1)
                 flags[longarg] = argv[i + 1]
                 i += 1
+            elif longarg == "--engine":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--engine takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
+            elif longarg == "--inputs":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--inputs takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
+            elif longarg == "--memory":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--memory takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
+            elif longarg == "--socket":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--socket takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
+            elif longarg == "--output":
+                if i == len(argv) - 1:
+                    sys.stderr.write("--output takes one argument.\n")
+                    sys.exit(1)
+                flags[longarg] = argv[i + 1]
+                i += 1
             else:
                 flags[longarg] = True
-        # Special syntax for --init and --throttle.
+        # Special syntax for --init, --throttle, --jobs, --timeout, --engine, --inputs,
+        # --memory, --socket and --output.
         elif not after_flags and longarg.startswith("--throttle"):
             flags["--throttle"] = int(longarg[len("--throttle=") :])
+        elif not after_flags and longarg.startswith("--jobs="):
+            flags["--jobs"] = int(longarg[len("--jobs=") :])
+        elif not after_flags and longarg.startswith("--inputs="):
+            flags["--inputs"] = longarg[len("--inputs=") :]
+        elif not after_flags and longarg.startswith("--timeout="):
+            flags["--timeout"] = longarg[len("--timeout=") :]
         elif not after_flags and longarg.startswith("--init"):
             flags["--init"] = longarg[len("--init=") :]
+        elif not after_flags and longarg.startswith("--engine="):
+            flags["--engine"] = longarg[len("--engine=") :]
+        elif not after_flags and longarg.startswith("--memory="):
+            flags["--memory"] = longarg[len("--memory=") :]
+        elif not after_flags and longarg.startswith("--socket="):
+            flags["--socket"] = longarg[len("--socket=") :]
+        elif not after_flags and longarg.startswith("--output="):
+            flags["--output"] = longarg[len("--output=") :]
         elif not after_flags and longarg.startswith("-") and len(longarg) > 1:
             sys.stderr.write("Unrecognized flag: " + arg + "\n")
             sys.exit(1)
@@ -214,13 +405,6 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
             )
             sys.exit(1)
 
-    if len(posargs) == 0:
-        sys.stderr.write("No file path supplied.\n")
-        sys.exit(1)
-    elif len(posargs) > 1:
-        sys.stderr.write("Too many file paths supplied.\n")
-        sys.exit(1)
-
     if "debug" in flags:
         mode = "debug"
     elif "assemble" in flags:
@@ -229,9 +413,29 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
         mode = "preprocess"
     elif "disassemble" in flags:
         mode = "disassemble"
+    elif "compile" in flags:
+        mode = "compile"
+    elif "batch" in flags:
+        mode = "batch"
+    elif "serve" in flags:
+        mode = "serve"
     else:
         mode = ""
 
+    if mode == "serve":
+        if posargs:
+            sys.stderr.write("Server mode does not take a file path.\n")
+            sys.exit(1)
+    elif len(posargs) == 0:
+        sys.stderr.write("No file path supplied.\n")
+        sys.exit(1)
+    elif len(posargs) > 1 and mode != "batch":
+        sys.stderr.write("Too many file paths supplied.\n")
+        sys.exit(1)
+    elif mode == "batch" and "-" in posargs:
+        sys.stderr.write("Batch mode cannot read programs from standard input.\n")
+        sys.exit(1)
+
     for picky_flag, valid_modes in PICKY_FLAGS.items():
         if picky_flag in flags:
             if mode not in valid_modes:
@@ -249,7 +453,8 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
             flags[f] = False
 
     settings = Settings()
-    settings.path = posargs[0]
+    settings.path = posargs[0] if posargs else None
+    settings.paths = posargs
     settings.mode = mode
 
     settings.allow_interrupts = settings.mode in ("assemble", "preprocess")
@@ -259,6 +464,14 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
     if flags["--big-stack"]:
         # Arbitrary value copied over from HERA-C.
         settings.data_start = 0xC167
+    if flags["--detect-loops"]:
+        settings.detect_loops = True
+    if flags["--engine"] is not False:
+        if flags["--engine"] not in ENGINES:
+            sys.stderr.write("Unrecognized engine: {}\n".format(flags["--engine"]))
+            sys.stderr.write("Available engines: {}\n".format(", ".join(ENGINES)))
+            sys.exit(1)
+        settings.engine = flags["--engine"]
     if flags["--init"] is False:
         settings.init = []
     else:
@@ -267,10 +480,69 @@ def parse_args(argv: "Optional[List[str]]") -> Settings:
             sys.stderr.write("Invalid syntax for --init argument.\n\n")
             sys.stderr.write('Sample correct syntax: --init="r1=5, r2=7"\n')
             sys.exit(1)
+    settings.inputs = flags["--inputs"]
+    if flags["--jobs"] is not False:
+        if settings.inputs is False and mode not in ("batch", "serve"):
+            sys.stderr.write("--jobs requires --inputs.\n")
+            sys.exit(1)
+        elif flags["--jobs"] == 0:
+            sys.stderr.write("--jobs must be at least 1.\n")
+            sys.exit(1)
+        settings.jobs = flags["--jobs"]
+    if settings.detect_loops and settings.engine != ENGINE_INTERPRETER:
+        sys.stderr.write("--detect-loops requires --engine=interpreter.\n")
+        sys.exit(1)
+    if flags["--lazy-flags"]:
+        if settings.engine != ENGINE_INTERPRETER:
+            sys.stderr.write("--lazy-flags requires --engine=interpreter.\n")
+            sys.exit(1)
+        elif settings.detect_loops:
+            sys.stderr.write("--lazy-flags and --detect-loops are incompatible.\n")
+            sys.exit(1)
+        settings.lazy_flags = True
+    if flags["--memory"] is not False:
+        if flags["--memory"] not in MEMORIES:
+            sys.stderr.write(
+                "Unrecognized memory backend: {}\n".format(flags["--memory"])
+            )
+            sys.stderr.write(
+                "Available memory backends: {}\n".format(", ".join(MEMORIES))
+            )
+            sys.exit(1)
+        settings.memory = flags["--memory"]
+    elif mode == "debug":
+        # Paged memory makes the snapshots that the debugger takes for "undo" cheap.
+        settings.memory = MEMORY_PAGED
     settings.no_debug_ops = flags["--no-debug-ops"]
+    if mode == "serve":
+        # The server runs programs sent by its clients, which should not be able to run
+        # arbitrary Python code by default.
+        settings.allow_eval = flags["--allow-eval"]
     settings.obfuscate = flags["--obfuscate"]
+    settings.optimize = flags["--optimize"]
+    settings.output = flags["--output"]
+    if flags["--profile"]:
+        if settings.engine != ENGINE_TIERED:
+            sys.stderr.write("--profile requires --engine=tiered.\n")
+            sys.exit(1)
+        elif settings.path == "-":
+            sys.stderr.write("--profile cannot be used with standard input.\n")
+            sys.exit(1)
+        elif settings.inputs is not False:
+            sys.stderr.write("--profile and --inputs are incompatible.\n")
+            sys.exit(1)
+        settings.profile_path = settings.path + ".hotness"
+    settings.socket = flags["--socket"]
     settings.stdout = flags["--stdout"]
     settings.throttle = flags["--throttle"]
+    if flags["--timeout"] is not False:
+        try:
+            settings.timeout = float(flags["--timeout"])
+        except ValueError:
+            settings.timeout = -1
+        if not settings.timeout > 0:
+            sys.stderr.write("--timeout takes one positive number of seconds.\n")
+            sys.exit(1)
     settings.warn_octal_on = not flags["--warn-octal-off"]
     settings.warn_return_on = not flags["--warn-return-off"]
     if flags["--verbose"]:
@@ -289,6 +561,10 @@ def short_to_long(arg: str) -> str:
         return "--version"
     elif arg == "-q":
         return "--quiet"
+    elif arg == "-o":
+        return "--output"
+    elif arg == "-j":
+        return "--jobs"
     else:
         return arg
 
@@ -323,13 +599,13 @@ def parse_init_string(initstr: str) -> "Optional[List[Tuple[int, int]]]":
     return ret
 
 
-def dump_state(vm: VirtualMachine, settings: Settings) -> None:
-    """Print the state of the virtual machine to standard output."""
+def dump_state(vm: VirtualMachine, settings: Settings, *, file=None) -> None:
+    """Print the state of the virtual machine to standard error, or to `file`."""
     # Make sure that all program output has been printed.
-    sys.stdout.flush()
+    vm.flush()
 
     # Redefine print in this function to use stderr.
-    nprint = functools.partial(print, file=sys.stderr)
+    nprint = functools.partial(print, file=file if file is not None else sys.stderr)
 
     verbose = settings.volume == VOLUME_VERBOSE
     if verbose:
@@ -373,39 +649,66 @@ def dump_state(vm: VirtualMachine, settings: Settings) -> None:
 
 
 FLAGS = {
+    "--allow-eval",
     "--big-stack",
     "--code",
     "--credits",
     "--data",
+    "--detect-loops",
+    "--engine",
     "--help",
     "--init",
+    "--inputs",
+    "--jobs",
+    "--lazy-flags",
+    "--memory",
     "--no-color",
     "--no-debug-ops",
     "--obfuscate",
+    "--optimize",
+    "--output",
+    "--profile",
     "--quiet",
+    "--socket",
     "--stdout",
     "--throttle",
+    "--timeout",
     "--verbose",
     "--version",
     "--warn-octal-off",
     "--warn-return-off",
     "assemble",
+    "batch",
+    "compile",
     "debug",
     "disassemble",
     "preprocess",
+    "serve",
 }
 
 # Map from flag names to compatible modes, e.g. "--big-stack" is only compatible with
-# the run, debug and assemble modes.
+# the run, debug, assemble, compile, batch and serve modes.
 PICKY_FLAGS = {
-    "--big-stack": ["", "debug", "assemble"],
+    "--allow-eval": ["serve"],
+    "--big-stack": ["", "debug", "assemble", "compile", "batch", "serve"],
+    "--detect-loops": [""],
+    "--engine": [""],
+    "--inputs": [""],
+    "--jobs": ["", "batch", "serve"],
+    "--lazy-flags": [""],
+    "--memory": ["", "debug", "batch", "serve"],
     "--obfuscate": ["preprocess"],
-    "--throttle": [""],
-    "--warn-return-off": ["", "debug"],
+    "--optimize": ["", "batch", "serve"],
+    "--output": ["compile"],
+    "--profile": [""],
+    "--socket": ["serve"],
+    "--throttle": ["", "batch", "serve"],
+    "--timeout": ["batch", "serve"],
+    "--warn-return-off": ["", "debug", "batch", "serve"],
     "--code": ["assemble"],
     "--data": ["assemble"],
     "--stdout": ["assemble"],
-    "--init": ["", "debug"],
+    "--init": ["", "debug", "batch", "serve"],
 }
 
 CREDITS = (
@@ -423,6 +726,9 @@ Usage:
     hera assemble <path>
     hera preprocess <path>
     hera disassemble <path>
+    hera compile <path>
+    hera batch <path>...
+    hera serve [--socket <path>]
 
 Common options:
     -h, --help         Show this message and exit.
@@ -437,9 +743,27 @@ Common options:
 
 Interpreter and debugger options:
     --big-stack        Reserve more space for the stack.
+    --detect-loops     Stop the program with an error if it gets stuck in an infinite
+                       loop. Requires the interpreter engine.
+    --engine=<name>
+    --engine <name>    Execute the program with the given engine (interpreter,
+                       closure, jit or tiered). Does not apply to the debugger.
+    --lazy-flags       Only compute the flags of arithmetic operations when they are
+                       read. Requires the interpreter engine.
+    --memory=<name>
+    --memory <name>    Store the machine's memory in the given backend (list, array
+                       or paged). The default is list, or paged for the debugger.
+    --optimize         Apply load-time optimizations before running the program.
+    --profile          With the tiered engine, save the program's hot spots to
+                       <path>.hotness, and load them from there on later runs.
     --init=<str>
     --init <str>       Initialize registers with the given expression,
                        e.g. "r1=5, r2=6"
+    --inputs=<dir>
+    --inputs <dir>     Run the program once for each file in <dir>, with the file
+                       as standard input, and print the results in order.
+    -j, --jobs <n>     With --inputs, run the program in <n> processes at once. The
+                       default is one per CPU.
     --throttle=<n>
     --throttle <n>     Exit after <n> instructions have been executed.
     --warn-return-off  Do not print warnings for invalid RETURN addresses.
@@ -449,4 +773,31 @@ Assembler options:
     --data             Only output the assembled data.
     --stdout           Print the assembled program to stdout instead of creating
                        files.
+
+Batch options:
+    Batch mode runs each program (or each .hera file in a directory) with empty
+    standard input, and prints its result as a line of JSON. It also accepts
+    --big-stack, --init, --memory, --optimize, --throttle and --warn-return-off.
+
+    -j, --jobs <n>     Run <n> programs at once. The default is one per CPU.
+    --timeout=<s>
+    --timeout <s>      Stop each program after <s> seconds.
+
+Server options:
+    Server mode reads requests to run, check, assemble or disassemble programs as
+    lines of JSON, and writes a line of JSON in response to each. It also accepts
+    --big-stack, --init, --memory, --optimize, --throttle, --timeout and
+    --warn-return-off, as the defaults for the "run" requests.
+
+    --allow-eval       Allow the programs to use __eval, which executes arbitrary
+                       Python code in the server. Only use this with trusted clients.
+    -j, --jobs <n>     Handle <n> requests at once. The default is one per CPU.
+    --socket=<path>
+    --socket <path>    Listen for connections on the Unix socket at <path>
+                       instead of reading standard input.
+
+Compiler options:
+    -o, --output <path>
+                       Write the compiled Python module to <path> instead of
+                       <name>_hera.py. Use "-" for stdout.
 """
@@ -0,0 +1,83 @@
+"""
+Paged memory with copy-on-write snapshots.
+
+`PagedMemory` splits the 2**16 words of the virtual machine's memory into fixed-size
+pages. Copying a `PagedMemory` object only copies the list of pages, which is then
+shared between the original and the copy, and a page is not copied until one of them
+writes to it. A snapshot of the virtual machine (see `VirtualMachine.copy`) thus only
+pays for the pages that are written after it is taken, rather than for the whole of
+memory, which keeps the debugger's undo history cheap.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+
+
+# The number of bits of a memory address that index into a page.
+PAGE_BITS = 8
+PAGE_SIZE = 2 ** PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+PAGE_COUNT = 2 ** 16 // PAGE_SIZE
+
+
+class PagedMemory:
+    """
+    The memory of a virtual machine, as a list of pages of `PAGE_SIZE` words each.
+
+    Supports the same indexing operations as the list that the virtual machine uses by
+    default, but always has all 2**16 words.
+    """
+
+    def __init__(self) -> None:
+        # Every page starts off as the same page of zeros, which is copied on the first
+        # write.
+        zeros = [0] * PAGE_SIZE
+        self.pages = [zeros] * PAGE_COUNT
+        # Whether each page belongs to this object alone, i.e. is safe to write to.
+        self.owned = [False] * PAGE_COUNT
+
+    def __copy__(self) -> "PagedMemory":
+        ret = PagedMemory.__new__(PagedMemory)
+        ret.pages = self.pages.copy()
+        ret.owned = [False] * PAGE_COUNT
+        # The pages are now shared, so the original must copy them before writing too.
+        self.owned = [False] * PAGE_COUNT
+        return ret
+
+    def __len__(self) -> int:
+        return PAGE_SIZE * PAGE_COUNT
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.tolist()[index]
+        else:
+            return self.pages[index >> PAGE_BITS][index & PAGE_MASK]
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            for i, v in zip(range(*index.indices(len(self))), value):
+                self.store(i, v)
+        else:
+            self.store(index, value)
+
+    def __iter__(self):
+        for page in self.pages:
+            yield from page
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PagedMemory):
+            return self.pages == other.pages
+        else:
+            return NotImplemented
+
+    def store(self, address: int, value: int) -> None:
+        """Store a value to a location in memory, copying its page if necessary."""
+        page = address >> PAGE_BITS
+        if not self.owned[page]:
+            self.pages[page] = self.pages[page].copy()
+            self.owned[page] = True
+        self.pages[page][address & PAGE_MASK] = value
+
+    def tolist(self) -> "List[int]":
+        """Return the contents of memory as a list."""
+        return [word for page in self.pages for word in page]
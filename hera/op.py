@@ -14,6 +14,10 @@ its subclasses. A class for a HERA op typically needs to define only three thing
     - An `execute` method that takes a `VirtualMachine` object and performs its
       operation on it.
 
+Frequently-executed operations may also override the `compile` method, which is used by
+the closure engine to bind the operation's arguments into a specialized closure ahead of
+time. The default implementation of `compile` simply calls `execute`.
+
 Many subclasses of `AbstractOperation` are provided to ease implementation further, such
 as `UnaryOp`, `BinaryOp`, `RegisterBranch`, and `RelativeBranch`.
 
@@ -36,11 +40,23 @@ Version: July 2019
 import json
 import sys
 from contextlib import suppress
+from functools import lru_cache
+from types import CodeType
 
 from hera import stdlib
 from hera.data import Constant, DataLabel, HERAError, Label, Location, Messages, Token
-from hera.utils import format_int, from_u16, print_error, print_warning, to_u16, to_u32
-from hera.vm import VirtualMachine
+from hera.utils import format_int, from_u16, to_u16, to_u32
+from hera.vm import (
+    FLAG_CARRY,
+    FLAG_CARRY_BLOCK,
+    FLAG_OVERFLOW,
+    FLAG_SIGN,
+    FLAG_ZERO,
+    HALTED_PC,
+    ZERO_SIGN,
+    VirtualMachine,
+    WaitingForInput,
+)
 
 
 class AbstractOperation:
@@ -52,6 +68,22 @@ class AbstractOperation:
     # Default value supplied to silence mypy's complaints.
     BITV = ""
 
+    # The method that executes the operation in lazy-flags mode, in which the carry and
+    # overflow flags set by arithmetic operations are recorded in `vm.pending_flags` and
+    # only computed when they are needed (see `VirtualMachine.run_lazy`). Arithmetic
+    # operations define it to defer their own flags, and operations that neither read
+    # nor write the carry and overflow flags set it to `execute`. For all other
+    # operations, it is None, and the pending flags are computed before `execute` is
+    # called.
+    execute_lazy = None  # type: Optional[Callable[[Any, VirtualMachine], None]]
+
+    # The index of the argument that is the destination register, for operations that
+    # write their result to a register. Such operations store the result directly in
+    # `vm.registers` rather than going through `VirtualMachine.store_register`, so if
+    # the destination is R0 or R15, the operation is specialized when it is constructed
+    # to execute with the checks that `store_register` would have done.
+    DESTINATION = None  # type: Optional[int]
+
     def __init__(self, *args, loc=None):
         self.args = [a.value for a in args]
         self.tokens = list(args)
@@ -67,6 +99,12 @@ class AbstractOperation:
         else:
             self.loc = None
 
+        if self.DESTINATION is not None and len(self.args) > self.DESTINATION:
+            if self.args[self.DESTINATION] in (0, 15):
+                self.execute = self.execute_checked
+                if self.execute_lazy is not None:
+                    self.execute_lazy = self.execute_lazy_checked
+
     def typecheck(
         self, symbol_table: "Dict[str, int]", *, assembly_only: bool = False
     ) -> Messages:
@@ -114,6 +152,40 @@ class AbstractOperation:
         """
         raise NotImplementedError
 
+    def execute_checked(self, vm: VirtualMachine) -> None:
+        """
+        Execute the operation, and then discard or check the value that it stored in its
+        destination register. Replaces `execute` when the destination is R0 or R15.
+        """
+        type(self).execute(self, vm)
+        vm.check_register(self.args[self.DESTINATION])
+
+    def execute_lazy_checked(self, vm: VirtualMachine) -> None:
+        """Like `execute_checked`, but for `execute_lazy`."""
+        type(self).execute_lazy(self, vm)
+        vm.check_register(self.args[self.DESTINATION])
+
+    def compile(self, pc: int) -> "Callable[[VirtualMachine], int]":
+        """
+        Compile the operation, located at instruction number `pc`, into a closure that
+        takes a virtual machine, executes the operation on it, and returns the next
+        value of the program counter (or `HALTED_PC` if the machine halted).
+
+        Subclasses do not need to override this method, since the default closure just
+        calls `execute`. Frequently-executed operations override it so that their
+        arguments are unpacked once at compile time instead of on every execution.
+        """
+        execute = self.execute
+        loc = self.loc
+
+        def closure(vm):
+            vm.pc = pc
+            vm.location = loc
+            execute(vm)
+            return HALTED_PC if vm.halted else vm.pc
+
+        return closure
+
     def __getattr__(self, name):
         if name == "name":
             return self.__class__.__name__
@@ -167,14 +239,36 @@ class UnaryOp(AbstractOperation):
     """
 
     P = (REGISTER, REGISTER)
+    DESTINATION = 0
 
     def execute(self, vm):
         arg = vm.load_register(self.args[1])
         result = self.calculate(vm, arg)
         vm.set_zero_and_sign(result)
-        vm.store_register(self.args[0], result)
+        vm.registers[self.args[0]] = result
         vm.pc += 1
 
+    def compile(self, pc):
+        target, source = self.args
+        calculate = self.calculate
+        # Writes to R0 and R15 go through `store_register`, since the former must be
+        # discarded and the latter must be checked for stack overflow.
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            result = calculate(vm, vm.registers[source])
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                vm.registers[target] = result
+            return nxt
+
+        return closure
+
     @staticmethod
     def calculate(vm, arg):
         """
@@ -193,15 +287,36 @@ class BinaryOp(AbstractOperation):
     """
 
     P = (REGISTER, REGISTER, REGISTER)
+    DESTINATION = 0
 
     def execute(self, vm):
         left = vm.load_register(self.args[1])
         right = vm.load_register(self.args[2])
         result = self.calculate(vm, left, right)
         vm.set_zero_and_sign(result)
-        vm.store_register(self.args[0], result)
+        vm.registers[self.args[0]] = result
         vm.pc += 1
 
+    def compile(self, pc):
+        target, left, right = self.args
+        calculate = self.calculate
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = calculate(vm, registers[left], registers[right])
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
     @staticmethod
     def calculate(vm, left, right):
         """
@@ -215,7 +330,10 @@ class BinaryOp(AbstractOperation):
 
 
 class Branch(AbstractOperation):
-    pass
+    # The truth table of the branch condition, i.e. the value of `should` for each of
+    # the 32 possible values of `VirtualMachine.flags`. Filled in by `truth_table` at
+    # the bottom of this module.
+    TABLE = ()  # type: Tuple[bool, ...]
 
 
 class RegisterBranch(Branch):
@@ -227,11 +345,21 @@ class RegisterBranch(Branch):
     P = (REGISTER_OR_LABEL,)
 
     def execute(self, vm):
-        if self.should(vm):
+        if self.TABLE[vm.flags]:
             vm.pc = vm.load_register(self.args[0])
         else:
             vm.pc += 1
 
+    def compile(self, pc):
+        register = self.args[0]
+        table = self.TABLE
+        nxt = pc + 1
+
+        def closure(vm):
+            return vm.registers[register] if table[vm.flags] else nxt
+
+        return closure
+
     @staticmethod
     def should(vm):
         """
@@ -263,11 +391,21 @@ class RelativeBranch(Branch):
     P = (I8_OR_LABEL,)
 
     def execute(self, vm):
-        if self.should(vm):
+        if self.TABLE[vm.flags]:
             vm.pc += self.args[0]
         else:
             vm.pc += 1
 
+    def compile(self, pc):
+        target = pc + self.args[0]
+        table = self.TABLE
+        nxt = pc + 1
+
+        def closure(vm):
+            return target if table[vm.flags] else nxt
+
+        return closure
+
     @staticmethod
     def should(vm):
         """
@@ -304,15 +442,32 @@ class SETLO(AbstractOperation):
 
     P = (REGISTER, I8)
     BITV = "1110 AAAA bbbbbbbb"
+    DESTINATION = 0
 
     def execute(self, vm):
         value = self.args[1]
         if value > 127:
             value -= 256
 
-        vm.store_register(self.args[0], to_u16(value))
+        vm.registers[self.args[0]] = to_u16(value)
         vm.pc += 1
 
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, value = self.args
+        if target == 0 or target == 15:
+            return super().compile(pc)
+
+        value = to_u16(value - 256 if value > 127 else value)
+        nxt = pc + 1
+
+        def closure(vm):
+            vm.registers[target] = value
+            return nxt
+
+        return closure
+
 
 class SETHI(AbstractOperation):
     """
@@ -328,12 +483,30 @@ class SETHI(AbstractOperation):
 
     P = (REGISTER, I8)
     BITV = "1111 AAAA bbbbbbbb"
+    DESTINATION = 0
 
     def execute(self, vm):
         target, value = self.args
-        vm.store_register(target, (value << 8) + (vm.load_register(target) & 0x00FF))
+        vm.registers[target] = (value << 8) + (vm.load_register(target) & 0x00FF)
         vm.pc += 1
 
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, value = self.args
+        if target == 0 or target == 15:
+            return super().compile(pc)
+
+        high = value << 8
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            registers[target] = high + (registers[target] & 0x00FF)
+            return nxt
+
+        return closure
+
 
 class SET(AbstractOperation):
     """
@@ -385,15 +558,76 @@ class ADD(BinaryOp):
 
     @staticmethod
     def calculate(vm, left, right):
-        carry = 1 if not vm.flag_carry_block and vm.flag_carry else 0
+        flags = vm.flags
+        carry = 1 if flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) == FLAG_CARRY else 0
 
         result = (left + right + carry) & 0xFFFF
 
-        vm.flag_carry = result < (left + right + carry)
-        vm.flag_overflow = from_u16(result) != from_u16(left) + from_u16(right)
+        vm.flags = (
+            (flags & ~(FLAG_CARRY | FLAG_OVERFLOW))
+            | (FLAG_CARRY if result < (left + right + carry) else 0)
+            | (
+                FLAG_OVERFLOW
+                if from_u16(result) != from_u16(left) + from_u16(right)
+                else 0
+            )
+        )
 
         return result
 
+    def execute_lazy(self, vm):
+        target, a, b = self.args
+        left = vm.load_register(a)
+        right = vm.load_register(b)
+        # The carry-block flag is never deferred, so the pending flags only need to be
+        # computed if the carry flag will actually be used.
+        if vm.flags & FLAG_CARRY_BLOCK:
+            carry = 0
+        else:
+            vm.materialize_flags()
+            carry = 1 if vm.flags & FLAG_CARRY else 0
+
+        result = (left + right + carry) & 0xFFFF
+        vm.pending_flags = (add_flags, left, right, carry, result)
+        vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+        vm.registers[target] = result
+        vm.pc += 1
+
+    def compile(self, pc):
+        target, a, b = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            left = registers[a]
+            right = registers[b]
+            flags = vm.flags
+            total = left + right
+            if flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) == FLAG_CARRY:
+                total += 1
+            result = total & 0xFFFF
+
+            vm.flags = (
+                (flags & FLAG_CARRY_BLOCK)
+                | (FLAG_CARRY if total > 0xFFFF else 0)
+                | (
+                    FLAG_OVERFLOW
+                    if from_u16(result) != from_u16(left) + from_u16(right)
+                    else 0
+                )
+                | ZERO_SIGN[result]
+            )
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class SUB(BinaryOp):
     """
@@ -418,17 +652,74 @@ class SUB(BinaryOp):
 
     @staticmethod
     def calculate(vm, left, right):
-        borrow = 1 if not vm.flag_carry_block and not vm.flag_carry else 0
+        flags = vm.flags
+        borrow = 0 if flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) else 1
 
         # to_u16 is necessary because although left and right are necessarily
         # uints, left - right - borrow might not be.
         result = to_u16((left - right - borrow) & 0xFFFF)
 
-        vm.flag_carry = left >= (right + borrow)
-        vm.flag_overflow = from_u16(result) != from_u16(left) - from_u16(right) - borrow
+        vm.flags = (
+            (flags & ~(FLAG_CARRY | FLAG_OVERFLOW))
+            | (FLAG_CARRY if left >= (right + borrow) else 0)
+            | (
+                FLAG_OVERFLOW
+                if from_u16(result) != from_u16(left) - from_u16(right) - borrow
+                else 0
+            )
+        )
 
         return result
 
+    def execute_lazy(self, vm):
+        target, a, b = self.args
+        left = vm.load_register(a)
+        right = vm.load_register(b)
+        if vm.flags & FLAG_CARRY_BLOCK:
+            borrow = 0
+        else:
+            vm.materialize_flags()
+            borrow = 0 if vm.flags & FLAG_CARRY else 1
+
+        result = (left - right - borrow) & 0xFFFF
+        vm.pending_flags = (sub_flags, left, right, borrow, result)
+        vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+        vm.registers[target] = result
+        vm.pc += 1
+
+    def compile(self, pc):
+        target, a, b = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            left = registers[a]
+            right = registers[b]
+            flags = vm.flags
+            borrow = 0 if flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) else 1
+            result = (left - right - borrow) & 0xFFFF
+
+            vm.flags = (
+                (flags & FLAG_CARRY_BLOCK)
+                | (FLAG_CARRY if left >= right + borrow else 0)
+                | (
+                    FLAG_OVERFLOW
+                    if from_u16(result) != from_u16(left) - from_u16(right) - borrow
+                    else 0
+                )
+                | ZERO_SIGN[result]
+            )
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class MUL(BinaryOp):
     """
@@ -485,10 +776,31 @@ class AND(BinaryOp):
 
     BITV = "1000 AAAA BBBB CCCC"
 
+    execute_lazy = BinaryOp.execute
+
     @staticmethod
     def calculate(vm, left, right):
         return left & right
 
+    def compile(self, pc):
+        target, a, b = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = registers[a] & registers[b]
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class OR(BinaryOp):
     """
@@ -500,10 +812,31 @@ class OR(BinaryOp):
 
     BITV = "1001 AAAA BBBB CCCC"
 
+    execute_lazy = BinaryOp.execute
+
     @staticmethod
     def calculate(vm, left, right):
         return left | right
 
+    def compile(self, pc):
+        target, a, b = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = registers[a] | registers[b]
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class XOR(BinaryOp):
     """
@@ -515,10 +848,31 @@ class XOR(BinaryOp):
 
     BITV = "1101 AAAA BBBB CCCC"
 
+    execute_lazy = BinaryOp.execute
+
     @staticmethod
     def calculate(vm, left, right):
         return left ^ right
 
+    def compile(self, pc):
+        target, a, b = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = registers[a] ^ registers[b]
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class INC(AbstractOperation):
     """
@@ -530,19 +884,66 @@ class INC(AbstractOperation):
 
     P = (REGISTER, range(1, 65))
     BITV = "0011 AAAA 10bb bbbb"
+    DESTINATION = 0
 
     def execute(self, vm):
         target, value = self.args
 
         original = vm.load_register(target)
         result = (value + original) & 0xFFFF
-        vm.store_register(target, result)
+        vm.registers[target] = result
 
-        vm.set_zero_and_sign(result)
-        vm.flag_overflow = from_u16(result) != from_u16(original) + value
-        vm.flag_carry = value + original >= 2 ** 16
+        vm.flags = (
+            (vm.flags & FLAG_CARRY_BLOCK)
+            | (FLAG_CARRY if value + original >= 2 ** 16 else 0)
+            | (FLAG_OVERFLOW if from_u16(result) != from_u16(original) + value else 0)
+            | ZERO_SIGN[result]
+        )
+        vm.pc += 1
+
+    def execute_lazy(self, vm):
+        target, value = self.args
+
+        original = vm.load_register(target)
+        result = (value + original) & 0xFFFF
+        vm.registers[target] = result
+
+        # INC sets the same flags as an ADD with the carry flag off.
+        vm.pending_flags = (add_flags, original, value, 0, result)
+        vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
         vm.pc += 1
 
+    def compile(self, pc):
+        target, value = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            original = registers[target]
+            total = original + value
+            result = total & 0xFFFF
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+
+            vm.flags = (
+                (vm.flags & FLAG_CARRY_BLOCK)
+                | (FLAG_CARRY if total > 0xFFFF else 0)
+                | (
+                    FLAG_OVERFLOW
+                    if from_u16(result) != from_u16(original) + value
+                    else 0
+                )
+                | ZERO_SIGN[result]
+            )
+            return nxt
+
+        return closure
+
     def assemble(self):
         # The increment value encoded in the instruction is one less than the actual
         # increment, i.e. INC(R1, 1) is assembled as if it were INC(R1, 0) since the
@@ -565,19 +966,65 @@ class DEC(AbstractOperation):
 
     P = (REGISTER, range(1, 65))
     BITV = "0011 AAAA 11bb bbbb"
+    DESTINATION = 0
 
     def execute(self, vm):
         target, value = self.args
 
         original = vm.load_register(target)
         result = to_u16((original - value) & 0xFFFF)
-        vm.store_register(target, result)
+        vm.registers[target] = result
 
-        vm.set_zero_and_sign(result)
-        vm.flag_overflow = from_u16(result) != from_u16(original) - value
-        vm.flag_carry = original >= value
+        vm.flags = (
+            (vm.flags & FLAG_CARRY_BLOCK)
+            | (FLAG_CARRY if original >= value else 0)
+            | (FLAG_OVERFLOW if from_u16(result) != from_u16(original) - value else 0)
+            | ZERO_SIGN[result]
+        )
         vm.pc += 1
 
+    def execute_lazy(self, vm):
+        target, value = self.args
+
+        original = vm.load_register(target)
+        result = (original - value) & 0xFFFF
+        vm.registers[target] = result
+
+        # DEC sets the same flags as a SUB with the carry flag on.
+        vm.pending_flags = (sub_flags, original, value, 0, result)
+        vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+        vm.pc += 1
+
+    def compile(self, pc):
+        target, value = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            original = registers[target]
+            result = (original - value) & 0xFFFF
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+
+            vm.flags = (
+                (vm.flags & FLAG_CARRY_BLOCK)
+                | (FLAG_CARRY if original >= value else 0)
+                | (
+                    FLAG_OVERFLOW
+                    if from_u16(result) != from_u16(original) - value
+                    else 0
+                )
+                | ZERO_SIGN[result]
+            )
+            return nxt
+
+        return closure
+
     def assemble(self):
         # The decrement value encoded in the instruction is one less than the actual
         # decrement, i.e. DEC(R1, 1) is assembled as if it were DEC(R1, 0) since the
@@ -647,6 +1094,8 @@ class LSL8(UnaryOp):
 
     BITV = "0011 AAAA 0010 BBBB"
 
+    execute_lazy = UnaryOp.execute
+
     @staticmethod
     def calculate(vm, arg):
         return (arg << 8) & 0xFFFF
@@ -663,6 +1112,8 @@ class LSR8(UnaryOp):
 
     BITV = "0011 AAAA 0011 BBBB"
 
+    execute_lazy = UnaryOp.execute
+
     @staticmethod
     def calculate(vm, arg):
         return arg >> 8
@@ -739,16 +1190,11 @@ class SAVEF(AbstractOperation):
 
     P = (REGISTER,)
     BITV = "0011 AAAA 0111 0000"
+    DESTINATION = 0
 
     def execute(self, vm):
-        value = (
-            int(vm.flag_sign)
-            + 2 * int(vm.flag_zero)
-            + 4 * int(vm.flag_overflow)
-            + 8 * int(vm.flag_carry)
-            + 16 * int(vm.flag_carry_block)
-        )
-        vm.store_register(self.args[0], value)
+        # The virtual machine stores the flags in the same format.
+        vm.registers[self.args[0]] = vm.flags
         vm.pc += 1
 
 
@@ -765,12 +1211,7 @@ class RSTRF(AbstractOperation):
     BITV = "0011 AAAA 0111 1000"
 
     def execute(self, vm):
-        value = vm.load_register(self.args[0])
-        vm.flag_sign = bool(value & 1)
-        vm.flag_zero = bool(value & 0b10)
-        vm.flag_overflow = bool(value & 0b100)
-        vm.flag_carry = bool(value & 0b1000)
-        vm.flag_carry_block = bool(value & 0b10000)
+        vm.flags = vm.load_register(self.args[0]) & 0b11111
         vm.pc += 1
 
 
@@ -790,14 +1231,24 @@ class FON(AbstractOperation):
     BITV = "0011 000a 0110 aaaa"
 
     def execute(self, vm):
-        value = self.args[0]
-        vm.flag_sign = vm.flag_sign or bool(value & 1)
-        vm.flag_zero = vm.flag_zero or bool(value & 0b10)
-        vm.flag_overflow = vm.flag_overflow or bool(value & 0b100)
-        vm.flag_carry = vm.flag_carry or bool(value & 0b1000)
-        vm.flag_carry_block = vm.flag_carry_block or bool(value & 0b10000)
+        vm.flags |= self.args[0]
         vm.pc += 1
 
+    def execute_lazy(self, vm):
+        if self.args[0] & (FLAG_CARRY | FLAG_OVERFLOW):
+            vm.materialize_flags()
+        self.execute(vm)
+
+    def compile(self, pc):
+        value = self.args[0]
+        nxt = pc + 1
+
+        def closure(vm):
+            vm.flags |= value
+            return nxt
+
+        return closure
+
 
 class FOFF(AbstractOperation):
     """
@@ -810,14 +1261,19 @@ class FOFF(AbstractOperation):
     BITV = "0011 100a 0110 aaaa"
 
     def execute(self, vm):
-        value = self.args[0]
-        vm.flag_sign = vm.flag_sign and not bool(value & 1)
-        vm.flag_zero = vm.flag_zero and not bool(value & 0b10)
-        vm.flag_overflow = vm.flag_overflow and not bool(value & 0b100)
-        vm.flag_carry = vm.flag_carry and not bool(value & 0b1000)
-        vm.flag_carry_block = vm.flag_carry_block and not bool(value & 0b10000)
+        vm.flags &= ~self.args[0]
         vm.pc += 1
 
+    def compile(self, pc):
+        mask = ~self.args[0]
+        nxt = pc + 1
+
+        def closure(vm):
+            vm.flags &= mask
+            return nxt
+
+        return closure
+
 
 class FSET5(AbstractOperation):
     """
@@ -830,12 +1286,7 @@ class FSET5(AbstractOperation):
     BITV = "0011 010a 0110 aaaa"
 
     def execute(self, vm):
-        value = self.args[0]
-        vm.flag_sign = bool(value & 1)
-        vm.flag_zero = bool(value & 0b10)
-        vm.flag_overflow = bool(value & 0b100)
-        vm.flag_carry = bool(value & 0b1000)
-        vm.flag_carry_block = bool(value & 0b10000)
+        vm.flags = self.args[0]
         vm.pc += 1
 
 
@@ -849,11 +1300,7 @@ class FSET4(AbstractOperation):
     BITV = "0011 110a 0110 aaaa"
 
     def execute(self, vm):
-        value = self.args[0]
-        vm.flag_sign = bool(value & 1)
-        vm.flag_zero = bool(value & 0b10)
-        vm.flag_overflow = bool(value & 0b100)
-        vm.flag_carry = bool(value & 0b1000)
+        vm.flags = (vm.flags & FLAG_CARRY_BLOCK) | self.args[0]
         vm.pc += 1
 
 
@@ -869,15 +1316,37 @@ class LOAD(AbstractOperation):
 
     P = (REGISTER, U5, REGISTER)
     BITV = "010b AAAA bbbb CCCC"
+    DESTINATION = 0
 
     def execute(self, vm):
         target, offset, address = self.args
 
         result = vm.load_memory(vm.load_register(address) + offset)
         vm.set_zero_and_sign(result)
-        vm.store_register(target, result)
+        vm.registers[target] = result
         vm.pc += 1
 
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, offset, address = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = vm.load_memory(registers[address] + offset)
+            vm.flags = vm.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[result]
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
 
 class STORE(AbstractOperation):
     """
@@ -897,6 +1366,19 @@ class STORE(AbstractOperation):
         vm.store_memory(vm.load_register(address) + offset, vm.load_register(source))
         vm.pc += 1
 
+    execute_lazy = execute
+
+    def compile(self, pc):
+        source, offset, address = self.args
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            vm.store_memory(registers[address] + offset, registers[source])
+            return nxt
+
+        return closure
+
 
 class BR(RegisterBranch):
     """
@@ -912,6 +1394,19 @@ class BR(RegisterBranch):
     def should(vm):
         return True
 
+    def execute(self, vm):
+        vm.pc = vm.load_register(self.args[0])
+
+    execute_lazy = execute
+
+    def compile(self, pc):
+        register = self.args[0]
+
+        def closure(vm):
+            return vm.registers[register]
+
+        return closure
+
 
 class BRR(RelativeBranch):
     """
@@ -929,6 +1424,24 @@ class BRR(RelativeBranch):
         else:
             vm.halted = True
 
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target = pc + self.args[0]
+        if target == pc:
+
+            def closure(vm):
+                vm.halted = True
+                vm.pc = pc
+                return HALTED_PC
+
+        else:
+
+            def closure(vm):
+                return target
+
+        return closure
+
 
 class BL(RegisterBranch):
     """
@@ -1411,9 +1924,11 @@ class CALL(CALL_AND_RETURN):
 
     def execute(self, vm):
         # Push a (call_address, return_address) pair onto the debugging call stack.
-        vm.expected_returns.append((vm.load_register(self.args[1]), vm.pc + 1))
+        vm.expected_returns.push(vm.load_register(self.args[1]), vm.pc + 1)
         super().execute(vm)
 
+    execute_lazy = execute
+
 
 class RETURN(CALL_AND_RETURN):
     """
@@ -1445,24 +1960,29 @@ class RETURN(CALL_AND_RETURN):
         return messages
 
     def execute(self, vm):
-        got = vm.load_register(self.args[1])
-        if vm.settings.warn_return_on:
-            if vm.expected_returns:
-                _, expected = vm.expected_returns.pop()
-                if expected != got:
-                    msg = "incorrect return address (got {}, expected {})".format(
-                        got, expected
-                    )
-                    print_warning(vm.settings, msg, loc=vm.location)
-                    vm.settings.warning_count += 1
-            else:
-                msg = "incorrect return address (got {}, expected <nothing>)".format(
-                    got
-                )
-                print_warning(vm.settings, msg, loc=vm.location)
-                vm.settings.warning_count += 1
+        self.check_return_address(vm, vm.load_register(self.args[1]))
         super().execute(vm)
 
+    execute_lazy = execute
+
+    @staticmethod
+    def check_return_address(vm, got):
+        """
+        Pop the most recent CALL off the call stack, and warn if `got` is not its return
+        address, when return warnings are enabled.
+        """
+        if vm.expected_returns:
+            call = vm.expected_returns.pop()
+            # The call may have been forgotten if the call stack was full.
+            if vm.settings.warn_return_on and call is not None and call[1] != got:
+                msg = "incorrect return address (got {}, expected {})".format(
+                    got, call[1]
+                )
+                vm.warn(msg, vm.location)
+        elif vm.settings.warn_return_on:
+            msg = "incorrect return address (got {}, expected <nothing>)".format(got)
+            vm.warn(msg, vm.location)
+
 
 class SWI(AbstractOperation):
     """
@@ -1802,7 +2322,7 @@ class PRINT_REG(DebuggingOperation):
 
     def execute(self, vm):
         v = vm.load_register(self.args[0])
-        print("R{} = {}".format(self.args[0], format_int(v)))
+        vm.print("R{} = {}".format(self.args[0], format_int(v)))
         vm.pc += 1
 
 
@@ -1817,7 +2337,7 @@ class PRINT(DebuggingOperation):
     P = (STRING,)
 
     def execute(self, vm):
-        print(self.args[0], end="")
+        vm.print(self.args[0], end="")
         vm.pc += 1
 
 
@@ -1832,22 +2352,530 @@ class PRINTLN(DebuggingOperation):
     P = (STRING,)
 
     def execute(self, vm):
-        print(self.args[0])
+        vm.print(self.args[0])
         vm.pc += 1
 
 
 class __EVAL(DebuggingOperation):
     P = (STRING,)
 
+    def __init__(self, *args, loc=None):
+        super().__init__(*args, loc=loc)
+        # The expression is compiled once when the program is loaded, instead of every
+        # time that the operation is executed.
+        self.code = compile_eval(self.args[0]) if len(self.args) == 1 else None
+
     def execute(self, vm):
         try:
-            eval(self.args[0], {}, {"stdlib": stdlib, "vm": vm})
+            eval(self.code, {}, eval_namespace(vm))
+        except WaitingForInput:
+            raise
         except Exception as e:
-            print_error(vm.settings, "Python exception: " + str(e), loc=vm.location)
+            vm.error("Python exception: " + str(e), vm.location)
             sys.exit(3)
         vm.pc += 1
 
 
+def eval_namespace(vm) -> "Dict[str, Any]":
+    """
+    Return the local namespace for the expression of an __eval operation. `print` is
+    the virtual machine's, so that the expression prints to its output.
+    """
+    return {"stdlib": stdlib, "vm": vm, "print": vm.print}
+
+
+@lru_cache(maxsize=256)
+def compile_eval(source: str) -> "Union[CodeType, str]":
+    """
+    Return the code object for the Python expression of an __eval operation. If the
+    expression cannot be compiled, return it unchanged, so that the error is reported
+    when the operation is executed.
+
+    The cache is bounded, since a long-running server compiles the expressions of every
+    program that its clients send.
+    """
+    try:
+        return compile(source, "<string>", "eval")
+    except (SyntaxError, TypeError, ValueError):
+        return source
+
+
+class __INTRINSIC(DebuggingOperation):
+    """
+    __intrinsic(name)
+      Call one of the Python functions that implement the Tiger standard library (see
+      `INTRINSICS` in hera/stdlib.py) on the virtual machine. Equivalent to
+      __eval("stdlib.<name>(vm)"), but the function is looked up once, when the
+      program is loaded.
+    """
+
+    P = (STRING,)
+
+    def __init__(self, *args, loc=None):
+        super().__init__(*args, loc=loc)
+        self.function = (
+            stdlib.INTRINSICS.get(self.args[0]) if len(self.args) == 1 else None
+        )
+
+    def typecheck(self, *args, **kwargs):
+        messages = super().typecheck(*args, **kwargs)
+        if not messages.errors and self.function is None:
+            messages.err("unknown intrinsic", self.tokens[0])
+        return messages
+
+    def execute(self, vm):
+        try:
+            self.function(vm)
+        except WaitingForInput:
+            raise
+        except Exception as e:
+            vm.error("Python exception: " + str(e), vm.location)
+            sys.exit(3)
+        vm.pc += 1
+
+    # The standard library functions do not touch the flags.
+    execute_lazy = execute
+
+
+class FusedOperation(AbstractOperation):
+    """
+    Abstract class for superinstructions, which stand in for a short sequence of real
+    operations that the preprocessor commonly generates, e.g. the SETLO and SETHI
+    that a SET expands to. Superinstructions are never written by the user; they are
+    substituted by the optimizer in `hera/optimizer.py`.
+
+    A superinstruction executes its entire sequence and advances the program counter
+    past it. The optimizer only replaces the first operation of the sequence, so the
+    program counter of every operation is unchanged and a jump into the middle of the
+    sequence still lands on the original operations.
+    """
+
+    def __init__(self, *parts):
+        super().__init__(loc=parts[0].loc)
+        self.parts = list(parts)
+        self.original = parts[0].original
+
+    def assemble(self):
+        return b"".join(part.assemble() for part in self.parts)
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and self.parts == other.parts
+
+    def __repr__(self):
+        return "{}({})".format(self.name, ", ".join(repr(p) for p in self.parts))
+
+    def __str__(self):
+        return "{}({})".format(self.name, "; ".join(str(p) for p in self.parts))
+
+
+class FUSED_SET(FusedOperation):
+    """
+    SETLO(Rd, lo) followed by SETHI(Rd, hi), for any Rd other than R0 and R15.
+    """
+
+    def __init__(self, setlo, sethi):
+        super().__init__(setlo, sethi)
+        self.target = setlo.args[0]
+        self.value = (sethi.args[1] << 8) + (setlo.args[1] & 0xFF)
+
+    def execute(self, vm):
+        vm.registers[self.target] = self.value
+        vm.pc += 2
+
+    def compile(self, pc):
+        target = self.target
+        value = self.value
+        nxt = pc + 2
+
+        def closure(vm):
+            vm.registers[target] = value
+            return nxt
+
+        return closure
+
+
+class FUSED_SET_BRANCH(FusedOperation):
+    """
+    SETLO(R11, lo), SETHI(R11, hi) and a register branch on R11, which is what a branch
+    to a label is preprocessed into.
+    """
+
+    def __init__(self, setlo, sethi, branch):
+        super().__init__(setlo, sethi, branch)
+        self.value = (sethi.args[1] << 8) + (setlo.args[1] & 0xFF)
+        self.table = branch.TABLE
+
+    def execute(self, vm):
+        vm.registers[11] = self.value
+        if self.table[vm.flags]:
+            vm.pc = self.value
+        else:
+            vm.pc += 3
+
+    def compile(self, pc):
+        value = self.value
+        table = self.table
+        nxt = pc + 3
+
+        def closure(vm):
+            vm.registers[11] = value
+            return value if table[vm.flags] else nxt
+
+        return closure
+
+
+class FUSED_SET_CALL(FusedOperation):
+    """
+    SETLO(R13, lo), SETHI(R13, hi) and CALL(Ra, R13), which is what a call to a label is
+    preprocessed into.
+    """
+
+    def __init__(self, setlo, sethi, call):
+        super().__init__(setlo, sethi, call)
+        self.value = (sethi.args[1] << 8) + (setlo.args[1] & 0xFF)
+        self.call = call
+
+    def execute(self, vm):
+        vm.registers[13] = self.value
+        vm.pc += 2
+        self.call.execute(vm)
+
+    def compile(self, pc):
+        value = self.value
+        call = self.call.execute
+        loc = self.loc
+        call_pc = pc + 2
+
+        def closure(vm):
+            vm.registers[13] = value
+            vm.pc = call_pc
+            vm.location = loc
+            call(vm)
+            return vm.pc
+
+        return closure
+
+
+class FUSED_CMP(FusedOperation):
+    """
+    FON(8) followed by SUB(R0, Ra, Rb), which is what CMP(Ra, Rb) is preprocessed into.
+    Since the carry flag is always set before the subtraction, no borrow can occur.
+    """
+
+    def __init__(self, fon, sub):
+        super().__init__(fon, sub)
+        self.left = sub.args[1]
+        self.right = sub.args[2]
+
+    def execute(self, vm):
+        left = vm.registers[self.left]
+        right = vm.registers[self.right]
+        result = (left - right) & 0xFFFF
+        vm.flags = (
+            (vm.flags & FLAG_CARRY_BLOCK)
+            | (FLAG_CARRY if left >= right else 0)
+            | (
+                FLAG_OVERFLOW
+                if from_u16(result) != from_u16(left) - from_u16(right)
+                else 0
+            )
+            | ZERO_SIGN[result]
+        )
+        vm.pc += 2
+
+    def compile(self, pc):
+        a = self.left
+        b = self.right
+        nxt = pc + 2
+
+        def closure(vm):
+            registers = vm.registers
+            left = registers[a]
+            right = registers[b]
+            result = (left - right) & 0xFFFF
+            vm.flags = (
+                (vm.flags & FLAG_CARRY_BLOCK)
+                | (FLAG_CARRY if left >= right else 0)
+                | (
+                    FLAG_OVERFLOW
+                    if from_u16(result) != from_u16(left) - from_u16(right)
+                    else 0
+                )
+                | ZERO_SIGN[result]
+            )
+            return nxt
+
+        return closure
+
+
+class FlaglessOperation(AbstractOperation):
+    """
+    Abstract class for variants of operations that do not set any flags, which the
+    optimizer in `hera/optimizer.py` substitutes for operations whose flags are always
+    overwritten before they are read. Like superinstructions, they are never written by
+    the user.
+    """
+
+    DESTINATION = 0
+
+    def __init__(self, op):
+        super().__init__(*op.tokens, loc=op.loc)
+        self.op = op
+        self.original = op.original
+
+    def assemble(self):
+        return self.op.assemble()
+
+
+class FlaglessBinaryOp(FlaglessOperation):
+    """
+    Abstract class for flag-free variants of binary operations. Child classes only need
+    to implement the calculate method, which must not set any flags.
+    """
+
+    def execute(self, vm):
+        left = vm.load_register(self.args[1])
+        right = vm.load_register(self.args[2])
+        vm.registers[self.args[0]] = self.calculate(vm, left, right)
+        vm.pc += 1
+
+    def compile(self, pc):
+        target, left, right = self.args
+        calculate = self.calculate
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = calculate(vm, registers[left], registers[right])
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
+    @staticmethod
+    def calculate(vm, left, right):
+        raise NotImplementedError
+
+
+class FLAGLESS_ADD(FlaglessBinaryOp):
+    """ADD(Rd, Ra, Rb), without setting any flags."""
+
+    @staticmethod
+    def calculate(vm, left, right):
+        carry = 1 if vm.flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) == FLAG_CARRY else 0
+        return (left + right + carry) & 0xFFFF
+
+
+class FLAGLESS_SUB(FlaglessBinaryOp):
+    """SUB(Rd, Ra, Rb), without setting any flags."""
+
+    @staticmethod
+    def calculate(vm, left, right):
+        borrow = 0 if vm.flags & (FLAG_CARRY | FLAG_CARRY_BLOCK) else 1
+        return (left - right - borrow) & 0xFFFF
+
+
+class FLAGLESS_AND(FlaglessBinaryOp):
+    """AND(Rd, Ra, Rb), without setting any flags."""
+
+    calculate = staticmethod(AND.calculate)
+    execute_lazy = FlaglessBinaryOp.execute
+
+
+class FLAGLESS_OR(FlaglessBinaryOp):
+    """OR(Rd, Ra, Rb), without setting any flags."""
+
+    calculate = staticmethod(OR.calculate)
+    execute_lazy = FlaglessBinaryOp.execute
+
+
+class FLAGLESS_XOR(FlaglessBinaryOp):
+    """XOR(Rd, Ra, Rb), without setting any flags."""
+
+    calculate = staticmethod(XOR.calculate)
+    execute_lazy = FlaglessBinaryOp.execute
+
+
+class FLAGLESS_INC(FlaglessOperation):
+    """INC(Rd, v), without setting any flags."""
+
+    def execute(self, vm):
+        target, value = self.args
+        vm.registers[target] = (vm.load_register(target) + value) & 0xFFFF
+        vm.pc += 1
+
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, value = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = (registers[target] + value) & 0xFFFF
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
+
+class FLAGLESS_DEC(FlaglessOperation):
+    """DEC(Rd, v), without setting any flags."""
+
+    def execute(self, vm):
+        target, value = self.args
+        vm.registers[target] = (vm.load_register(target) - value) & 0xFFFF
+        vm.pc += 1
+
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, value = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = (registers[target] - value) & 0xFFFF
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
+
+class FLAGLESS_LOAD(FlaglessOperation):
+    """LOAD(Rd, o, Rb), without setting any flags."""
+
+    def execute(self, vm):
+        target, offset, address = self.args
+        vm.registers[target] = vm.load_memory(vm.load_register(address) + offset)
+        vm.pc += 1
+
+    execute_lazy = execute
+
+    def compile(self, pc):
+        target, offset, address = self.args
+        checked = target == 0 or target == 15
+        loc = self.loc
+        nxt = pc + 1
+
+        def closure(vm):
+            registers = vm.registers
+            result = vm.load_memory(registers[address] + offset)
+            if checked:
+                vm.location = loc
+                vm.store_register(target, result)
+            else:
+                registers[target] = result
+            return nxt
+
+        return closure
+
+
+class COUNTED_LOOP(AbstractOperation):
+    """
+    The first operation of a counted loop, i.e. a loop whose body only increments and
+    decrements registers and assigns them values that do not change from one iteration
+    to the next, and which is repeated until the last increment or decrement of its
+    counter register sets the zero flag. The optimizer in `hera/optimizer.py`
+    substitutes it for the operation at the top of such loops.
+
+    Since the state of the registers after any number of iterations can be computed
+    directly, COUNTED_LOOP skips every iteration but the last one each time that the
+    loop is entered, and then executes the original operation as usual, so that the last
+    iteration sets the flags exactly as it would have. When operations are counted, i.e.
+    when the program is throttled or executed with `step`, the skipped operations are
+    added to the operation count, and only as many iterations are skipped as fit under
+    the limit passed to `run_until` (see `hera/vm.py`).
+    """
+
+    def __init__(self, op, counter, accumulators, assignments, length):
+        super().__init__(*op.tokens, loc=op.loc)
+        self.op = op
+        self.original = op.original
+        self.counter = counter
+        # List of (register, delta) pairs for the registers that are incremented and
+        # decremented, with the total change in one iteration.
+        self.accumulators = accumulators
+        # The operations that assign loop-invariant values to registers, in order.
+        self.assignments = assignments
+        # The number of operations in one iteration, including the branch.
+        self.length = length
+
+        # The counter reaches zero after m iterations when m * delta = -value, modulo
+        # 2**16 (see `iterations`). The equation is solved by dividing by the largest
+        # power of two that divides delta, and multiplying by the inverse of the rest.
+        delta = dict(accumulators)[counter]
+        self.divisor = delta & -delta
+        self.modulus = 2 ** 16 // self.divisor
+        # By Euler's theorem, the inverse of an odd number modulo 2**k is its
+        # (2**(k - 1) - 1)'th power.
+        self.inverse = pow(delta // self.divisor, self.modulus // 2 - 1, self.modulus)
+
+    def execute(self, vm):
+        iterations = self.iterations(vm.registers[self.counter])
+        if iterations is not None and iterations > 1:
+            skip = iterations - 1
+            limit = vm.op_limit
+            if limit is not None:
+                # Leave room for the rest of the last iteration, so that execution never
+                # stops at a point where the flags of a skipped iteration would show.
+                room = limit - vm.op_count - (self.length - 1)
+                skip = max(0, min(skip, room // self.length))
+                vm.op_count += skip * self.length
+
+            if skip > 0:
+                self.skip(vm, skip)
+
+        self.op.execute(vm)
+
+    def iterations(self, value: int) -> "Optional[int]":
+        """
+        Return the number of iterations that the loop runs for when it is entered with
+        `value` in the counter register, or None if it never ends.
+        """
+        if value % self.divisor != 0:
+            return None
+
+        m = (-(value // self.divisor) * self.inverse) % self.modulus
+        return m or self.modulus
+
+    def skip(self, vm, count: int) -> None:
+        """Update the registers as if `count` iterations of the loop had executed."""
+        registers = vm.registers
+        for register, delta in self.accumulators:
+            registers[register] = (registers[register] + count * delta) & 0xFFFF
+
+        # The assigned values are the same in every iteration, so executing the
+        # assignments once has the same effect as executing them `count` times.
+        pc = vm.pc
+        flags = vm.flags
+        for op in self.assignments:
+            op.execute(vm)
+        vm.pc = pc
+        vm.flags = flags
+
+    def assemble(self):
+        return self.op.assemble()
+
+
 def disassemble(v: int, allow_unknown: bool = False) -> AbstractOperation:
     """Disassemble a 16-bit integer into a HERA operation."""
     # Iterating over every HERA class is inefficient but simple.
@@ -2156,4 +3184,44 @@ name_to_class = {
     "TIGER_STRING": LP_STRING,
     "XOR": XOR,
     "__eval": __EVAL,
+    "__intrinsic": __INTRINSIC,
 }
+
+
+# The functions below compute the flags that are deferred in lazy-flags mode (see
+# `AbstractOperation.execute_lazy`). Each takes the operands and result recorded in
+# `vm.pending_flags`, and returns the carry and overflow bits of `vm.flags`.
+
+
+def add_flags(left: int, right: int, carry: int, result: int) -> int:
+    return (FLAG_CARRY if left + right + carry > 0xFFFF else 0) | (
+        FLAG_OVERFLOW if from_u16(result) != from_u16(left) + from_u16(right) else 0
+    )
+
+
+def sub_flags(left: int, right: int, borrow: int, result: int) -> int:
+    return (FLAG_CARRY if left >= right + borrow else 0) | (
+        FLAG_OVERFLOW
+        if from_u16(result) != from_u16(left) - from_u16(right) - borrow
+        else 0
+    )
+
+
+def truth_table(should) -> "Tuple[bool, ...]":
+    """Return the truth table of a branch condition. See `Branch.TABLE`."""
+    vm = VirtualMachine()
+    table = []
+    for flags in range(32):
+        vm.flags = flags
+        table.append(bool(should(vm)))
+    return tuple(table)
+
+
+for cls in name_to_class.values():
+    if issubclass(cls, Branch) and "should" in cls.__dict__:
+        cls.TABLE = truth_table(cls.should)
+        # Branches that do not depend on the carry and overflow flags can be executed
+        # in lazy-flags mode without computing the pending flags.
+        mask = ~(FLAG_CARRY | FLAG_OVERFLOW)
+        if all(cls.TABLE[flags] == cls.TABLE[flags & mask] for flags in range(32)):
+            cls.execute_lazy = cls.execute
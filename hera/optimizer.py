@@ -0,0 +1,430 @@
+"""
+Optional load-time optimizations of preprocessed HERA programs.
+
+The functions in this module transform a program that has already been type-checked and
+preprocessed so that it runs faster on the virtual machine, without changing any of its
+observable behavior. They are only applied when a program is executed with the
+`--optimize` flag, never when it is debugged, assembled or preprocessed, because the
+transformed code no longer corresponds one-to-one to what the user wrote.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+from .cfg import entry_points, set_value, successors
+from .data import ENGINE_INTERPRETER, Program, Settings
+from .op import (
+    ADD,
+    AND,
+    ASL,
+    ASR,
+    BNZ,
+    BNZR,
+    BR,
+    BRR,
+    CALL,
+    COUNTED_LOOP,
+    DEC,
+    FLAGLESS_ADD,
+    FLAGLESS_AND,
+    FLAGLESS_DEC,
+    FLAGLESS_INC,
+    FLAGLESS_LOAD,
+    FLAGLESS_OR,
+    FLAGLESS_SUB,
+    FLAGLESS_XOR,
+    FOFF,
+    FON,
+    FSET4,
+    FSET5,
+    FUSED_CMP,
+    FUSED_SET,
+    FUSED_SET_BRANCH,
+    FUSED_SET_CALL,
+    INC,
+    LOAD,
+    LSL,
+    LSL8,
+    LSR,
+    LSR8,
+    MUL,
+    OR,
+    PRINT,
+    PRINT_REG,
+    PRINTLN,
+    RETURN,
+    RSTRF,
+    SETHI,
+    SETLO,
+    STORE,
+    SUB,
+    XOR,
+    AbstractOperation,
+    Branch,
+    FusedOperation,
+    RegisterBranch,
+)
+from .vm import FLAG_CARRY, FLAG_CARRY_BLOCK, FLAG_OVERFLOW, FLAG_SIGN, FLAG_ZERO
+
+
+# The flags that arithmetic operations set. The carry-block flag is left out, since it
+# is only ever changed explicitly.
+ALL_FLAGS = FLAG_SIGN | FLAG_ZERO | FLAG_OVERFLOW | FLAG_CARRY
+
+# Map from operation classes to the flags that they read and the flags that they
+# overwrite. Operations not listed here are assumed to read every flag.
+FLAG_EFFECTS = {
+    ADD: (FLAG_CARRY, ALL_FLAGS),
+    SUB: (FLAG_CARRY, ALL_FLAGS),
+    MUL: (FLAG_SIGN, ALL_FLAGS),
+    INC: (0, ALL_FLAGS),
+    DEC: (0, ALL_FLAGS),
+    AND: (0, FLAG_SIGN | FLAG_ZERO),
+    OR: (0, FLAG_SIGN | FLAG_ZERO),
+    XOR: (0, FLAG_SIGN | FLAG_ZERO),
+    LSL: (FLAG_CARRY, FLAG_SIGN | FLAG_ZERO | FLAG_CARRY),
+    LSR: (FLAG_CARRY, FLAG_SIGN | FLAG_ZERO | FLAG_CARRY),
+    LSL8: (0, FLAG_SIGN | FLAG_ZERO),
+    LSR8: (0, FLAG_SIGN | FLAG_ZERO),
+    ASL: (FLAG_CARRY, ALL_FLAGS),
+    ASR: (0, FLAG_SIGN | FLAG_ZERO | FLAG_CARRY),
+    LOAD: (0, FLAG_SIGN | FLAG_ZERO),
+    RSTRF: (0, ALL_FLAGS),
+    FSET4: (0, ALL_FLAGS),
+    FSET5: (0, ALL_FLAGS),
+    SETLO: (0, 0),
+    SETHI: (0, 0),
+    STORE: (0, 0),
+    BR: (0, 0),
+    BRR: (0, 0),
+    CALL: (0, 0),
+    RETURN: (0, 0),
+    PRINT: (0, 0),
+    PRINT_REG: (0, 0),
+    PRINTLN: (0, 0),
+}
+
+# Operations that only read the flags listed in `FLAG_EFFECTS` when the carry-block flag
+# is off.
+BLOCKABLE = (ADD, SUB, MUL, LSL, LSR, ASL)
+
+# The possible states of the carry-block flag, for `carry_block_states`.
+CARRY_BLOCK_OFF = 1
+CARRY_BLOCK_ON = 2
+
+# Map from operation classes to their flag-free variants.
+FLAGLESS = {
+    ADD: FLAGLESS_ADD,
+    SUB: FLAGLESS_SUB,
+    AND: FLAGLESS_AND,
+    OR: FLAGLESS_OR,
+    XOR: FLAGLESS_XOR,
+    INC: FLAGLESS_INC,
+    DEC: FLAGLESS_DEC,
+    LOAD: FLAGLESS_LOAD,
+}
+
+
+def optimize(program: Program, settings: Settings, *, counted=False) -> Program:
+    """
+    Return a copy of the program with all applicable optimizations applied. `counted`
+    should be True if the program will be executed with `VirtualMachine.step`, which
+    counts every operation and may stop the program at any point, like --throttle.
+    """
+    code = program.code
+    # Superinstructions execute several operations at once, which would throw off the
+    # instruction count that --throttle relies on. Flags are only dead if the program
+    # runs to completion, since the final state of the machine is printed.
+    if settings.throttle is False and not counted:
+        code = eliminate_dead_flags(program)
+        code = fuse_ops(code)
+    # Counted loops keep track of the throttle themselves, but they rely on the default
+    # interpreter counting operations before it executes them.
+    if settings.engine == ENGINE_INTERPRETER and not settings.lazy_flags:
+        code = accelerate_loops(program.code, code)
+    return program._replace(code=code)
+
+
+def eliminate_dead_flags(program: Program) -> "List[AbstractOperation]":
+    """
+    Replace each operation in the program whose flags are always overwritten before they
+    are read with its flag-free variant (see `FlaglessOperation` in `hera/op.py`).
+    """
+    code = program.code.copy()
+    live = live_flags(program)
+    for pc, op in enumerate(code):
+        cls = op.__class__
+        if cls in FLAGLESS and FLAG_EFFECTS[cls][1] & live[pc] == 0:
+            code[pc] = FLAGLESS[cls](op)
+    return code
+
+
+def live_flags(program: Program) -> "List[int]":
+    """
+    Return the set of flags that are live just after each operation in the program, i.e.
+    that may be read before they are overwritten, as a bitmask in the format of
+    `VirtualMachine.flags`.
+    """
+    code = program.code
+    n = len(code)
+    succ = successors(program)
+    effects = [flag_effects(op) for op in code]
+    for pc, state in enumerate(carry_block_states(program, succ)):
+        if state == CARRY_BLOCK_ON and isinstance(code[pc], BLOCKABLE):
+            effects[pc] = (0, effects[pc][1])
+    # Every flag is live at the end of the program, because the final state of the
+    # machine is printed.
+    live_in = [0] * n + [ALL_FLAGS]
+    live_out = [0] * n
+
+    changed = True
+    while changed:
+        changed = False
+        for pc in reversed(range(n)):
+            if succ[pc] is None:
+                out = ALL_FLAGS
+            else:
+                out = 0
+                for target in succ[pc]:
+                    out |= live_in[target]
+            live_out[pc] = out
+
+            reads, writes = effects[pc]
+            new = reads | (out & ~writes)
+            if new != live_in[pc]:
+                live_in[pc] = new
+                changed = True
+
+    return live_out
+
+
+def carry_block_states(
+    program: Program, succ: "List[Optional[List[int]]]"
+) -> "List[int]":
+    """
+    Return the possible states of the carry-block flag just before each operation in
+    the program, as a bitmask of `CARRY_BLOCK_OFF` and `CARRY_BLOCK_ON`. `succ` is the
+    list of successors of each operation (see `hera.cfg.successors`).
+    """
+    code = program.code
+    n = len(code)
+    # Operations with unknown successors may jump to any entry point.
+    entries = sorted(pc for pc in entry_points(program) if 0 <= pc < n)
+    states = [0] * (n + 1)
+    states[0] = CARRY_BLOCK_OFF
+
+    changed = True
+    while changed:
+        changed = False
+        for pc, op in enumerate(code):
+            if states[pc] == 0:
+                continue
+
+            after = carry_block_after(op, states[pc])
+            for target in entries if succ[pc] is None else succ[pc]:
+                if after & ~states[target]:
+                    states[target] |= after
+                    changed = True
+
+    return states[:n]
+
+
+def carry_block_after(op: AbstractOperation, before: int) -> int:
+    """
+    Return the possible states of the carry-block flag after the operation executes,
+    given the possible states before.
+    """
+    cls = op.__class__
+    if cls is FON and op.args[0] & FLAG_CARRY_BLOCK:
+        return CARRY_BLOCK_ON
+    elif cls is FOFF and op.args[0] & FLAG_CARRY_BLOCK:
+        return CARRY_BLOCK_OFF
+    elif cls is FSET5:
+        return CARRY_BLOCK_ON if op.args[0] & FLAG_CARRY_BLOCK else CARRY_BLOCK_OFF
+    elif cls in FLAG_EFFECTS and cls is not RSTRF:
+        return before
+    elif cls in (FON, FOFF) or issubclass(cls, Branch):
+        return before
+    else:
+        return CARRY_BLOCK_OFF | CARRY_BLOCK_ON
+
+
+def flag_effects(op: AbstractOperation) -> "Tuple[int, int]":
+    """Return the flags that the operation reads and the flags that it overwrites."""
+    cls = op.__class__
+    if cls in FLAG_EFFECTS:
+        return FLAG_EFFECTS[cls]
+    elif cls in (FON, FOFF):
+        return (0, op.args[0] & ALL_FLAGS)
+    elif issubclass(cls, Branch) and cls.TABLE:
+        reads = 0
+        for flag in (FLAG_SIGN, FLAG_ZERO, FLAG_OVERFLOW, FLAG_CARRY):
+            if any(cls.TABLE[f] != cls.TABLE[f ^ flag] for f in range(32)):
+                reads |= flag
+        return (reads, 0)
+    else:
+        return (ALL_FLAGS, 0)
+
+
+def accelerate_loops(
+    original: "List[AbstractOperation]", code: "List[AbstractOperation]"
+) -> "List[AbstractOperation]":
+    """
+    Replace the first operation of each counted loop in `code` with a `COUNTED_LOOP`
+    operation (see `hera/op.py`). The loops are found in `original`, the code before any
+    other optimizations were applied, which must correspond one-to-one with `code`.
+    """
+    accelerated = code.copy()
+    for end in range(len(original)):
+        loop = counted_loop_at(original, end)
+        if loop is not None:
+            top, counter, accumulators, assignments = loop
+            accelerated[top] = COUNTED_LOOP(
+                code[top], counter, accumulators, assignments, end - top + 1
+            )
+    return accelerated
+
+
+def counted_loop_at(
+    code: "List[AbstractOperation]", end: int
+) -> "Optional[Tuple[int, int, List[Tuple[int, int]], List[AbstractOperation]]]":
+    """
+    If the operation at `end` is the branch at the bottom of a counted loop (see
+    `COUNTED_LOOP` in `hera/op.py`), return a tuple of the instruction number of the top
+    of the loop, the counter register, the list of (register, delta) pairs of the
+    registers that are incremented and decremented in each iteration, and the list of
+    the operations that assign loop-invariant values. Otherwise, return None.
+    """
+    branch = code[end]
+    if isinstance(branch, BNZR):
+        top = end + branch.args[0]
+    elif (
+        isinstance(branch, BNZ)
+        and branch.args[0] == 11
+        and end >= 2
+        and isinstance(code[end - 2], SETLO)
+        and isinstance(code[end - 1], SETHI)
+        and code[end - 2].args[0] == 11
+        and code[end - 1].args[0] == 11
+    ):
+        top = set_value(code[end - 2], code[end - 1])
+    else:
+        return None
+
+    if not 0 <= top < end:
+        return None
+
+    body = code[top:end]
+    written = {op.args[0] for op in body}
+    # The registers that have been assigned the same value in every iteration, at each
+    # point in the body.
+    fixed = set()  # type: Set[int]
+    deltas = {}  # type: Dict[int, int]
+    assignments = []
+    for op in body:
+        target = op.args[0]
+        # Writes to R0 and R15 are not simple stores. See `fuse_at`.
+        if target == 0 or target == 15:
+            return None
+        elif isinstance(op, INC):
+            deltas[target] = (deltas.get(target, 0) + op.args[1]) & 0xFFFF
+        elif isinstance(op, DEC):
+            deltas[target] = (deltas.get(target, 0) - op.args[1]) & 0xFFFF
+        elif isinstance(op, SETLO):
+            fixed.add(target)
+            assignments.append(op)
+        elif isinstance(op, SETHI):
+            # SETHI keeps the low byte of the register, so its result is only the same
+            # in every iteration if the register's old value was.
+            assignments.append(op)
+        elif isinstance(op, (AND, OR, XOR)):
+            if any(r in written and r not in fixed for r in op.args[1:]):
+                return None
+            fixed.add(target)
+            assignments.append(op)
+        else:
+            return None
+
+    # Registers that are incremented and decremented must not be assigned as well.
+    if {op.args[0] for op in assignments} & set(deltas):
+        return None
+
+    # The branch must test the zero flag of the last change to the counter.
+    last = [op for op in body if not isinstance(op, (SETLO, SETHI))][-1:]
+    if not last or not isinstance(last[0], (INC, DEC)):
+        return None
+    counter = last[0].args[0]
+    if deltas[counter] == 0:
+        return None
+
+    return (top, counter, sorted(deltas.items()), assignments)
+
+
+def fuse_ops(code: "List[AbstractOperation]") -> "List[AbstractOperation]":
+    """
+    Replace the first operation of each fusible sequence in `code` with the equivalent
+    superinstruction (see `FusedOperation` in `hera/op.py`).
+
+    The length of the list is unchanged, so that program counters, labels and debugging
+    information all remain valid.
+    """
+    fused = code.copy()
+    for i in range(len(code)):
+        superinstruction = fuse_at(code, i)
+        if superinstruction is not None:
+            fused[i] = superinstruction
+    return fused
+
+
+def fuse_at(
+    code: "List[AbstractOperation]", i: int
+) -> "Optional[AbstractOperation]":
+    """
+    Return the superinstruction for the sequence of operations beginning at `code[i]`,
+    or None if no superinstruction applies.
+    """
+    op = code[i]
+    if isinstance(op, SETLO) and i + 1 < len(code):
+        target = op.args[0]
+        sethi = code[i + 1]
+        # R0 and R15 are left alone, because writes to them are not simple stores: the
+        # former are discarded and the latter may trigger a stack overflow warning.
+        if (
+            not isinstance(sethi, SETHI)
+            or sethi.args[0] != target
+            or target == 0
+            or target == 15
+        ):
+            return None
+
+        after = code[i + 2] if i + 2 < len(code) else None
+        if target == 11 and isinstance(after, RegisterBranch) and after.args[0] == 11:
+            return FUSED_SET_BRANCH(op, sethi, after)
+        elif target == 13 and isinstance(after, CALL) and after.args[1] == 13:
+            return FUSED_SET_CALL(op, sethi, after)
+        else:
+            return FUSED_SET(op, sethi)
+    elif isinstance(op, FON) and op.args[0] == 8 and i + 1 < len(code):
+        sub = code[i + 1]
+        if isinstance(sub, SUB) and sub.args[0] == 0:
+            return FUSED_CMP(op, sub)
+
+    return None
+
+
+def unfuse_ops(code: "List[AbstractOperation]") -> "List[AbstractOperation]":
+    """
+    Replace each superinstruction in `code`, including those at the top of counted
+    loops, with the first operation in its sequence, so that every operation that does
+    not jump advances the program counter by exactly one and counts as one operation.
+    The rest of each sequence follows it in the code anyway.
+    """
+    unfused = []
+    for op in code:
+        if isinstance(op, FusedOperation):
+            op = op.parts[0]
+        elif isinstance(op, COUNTED_LOOP) and isinstance(op.op, FusedOperation):
+            op = COUNTED_LOOP(
+                op.op.parts[0], op.counter, op.accumulators, op.assignments, op.length
+            )
+        unfused.append(op)
+    return unfused
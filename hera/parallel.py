@@ -0,0 +1,104 @@
+"""
+Running one program on many inputs in parallel, with --inputs and -j.
+
+The program is loaded and checked once, and its data segment is loaded once into a
+virtual machine that serves as a snapshot of the program's initial state. Then worker
+processes are forked, so that they inherit the program and the snapshot copy-on-write
+instead of loading them again. Each input file is run on a fresh copy of the snapshot in
+one of the workers, with the file as the program's standard input, and everything that
+the program prints is sent back to the parent, which reports the results in the order
+of the inputs.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import copy
+import multiprocessing
+import os
+from collections import namedtuple
+from io import StringIO
+
+from .data import HERAError, Program, Settings
+from .utils import read_file
+from .vm import VirtualMachine
+
+
+class InputResult(namedtuple("InputResult", ["path", "stdout", "stderr", "exit_code"])):
+    """
+    The result of running a program on one input file: what the program printed to
+    standard output and standard error, and the exit code if it failed, else None.
+    """
+
+
+# The program, the snapshot of the virtual machine and the report function, while
+# `run_inputs` is running. The workers inherit them when they are forked.
+_snapshot = None  # type: Optional[Tuple[Program, VirtualMachine, Any]]
+
+
+def run_inputs(
+    program: Program, settings: Settings, paths: "List[str]", *, jobs: int, report
+) -> "List[InputResult]":
+    """
+    Run the program on each of the input files in `paths`, using `jobs` worker
+    processes, and return the results in the same order as `paths`.
+
+    `report(vm, settings, file)` is called after each successful run, to print a
+    report of the machine's final state to `file`. It is called in the worker, with a
+    copy of `settings`.
+    """
+    global _snapshot
+
+    if not paths:
+        return []
+
+    vm = VirtualMachine(settings)
+    vm.load_data(program)
+    _snapshot = (program, vm, report)
+    try:
+        if jobs == 1 or "fork" not in multiprocessing.get_all_start_methods():
+            return [run_input(path) for path in paths]
+
+        context = multiprocessing.get_context("fork")
+        with context.Pool(min(jobs, len(paths))) as pool:
+            return pool.map(run_input, paths, chunksize=1)
+    finally:
+        _snapshot = None
+
+
+def run_input(path: str) -> InputResult:
+    """Run the program on one input file, starting from the snapshot."""
+    program, snapshot, report = _snapshot
+    vm = snapshot.copy()
+    vm.stdout = StringIO()
+    vm.stderr = StringIO()
+
+    exit_code = None
+    try:
+        vm.stdin = StringIO(read_file(path))
+        vm.resume(program)
+    except HERAError as e:
+        vm.error(str(e), None)
+        exit_code = 3
+    except SystemExit as e:
+        # Fatal errors during execution exit the interpreter.
+        exit_code = e.code
+    else:
+        report(vm, copy.copy(vm.settings), vm.stderr)
+
+    return InputResult(path, vm.stdout.getvalue(), vm.stderr.getvalue(), exit_code)
+
+
+def list_inputs(directory: str) -> "List[str]":
+    """
+    Return the paths of the files in `directory`, sorted by name. Raise `HERAError` if
+    the directory cannot be read.
+    """
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        raise HERAError('directory "{}" does not exist'.format(directory))
+    except OSError:
+        raise HERAError('could not open directory "{}"'.format(directory))
+
+    paths = [os.path.join(directory, name) for name in names]
+    return [path for path in paths if os.path.isfile(path)]
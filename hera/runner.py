@@ -0,0 +1,170 @@
+"""
+Batch mode (`hera batch`), for running many programs at once, e.g. to grade a
+directory of submissions.
+
+Each program is loaded and run in a worker process of a process pool, with empty
+standard input. Its result (final registers and flags, output, warnings, instruction
+count, wall time) is reported as a dictionary, which the command line prints as a line
+of JSON.
+
+Programs are executed in slices with `VirtualMachine.step`, so that every operation is
+counted and a program can be stopped once it runs out of time, even without
+--throttle. For the same reason, --optimize only applies the optimizations that keep the
+instruction count exact, i.e. it accelerates counted loops but does not fuse operations
+into superinstructions.
+
+A program that fails in an unexpected way, e.g. because it cannot be decoded, gets an
+error result of its own instead of stopping the whole batch.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import copy
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from itertools import repeat
+
+from .data import Program, Settings
+from .loader import load_program_from_file
+from .utils import print_error
+from .optimizer import optimize
+from .vm import STEP_BUDGET_EXHAUSTED, VirtualMachine
+
+
+# The number of operations that a program executes between checks of its timeout.
+TIMEOUT_QUANTUM = 10000
+
+# The status of a program that was stopped because it ran out of time.
+STATUS_TIMED_OUT = "timed out"
+# The status of a program that could not be loaded, or that exited with an error, e.g.
+# a Python exception in __eval.
+STATUS_ERROR = "error"
+
+
+def run_batch(paths: "List[str]", settings: Settings, *, jobs: int):
+    """
+    Run each program in `paths` in a pool of `jobs` worker processes, and yield their
+    results (see `run_file`) in the same order as `paths`, as soon as they are ready.
+    """
+    if jobs == 1:
+        for path in paths:
+            yield run_file(path, settings)
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            yield from executor.map(run_file, paths, repeat(settings))
+
+
+def run_file(path: str, settings: Settings) -> "Dict[str, Any]":
+    """
+    Load and run the program at `path`, and return its result. The program is stopped
+    after `settings.throttle` operations or `settings.timeout` seconds.
+    """
+    # Each program counts its own warnings.
+    settings = copy.copy(settings)
+    stdout = StringIO()
+    stderr = StringIO()
+    vm = None
+    start = time.monotonic()
+
+    # Errors in the program are printed to standard error, which is redirected so that
+    # they are part of the result. Workers only run one program at a time.
+    old_stderr = sys.stderr
+    sys.stderr = stderr
+    try:
+        program = load_program_from_file(path, settings)
+        if settings.optimize:
+            program = optimize(program, settings, counted=True)
+
+        vm = VirtualMachine(settings, stdout=stdout, stderr=stderr)
+        status = execute(vm, program, settings.timeout)
+    except SystemExit:
+        status = STATUS_ERROR
+    except Exception as e:
+        print_error(settings, "{}: {}".format(type(e).__name__, e), file=stderr)
+        status = STATUS_ERROR
+    finally:
+        sys.stderr = old_stderr
+
+    result = {"path": path}
+    result.update(
+        make_result(status, vm, settings, stdout, stderr, time.monotonic() - start)
+    )
+    return result
+
+
+def make_result(
+    status: str,
+    vm: "Optional[VirtualMachine]",
+    settings: Settings,
+    stdout: StringIO,
+    stderr: StringIO,
+    elapsed: float,
+) -> "Dict[str, Any]":
+    """
+    Return the result of a run as a dictionary. `vm` is None if the program could not
+    be loaded.
+    """
+    result = {"status": status}
+    if vm is not None:
+        result["registers"] = vm.registers
+        result["flags"] = flags_to_dict(vm)
+        result["op_count"] = vm.op_count
+        result["warnings"] = settings.warning_count + vm.warning_count
+    else:
+        result["registers"] = None
+        result["flags"] = None
+        result["op_count"] = 0
+        result["warnings"] = settings.warning_count
+    result["stdout"] = stdout.getvalue()
+    result["stderr"] = stderr.getvalue()
+    result["time"] = round(elapsed, 6)
+    return result
+
+
+def execute(vm: VirtualMachine, program: Program, timeout, stdin: str = "") -> str:
+    """
+    Execute the program on the virtual machine with `stdin` as its input, and return
+    why it stopped: one of the STEP_* constants in `hera/vm.py`, or `STATUS_TIMED_OUT`
+    if it ran for more than `timeout` seconds (unless `timeout` is False).
+    """
+    vm.start(program)
+    vm.feed_input(stdin)
+    vm.close_input()
+    if timeout is not False:
+        deadline = time.monotonic() + timeout
+
+    while True:
+        status = vm.step(TIMEOUT_QUANTUM)
+        if status != STEP_BUDGET_EXHAUSTED:
+            return status
+        elif timeout is not False and time.monotonic() >= deadline:
+            return STATUS_TIMED_OUT
+
+
+def flags_to_dict(vm: VirtualMachine) -> "Dict[str, bool]":
+    """Return the flags of the virtual machine as a dictionary from names to values."""
+    return {
+        "carry_block": vm.flag_carry_block,
+        "carry": vm.flag_carry,
+        "overflow": vm.flag_overflow,
+        "zero": vm.flag_zero,
+        "sign": vm.flag_sign,
+    }
+
+
+def find_programs(paths: "List[str]") -> "List[str]":
+    """
+    Return the list of programs to run for `paths`, in which each directory is
+    replaced by the `.hera` files that it contains, sorted by name.
+    """
+    ret = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(name for name in os.listdir(path) if name.endswith(".hera"))
+            ret.extend(os.path.join(path, name) for name in names)
+        else:
+            ret.append(path)
+    return ret
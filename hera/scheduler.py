@@ -0,0 +1,108 @@
+"""
+A scheduler that runs many HERA programs in a single process.
+
+Each program gets a virtual machine and settings of its own, and takes turns with the
+other programs to execute a fixed number of operations (its quantum) with
+`VirtualMachine.step`, so that long-running programs cannot hold up the rest. What each
+program prints, including warnings and errors, is captured separately.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+from collections import deque
+from io import StringIO
+
+from .data import Program, Settings
+from .vm import STEP_BUDGET_EXHAUSTED, VirtualMachine
+
+
+# The default number of operations that each program executes in a turn.
+DEFAULT_QUANTUM = 10000
+
+# The status of a job that ended with an error, e.g. a Python exception in __eval.
+JOB_FAILED = "failed"
+
+
+class Job:
+    """A program that is run by a `Scheduler`."""
+
+    def __init__(self, name: str, program: Program, settings: Settings, stdin: str):
+        self.name = name
+        self.settings = settings
+        # Standard output and standard error of the program.
+        self.stdout = StringIO()
+        self.stderr = StringIO()
+        self.vm = VirtualMachine(settings, stdout=self.stdout, stderr=self.stderr)
+        self.vm.start(program)
+        self.vm.feed_input(stdin)
+        self.vm.close_input()
+        # The status that the last turn ended with: one of the STEP_* constants in
+        # `hera/vm.py` or `JOB_FAILED`, or None if the job has not run yet.
+        self.status = None  # type: Optional[str]
+        # The exit code of a job that failed.
+        self.exit_code = None  # type: Optional[int]
+        self.turns = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status is not None and self.status != STEP_BUDGET_EXHAUSTED
+
+    def run_turn(self, quantum: int) -> None:
+        """Execute at most `quantum` operations of the program."""
+        try:
+            self.status = self.vm.step(quantum)
+        except SystemExit as e:
+            # Fatal errors during execution exit the interpreter.
+            self.status = JOB_FAILED
+            self.exit_code = e.code
+        self.turns += 1
+
+
+class Scheduler:
+    """
+    A round-robin scheduler for HERA programs. Add programs with `add`, and then
+    execute all of them with `run`.
+    """
+
+    def __init__(self, quantum: int = DEFAULT_QUANTUM) -> None:
+        self.quantum = quantum
+        self.jobs = []  # type: List[Job]
+        # The jobs that have not finished, in the order that they will take turns.
+        self.queue = deque()  # type: Deque[Job]
+
+    def add(
+        self,
+        program: Program,
+        settings: "Optional[Settings]" = None,
+        *,
+        stdin: str = "",
+        name: "Optional[str]" = None
+    ) -> Job:
+        """
+        Add a program to the scheduler, and return its job. The program is executed
+        according to `settings`, which should not be shared with any other program;
+        in particular, `settings.throttle` is the program's budget of operations. It
+        reads its input from `stdin`.
+        """
+        if settings is None:
+            settings = Settings()
+        if name is None:
+            name = "job {}".format(len(self.jobs))
+
+        job = Job(name, program, settings, stdin)
+        self.jobs.append(job)
+        self.queue.append(job)
+        return job
+
+    def run(self) -> "List[Job]":
+        """
+        Run every program until it halts, is throttled, or fails, and return the list
+        of jobs in the order that they were added.
+        """
+        while self.queue:
+            job = self.queue.popleft()
+            job.run_turn(self.quantum)
+            if not job.finished:
+                self.queue.append(job)
+
+        return self.jobs
@@ -0,0 +1,300 @@
+"""
+Server mode (`hera serve`), which runs, checks, assembles and disassembles programs on
+request, without paying for starting Python and importing hera-py every time.
+
+The server reads requests from standard input, or from the connections to a Unix socket
+with --socket, and writes a response to each. Requests and responses are JSON objects,
+one per line. A request has a "command" ("run", "check", "assemble" or "disassemble"),
+the text of the program under "program", and optionally an "id", which is copied into
+the response since responses are sent as soon as they are ready and so may be out of
+order. "run" requests may also have "stdin", "throttle" and "timeout" fields (the
+defaults for the last two are set with --throttle and --timeout).
+
+The response to a "run" request has the same fields as a result of `hera batch` (see
+`hera/runner.py`). The other responses have a "status" of "ok" or "error", the number
+of "warnings" and the messages printed to "stderr", and:
+
+    - "assemble": the machine code, as lists of hex strings under "code" and "data".
+    - "disassemble": the lines of the disassembled program under "program".
+
+A request that cannot be understood gets a response with a "status" of "error" and a
+message under "error".
+
+The server trusts its clients no further than the programs that they send. Programs
+cannot use `__eval`, which executes arbitrary Python code in the worker, unless the
+server is started with --allow-eval, and the Unix socket can only be connected to by
+the user that started the server. Programs can still include files that the server can
+read, so a server that is shared with other users should run as a user that has access
+to nothing else.
+
+Requests are handled by a pool of worker processes, which are forked when the server
+starts, after the server has warmed up by loading and running a small program that uses
+the Tiger standard library, so that the workers start with every module that a request
+needs already imported. Each request still parses the program that it sends, including
+the libraries that it includes.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import copy
+import json
+import multiprocessing
+import os
+import socketserver
+import stat
+import threading
+import time
+from io import StringIO
+
+from .assembler import assemble, bytes_to_hex, disassemble_text
+from .data import Settings
+from .loader import load_program
+from .optimizer import optimize
+from .runner import STATUS_ERROR, execute, make_result
+from .vm import VirtualMachine
+
+
+# The status of a successful "check", "assemble" or "disassemble" request.
+STATUS_OK = "ok"
+
+# The program that the server runs before it forks its workers, to warm them up.
+WARM_UP_PROGRAM = """\
+#include <Tiger-stdlib-stack-data.hera>
+
+CALL(FP_alt, getline)
+HALT()
+
+#include <Tiger-stdlib-stack.hera>
+"""
+
+
+class Server:
+    """
+    A server with a pool of `jobs` worker processes. The programs that it runs may only
+    use `__eval` if `allow_eval` is True.
+    """
+
+    def __init__(self, settings: Settings, *, jobs: int, allow_eval=False) -> None:
+        # Messages are part of the responses, not printed to a terminal.
+        self.settings = copy.copy(settings)
+        self.settings.color = False
+        self.settings.allow_eval = allow_eval
+        warm_up(self.settings)
+        self.pool = multiprocessing.get_context("fork").Pool(jobs)
+        # The socket server, while `serve_socket` is running.
+        self.socket_server = None  # type: Optional[socketserver.BaseServer]
+
+    def serve_stream(
+        self, lines: "Iterable[str]", write: "Callable[[str], None]"
+    ) -> None:
+        """
+        Handle the requests in `lines`, and pass the responses to `write`. Return once
+        every request has been handled.
+        """
+        lock = threading.Lock()
+        pending = []
+
+        def respond(response):
+            with lock:
+                write(json.dumps(response) + "\n")
+
+        for line in lines:
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+            except ValueError:
+                respond(error_response(None, "invalid JSON"))
+                continue
+
+            request_id = request.get("id") if isinstance(request, dict) else None
+            error = validate_request(request)
+            if error is not None:
+                respond(error_response(request_id, error))
+                continue
+
+            def respond_to_exception(e, request_id=request_id):
+                respond(error_response(request_id, "internal error: {}".format(e)))
+
+            pending = [result for result in pending if not result.ready()]
+            pending.append(
+                self.pool.apply_async(
+                    handle_request,
+                    (request, self.settings),
+                    callback=respond,
+                    error_callback=respond_to_exception,
+                )
+            )
+
+        for result in pending:
+            result.wait()
+
+    def serve_socket(self, path: str) -> None:
+        """
+        Handle requests from connections to the Unix socket at `path`, until `shutdown`
+        is called.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def write(text):
+                    self.wfile.write(text.encode("utf-8"))
+                    self.wfile.flush()
+
+                lines = (line.decode("utf-8") for line in self.rfile)
+                server.serve_stream(lines, write)
+
+        # Only the user that started the server may connect to the socket.
+        old_umask = os.umask(stat.S_IRWXG | stat.S_IRWXO | stat.S_IXUSR)
+        try:
+            socket_server = socketserver.ThreadingUnixStreamServer(path, Handler)
+        finally:
+            os.umask(old_umask)
+        self.socket_server = socket_server
+        try:
+            socket_server.serve_forever()
+        finally:
+            self.socket_server = None
+            socket_server.server_close()
+            os.unlink(path)
+
+    def shutdown(self) -> None:
+        """Stop `serve_socket` from another thread."""
+        if self.socket_server is not None:
+            self.socket_server.shutdown()
+
+    def close(self) -> None:
+        """Shut down the worker processes, once they have handled every request."""
+        self.pool.close()
+        self.pool.join()
+
+    def terminate(self) -> None:
+        """Shut down the worker processes immediately."""
+        self.pool.terminate()
+        self.pool.join()
+
+
+def validate_request(request) -> "Optional[str]":
+    """Return an error message if `request` is not a valid request, else None."""
+    if not isinstance(request, dict):
+        return "request must be a JSON object"
+    elif request.get("command") not in HANDLERS:
+        return "unknown command: {}".format(request.get("command"))
+    elif not isinstance(request.get("program"), str):
+        return 'request must have a "program" string'
+    elif not isinstance(request.get("stdin", ""), str):
+        return '"stdin" must be a string'
+    elif not is_limit(request.get("throttle", False), int):
+        return '"throttle" must be a positive integer or false'
+    elif not is_limit(request.get("timeout", False), (int, float)):
+        return '"timeout" must be a positive number or false'
+    else:
+        return None
+
+
+def is_limit(value, types) -> bool:
+    """Return True if `value` is False or a positive number of one of `types`."""
+    if value is False:
+        return True
+    else:
+        return isinstance(value, types) and not isinstance(value, bool) and value > 0
+
+
+def error_response(request_id, message: str) -> "Dict[str, Any]":
+    return {"id": request_id, "status": STATUS_ERROR, "error": message}
+
+
+def handle_request(request: "Dict[str, Any]", settings: Settings) -> "Dict[str, Any]":
+    """Handle a valid request in a worker process, and return the response."""
+    # Each request counts its own warnings.
+    settings = copy.copy(settings)
+    response = {"id": request.get("id")}
+    response.update(HANDLERS[request["command"]](request, settings))
+    return response
+
+
+def handle_run(request: "Dict[str, Any]", settings: Settings) -> "Dict[str, Any]":
+    settings.throttle = request.get("throttle", settings.throttle)
+    timeout = request.get("timeout", settings.timeout)
+    stdout = StringIO()
+    stderr = StringIO()
+    vm = None
+    start = time.monotonic()
+    try:
+        program = load_program(request["program"], settings, file=stderr)
+        if settings.optimize:
+            program = optimize(program, settings, counted=True)
+
+        vm = VirtualMachine(settings, stdout=stdout, stderr=stderr)
+        status = execute(vm, program, timeout, request.get("stdin", ""))
+    except SystemExit:
+        status = STATUS_ERROR
+
+    return make_result(status, vm, settings, stdout, stderr, time.monotonic() - start)
+
+
+def handle_check(request: "Dict[str, Any]", settings: Settings) -> "Dict[str, Any]":
+    return load_for_response(request, settings)[1]
+
+
+def handle_assemble(request: "Dict[str, Any]", settings: Settings) -> "Dict[str, Any]":
+    settings.allow_interrupts = True
+    program, response = load_for_response(request, settings)
+    if program is not None:
+        code, data = assemble(program)
+        response["code"] = [bytes_to_hex(b) for b in code]
+        response["data"] = [bytes_to_hex(b) for b in data]
+    return response
+
+
+def handle_disassemble(
+    request: "Dict[str, Any]", settings: Settings
+) -> "Dict[str, Any]":
+    return {
+        "status": STATUS_OK,
+        "program": disassemble_text(request["program"]),
+        "warnings": 0,
+        "stderr": "",
+    }
+
+
+def load_for_response(
+    request: "Dict[str, Any]", settings: Settings
+) -> "Tuple[Optional[Program], Dict[str, Any]]":
+    """
+    Load the program of the request. Return the program, or None if it has errors, and
+    the response that reports its warnings and errors.
+    """
+    stderr = StringIO()
+    try:
+        program = load_program(request["program"], settings, file=stderr)
+    except SystemExit:
+        program = None
+
+    response = {
+        "status": STATUS_OK if program is not None else STATUS_ERROR,
+        "warnings": settings.warning_count,
+        "stderr": stderr.getvalue(),
+    }
+    return (program, response)
+
+
+HANDLERS = {
+    "assemble": handle_assemble,
+    "check": handle_check,
+    "disassemble": handle_disassemble,
+    "run": handle_run,
+}
+
+
+def warm_up(settings: Settings) -> None:
+    """
+    Load and run a program that uses the Tiger standard library, so that the modules
+    that are imported lazily are imported before the workers are forked.
+    """
+    settings = copy.copy(settings)
+    program = load_program(WARM_UP_PROGRAM, settings, file=StringIO())
+    vm = VirtualMachine(settings, stdout=StringIO(), stderr=StringIO())
+    execute(vm, program, False)
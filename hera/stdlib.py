@@ -5,41 +5,39 @@ All of the pure HERA functions in this module have been copied from the original
 Tiger standard library file for HERA-C, written by Dave Wonnacott.
 
 Some standard library functions are implemented purely in HERA (e.g., `size`), and
-others are implemented partially or wholly in Python using the `__eval` pseudo-op,
-either because the operation accesses system resources like I/O that the HERA spec makes
-no provision for (e.g., `print`), or because implementing it in HERA would be too
-time-consuming (e.g., `div`).
+others are implemented partially or wholly in Python using the `__intrinsic` pseudo-op,
+which calls one of the `tiger_*` functions below, either because the operation accesses
+system resources like I/O that the HERA spec makes no provision for (e.g., `print`), or
+because implementing it in HERA would be too time-consuming (e.g., `div`).
 
 Author:  Ian Fisher (iafisher@fastmail.com)
 Version: February 2019
 """
-import sys
-
 from .utils import from_u16, to_u16
 
 
 def tiger_printint_stack(vm):
-    print(from_u16(vm.load_memory(vm.registers[14] + 3)), end="")
+    vm.print(from_u16(vm.load_memory(vm.registers[14] + 3)), end="")
 
 
 def tiger_printbool_stack(vm):
     v = vm.load_memory(vm.registers[14] + 3)
-    print("false" if v == 0 else "true", end="")
+    vm.print("false" if v == 0 else "true", end="")
 
 
 def tiger_print_stack(vm):
     addr = vm.load_memory(vm.registers[14] + 3)
     n = vm.load_memory(addr)
     for i in range(n):
-        print(chr(vm.load_memory(addr + i + 1)), end="")
+        vm.print(chr(vm.load_memory(addr + i + 1)), end="")
 
 
 def tiger_println_stack(vm):
     addr = vm.load_memory(vm.registers[14] + 3)
     n = vm.load_memory(addr)
     for i in range(n):
-        print(chr(vm.load_memory(addr + i + 1)), end="")
-    print()
+        vm.print(chr(vm.load_memory(addr + i + 1)), end="")
+    vm.print()
 
 
 def tiger_div_stack(vm):
@@ -73,11 +71,11 @@ def tiger_ungetchar_stack(vm):
 
 
 def tiger_putchar_ord_stack(vm):
-    print(chr(vm.load_memory(vm.registers[14] + 3)), end="")
+    vm.print(chr(vm.load_memory(vm.registers[14] + 3)), end="")
 
 
 def tiger_flush_stack(vm):
-    sys.stdout.flush()
+    vm.flush()
 
 
 def tiger_getline_preamble_stack(vm):
@@ -95,57 +93,57 @@ def tiger_getline_epilogue_stack(vm):
 # The standard library with parameters-on-the-stack functions.
 TIGER_STDLIB_STACK = """
 LABEL(printint)
-  __eval("stdlib.tiger_printint_stack(vm)")
+  __intrinsic("tiger_printint_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(print)
-  __eval("stdlib.tiger_print_stack(vm)")
+  __intrinsic("tiger_print_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(println)
-  __eval("stdlib.tiger_println_stack(vm)")
+  __intrinsic("tiger_println_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(div)
-  __eval("stdlib.tiger_div_stack(vm)")
+  __intrinsic("tiger_div_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(mod)
-  __eval("stdlib.tiger_mod_stack(vm)")
+  __intrinsic("tiger_mod_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(getchar_ord)
-  __eval("stdlib.tiger_getchar_ord_stack(vm)")
+  __intrinsic("tiger_getchar_ord_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(putchar_ord)
-  __eval("stdlib.tiger_putchar_ord_stack(vm)")
+  __intrinsic("tiger_putchar_ord_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(flush)
-  __eval("stdlib.tiger_flush_stack(vm)")
+  __intrinsic("tiger_flush_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(printbool)
-  __eval("stdlib.tiger_printbool_stack(vm)")
+  __intrinsic("tiger_printbool_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(ungetchar)
-  __eval("stdlib.tiger_ungetchar_stack(vm)")
+  __intrinsic("tiger_ungetchar_stack")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(getline)
-  __eval("stdlib.tiger_getline_preamble_stack(vm)")
+  __intrinsic("tiger_getline_preamble_stack")
   MOVE(R12, SP)
   INC(SP, 4)
 
@@ -156,7 +154,7 @@ LABEL(getline)
   LOAD(R1, 3, R12)
   DEC(SP, 4)
 
-  __eval("stdlib.tiger_getline_epilogue_stack(vm)")
+  __intrinsic("tiger_getline_epilogue_stack")
 
 
 LABEL(exit)
@@ -572,26 +570,26 @@ TIGER_STRING("WARNING: Entering untested territory in tiger stdlib\\n")
 
 
 def tiger_printint_reg(vm):
-    print(from_u16(vm.registers[1]), end="")
+    vm.print(from_u16(vm.registers[1]), end="")
 
 
 def tiger_printbool_reg(vm):
-    print("false" if vm.registers[1] == 0 else "true", end="")
+    vm.print("false" if vm.registers[1] == 0 else "true", end="")
 
 
 def tiger_print_reg(vm):
     addr = vm.registers[1]
     n = vm.load_memory(addr)
     for i in range(n):
-        print(chr(vm.load_memory(addr + i + 1)), end="")
+        vm.print(chr(vm.load_memory(addr + i + 1)), end="")
 
 
 def tiger_println_reg(vm):
     addr = vm.registers[1]
     n = vm.load_memory(addr)
     for i in range(n):
-        print(chr(vm.load_memory(addr + i + 1)), end="")
-    print()
+        vm.print(chr(vm.load_memory(addr + i + 1)), end="")
+    vm.print()
 
 
 def tiger_div_reg(vm):
@@ -623,11 +621,11 @@ def tiger_ungetchar_reg(vm):
 
 
 def tiger_putchar_ord_reg(vm):
-    print(chr(vm.registers[1]), end="")
+    vm.print(chr(vm.registers[1]), end="")
 
 
 def tiger_flush_reg(vm):
-    sys.stdout.flush()
+    vm.flush()
 
 
 def tiger_getline_preamble_reg(vm):
@@ -671,57 +669,57 @@ def tiger_tstrcmp_reg(vm):
 # The standard library with parameters-in-registers functions.
 TIGER_STDLIB_REG = """
 LABEL(printint)
-  __eval("stdlib.tiger_printint_reg(vm)")
+  __intrinsic("tiger_printint_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(print)
-  __eval("stdlib.tiger_print_reg(vm)")
+  __intrinsic("tiger_print_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(println)
-  __eval("stdlib.tiger_println_reg(vm)")
+  __intrinsic("tiger_println_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(div)
-  __eval("stdlib.tiger_div_reg(vm)")
+  __intrinsic("tiger_div_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(mod)
-  __eval("stdlib.tiger_mod_reg(vm)")
+  __intrinsic("tiger_mod_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(getchar_ord)
-  __eval("stdlib.tiger_getchar_ord_reg(vm)")
+  __intrinsic("tiger_getchar_ord_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(putchar_ord)
-  __eval("stdlib.tiger_putchar_ord_reg(vm)")
+  __intrinsic("tiger_putchar_ord_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(flush)
-  __eval("stdlib.tiger_flush_reg(vm)")
+  __intrinsic("tiger_flush_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(printbool)
-  __eval("stdlib.tiger_printbool_reg(vm)")
+  __intrinsic("tiger_printbool_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(ungetchar)
-  __eval("stdlib.tiger_ungetchar_reg(vm)")
+  __intrinsic("tiger_ungetchar_reg")
   RETURN(FP_alt, PC_ret)
 
 
 LABEL(tstrcmp)
-  __eval("stdlib.tiger_tstrcmp_reg(vm)")
+  __intrinsic("tiger_tstrcmp_reg")
   RETURN(FP_alt, PC_ret)
 
 
@@ -732,14 +730,14 @@ LABEL(exit)
 LABEL(getline)
   INC(SP, 1)
   STORE(PC_ret, 0, FP)
-  __eval("stdlib.tiger_getline_preamble_reg(vm)")
+  __intrinsic("tiger_getline_preamble_reg")
   MOVE(R12, SP)
 
   MOVE(FP_alt, SP)
   // R1 was set to the length of the string by tiger_getline_preamble_stack
   CALL(FP_alt, malloc)
 
-  __eval("stdlib.tiger_getline_epilogue_reg(vm)")
+  __intrinsic("tiger_getline_epilogue_reg")
   LOAD(PC_ret, 0, FP)
   DEC(SP, 1)
 
@@ -881,3 +879,10 @@ DLABEL(TIGER_STDLIB_REG_UNIMPLEMENTED)
 TIGER_STRING("Error -- call to unimplemented function from Tiger-stdlib-reg.hera\n")
 """
 )
+
+
+# The Python functions that Tiger standard library code can call with the __intrinsic
+# pseudo-op.
+INTRINSICS = {
+    name: value for name, value in globals().items() if name.startswith("tiger_")
+}
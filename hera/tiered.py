@@ -0,0 +1,127 @@
+"""
+The tiered execution engine.
+
+The tiered engine starts out executing each operation directly, like the default
+interpreter, and counts how many times execution enters each block, i.e. how many
+times each instruction is jumped to. Once a block has been entered `HOT_THRESHOLD`
+times, it is compiled with the JIT (see `hera/jit.py`), and the compiled function is
+used from then on. Code that only runs a few times, like initialization code, never
+pays the cost of compilation.
+
+With `--profile`, the set of blocks that turned out to be hot is saved in a file next
+to the program, and on the next run those blocks are compiled before the program
+starts.
+
+Author:  Ian Fisher (iafisher@fastmail.com)
+Version: October 2026
+"""
+import json
+
+from .cfg import may_jump
+from .data import Program, Settings
+from .jit import JIT
+from .vm import VirtualMachine
+
+
+# The number of times that a block must be entered before it is compiled.
+HOT_THRESHOLD = 50
+
+
+class TieredEngine:
+    """The tiered engine for a single program."""
+
+    def __init__(self, program: Program, settings: Settings) -> None:
+        self.code = program.code
+        self.settings = settings
+        self.jit = JIT(program, settings)
+        # Map from instruction numbers to the number of times that execution has jumped
+        # there.
+        self.counts = {}  # type: Dict[int, int]
+        # Whether each operation may jump somewhere other than the next operation.
+        self.jumps = [may_jump(op) for op in self.code]
+
+        if settings.profile_path:
+            for start in load_profile(settings.profile_path, len(self.code)):
+                self.jit.compile_block(start)
+
+    def run(self, vm: VirtualMachine) -> None:
+        """Execute the program on the virtual machine, starting at its current state."""
+        code = self.code
+        n = len(code)
+        jumps = self.jumps
+        counts = self.counts
+        blocks = self.jit.blocks
+        lengths = self.jit.lengths
+        throttle = self.settings.throttle
+        if throttle is False:
+            # A throttle that is never reached keeps the loop below simple.
+            throttle = float("inf")
+
+        pc = vm.pc
+        op_count = vm.op_count
+        while pc < n and op_count < throttle:
+            block = blocks.get(pc)
+            if block is None:
+                count = counts[pc] = counts.get(pc, 0) + 1
+                if count >= HOT_THRESHOLD:
+                    block = self.jit.compile_block(pc)
+
+            if block is not None and op_count + lengths[pc] <= throttle:
+                op_count += lengths[pc]
+                pc = block(vm)
+                continue
+
+            # Interpret operations one at a time until the next jump.
+            vm.pc = pc
+            while True:
+                op = code[pc]
+                vm.location = op.loc
+                op.execute(vm)
+                op_count += 1
+                if vm.halted or jumps[pc] or op_count >= throttle:
+                    break
+                pc = vm.pc
+                if pc >= n:
+                    break
+            pc = vm.pc
+
+            if vm.halted:
+                break
+
+        if not vm.halted:
+            vm.pc = pc
+        if self.settings.throttle is not False:
+            vm.op_count = op_count
+
+        if self.settings.profile_path:
+            save_profile(self.settings.profile_path, n, sorted(blocks))
+
+
+def load_profile(path: str, length: int) -> "List[int]":
+    """
+    Return the list of hot blocks saved in the profile at `path`, or an empty list if
+    the profile does not exist or does not match a program of `length` operations.
+    """
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    if not isinstance(profile, dict) or profile.get("length") != length:
+        return []
+
+    hot = profile.get("hot")
+    if not isinstance(hot, list):
+        return []
+
+    return [pc for pc in hot if isinstance(pc, int) and 0 <= pc < length]
+
+
+def save_profile(path: str, length: int, hot: "List[int]") -> None:
+    """Save the list of hot blocks of a program of `length` operations to `path`."""
+    try:
+        with open(path, "w") as f:
+            json.dump({"length": length, "hot": hot}, f)
+    except OSError:
+        pass
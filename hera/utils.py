@@ -121,35 +121,35 @@ def format_int(v: int, *, spec="xdsc") -> str:
     return " = ".join(ret)
 
 
-def print_warning(settings: Settings, msg: str, *, loc=None) -> None:
+def print_warning(settings: Settings, msg: str, *, loc=None, file=None) -> None:
     """
     Print a warning message to the console. See `print_message` for the meaning of
-    `loc`.
+    `loc` and `file`.
     """
     if settings.color:
         msg = ANSI_MAGENTA_BOLD + "Warning" + ANSI_RESET + ": " + msg
     else:
         msg = "Warning: " + msg
-    print_message(msg, loc=loc)
+    print_message(msg, loc=loc, file=file)
 
 
-def print_error(settings: Settings, msg: str, *, loc=None) -> None:
+def print_error(settings: Settings, msg: str, *, loc=None, file=None) -> None:
     """
     Print an error message to the console. See `print_message` for the meaning of
-    `loc`.
+    `loc` and `file`.
     """
     if settings.color:
         msg = ANSI_RED_BOLD + "Error" + ANSI_RESET + ": " + msg
     else:
         msg = "Error: " + msg
-    print_message(msg, loc=loc)
+    print_message(msg, loc=loc, file=file)
 
 
-def print_message(msg: str, *, loc=None) -> None:
+def print_message(msg: str, *, loc=None, file=None) -> None:
     """
-    Print a message to stderr. If `loc` is provided as either a Location object, or a
-    Token object with a `location` field, then the line of code that the location
-    indicates will be printed with the message.
+    Print a message to stderr, or to `file` if it is provided. If `loc` is provided as
+    either a Location object, or a Token object with a `location` field, then the line
+    of code that the location indicates will be printed with the message.
     """
     if isinstance(loc, Token):
         loc = loc.location
@@ -161,7 +161,9 @@ def print_message(msg: str, *, loc=None) -> None:
             loc.line, loc.column, loc.path, linetext, caret
         )
 
-    sys.stderr.write(msg + "\n")
+    if file is None:
+        file = sys.stderr
+    file.write(msg + "\n")
 
 
 def align_caret(line: str, col: int) -> str:
@@ -259,19 +261,19 @@ def pad(s: str, n: int) -> str:
     return (" " * (n - len(s))) + s
 
 
-def handle_messages(settings: Settings, messages: Messages) -> None:
+def handle_messages(settings: Settings, messages: Messages, *, file=None) -> None:
     """
-    Print to standard error for any warnings or errors recorded in `messages`. If any
-    errors were recorded, exit the program.
+    Print to standard error (or to `file`) for any warnings or errors recorded in
+    `messages`. If any errors were recorded, exit the program.
     """
     for msg, loc in messages.warnings:
-        print_warning(settings, msg, loc=loc)
+        print_warning(settings, msg, loc=loc, file=file)
 
     settings.warning_count += len(messages.warnings)
     messages.warnings.clear()
 
     for msg, loc in messages.errors:
-        print_error(settings, msg, loc=loc)
+        print_error(settings, msg, loc=loc, file=file)
 
     if messages.errors:
         sys.exit(3)
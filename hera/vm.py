@@ -6,9 +6,136 @@ Version: February 2019
 """
 import copy
 import sys
+from array import array
+from collections import deque
 
-from .data import Program, Settings
-from .utils import print_warning
+from .data import (
+    ENGINE_CLOSURE,
+    ENGINE_JIT,
+    ENGINE_TIERED,
+    MEMORY_ARRAY,
+    MEMORY_PAGED,
+    Program,
+    Settings,
+)
+from .memory import PagedMemory
+from .utils import print_error, print_warning
+
+
+# The value returned by a compiled closure (see `AbstractOperation.compile`) that halts
+# the machine. It is larger than any valid program counter, so that it terminates the
+# dispatch loop without an extra check on every iteration.
+HALTED_PC = 2 ** 32
+
+# The number of addressable words of memory.
+MEMORY_SIZE = 2 ** 16
+
+# The reasons why `VirtualMachine.step` returns.
+STEP_HALTED = "halted"
+STEP_BUDGET_EXHAUSTED = "budget exhausted"
+STEP_WAITING_FOR_INPUT = "waiting for input"
+STEP_THROTTLED = "throttled"
+
+# The bit of `VirtualMachine.flags` that holds each flag, in the same order as in the
+# value that SAVEF stores.
+FLAG_SIGN = 0b00001
+FLAG_ZERO = 0b00010
+FLAG_OVERFLOW = 0b00100
+FLAG_CARRY = 0b01000
+FLAG_CARRY_BLOCK = 0b10000
+
+# The zero and sign flag bits for each 16-bit value.
+ZERO_SIGN = (FLAG_ZERO,) + tuple(
+    FLAG_SIGN if value & 0x8000 else 0 for value in range(1, 2 ** 16)
+)
+
+
+def flag_property(bit: int, name: str) -> property:
+    """
+    Return a property that reads and writes a single bit of `VirtualMachine.flags` as a
+    boolean.
+    """
+
+    def getter(self) -> bool:
+        return bool(self.flags & bit)
+
+    def setter(self, value) -> None:
+        if value:
+            self.flags |= bit
+        else:
+            self.flags &= ~bit
+
+    return property(getter, setter, doc="The {} flag.".format(name))
+
+
+class WaitingForInput(Exception):
+    """
+    Raised by `VirtualMachine.readline` when a program that is executed with `step`
+    needs a line of input that has not been provided yet.
+    """
+
+
+class CallStack:
+    """
+    The shadow call stack of the virtual machine: the call address and the return
+    address of every CALL that has not returned yet, for RETURN's warnings and the
+    debugger's `info stack` command.
+
+    Each pair is packed into a single integer in an array. At most `max_depth` pairs are
+    kept: when the stack is full, its bottom half is forgotten, so that the stack stays
+    bounded even if a program never returns from its calls (e.g., because it jumps out
+    of them), while pushing and popping still take amortized constant time.
+    """
+
+    def __init__(self, max_depth: int) -> None:
+        self.max_depth = max_depth
+        # (return_address << 16) | call_address for each pair, from the bottom up.
+        self.entries = array("Q")
+        # The number of pairs at the bottom of the stack that have been forgotten.
+        self.forgotten = 0
+
+    def push(self, call_address: int, return_address: int) -> None:
+        """Push a call onto the stack."""
+        entries = self.entries
+        if len(entries) >= self.max_depth:
+            n = max(len(entries) // 2, 1)
+            del entries[:n]
+            self.forgotten += n
+        entries.append(return_address << 16 | call_address)
+
+    def pop(self) -> "Optional[Tuple[int, int]]":
+        """
+        Pop the most recent call off the stack, and return its call address and return
+        address, or None if the call has been forgotten. The stack must not be empty.
+        """
+        if self.entries:
+            entry = self.entries.pop()
+            return (entry & 0xFFFF, entry >> 16)
+        elif self.forgotten:
+            self.forgotten -= 1
+            return None
+        else:
+            raise IndexError("pop from empty call stack")
+
+    def copy(self) -> "CallStack":
+        ret = CallStack(self.max_depth)
+        ret.entries = array("Q", self.entries)
+        ret.forgotten = self.forgotten
+        return ret
+
+    def __len__(self) -> int:
+        return self.forgotten + len(self.entries)
+
+    def __iter__(self):
+        """Iterate over the pairs that have not been forgotten, from the bottom up."""
+        for entry in self.entries:
+            yield (entry & 0xFFFF, entry >> 16)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CallStack):
+            return self.forgotten == other.forgotten and self.entries == other.entries
+        else:
+            return NotImplemented
 
 
 class VirtualMachine:
@@ -17,10 +144,21 @@ class VirtualMachine:
 
     This class defines the state of a HERA processor and some utility functions for
     manipulating it, but the HERA language itself is defined in `hera/op.py`.
+
+    Everything that the program prints goes to `stdout`, warnings and errors go to
+    `stderr`, and input is read from `stdin`. When they are None (the default), the
+    process's standard streams at the time of use are used. A machine with streams of
+    its own shares no mutable state with other machines, so that many machines can run
+    in separate threads.
     """
 
-    def __init__(self, settings=Settings()) -> None:
+    def __init__(
+        self, settings=Settings(), *, stdout=None, stderr=None, stdin=None
+    ) -> None:
         self.settings = settings
+        self.stdout = stdout  # type: Optional[TextIO]
+        self.stderr = stderr  # type: Optional[TextIO]
+        self.stdin = stdin  # type: Optional[TextIO]
         self.reset()
 
     def reset(self) -> None:
@@ -34,28 +172,48 @@ class VirtualMachine:
         self.pc = 0
         # Current memory cell for data instructions
         self.dc = self.settings.data_start
-        # Status/control flags
-        self.flag_sign = False
-        self.flag_zero = False
-        self.flag_overflow = False
-        self.flag_carry = False
-        self.flag_carry_block = False
+        # Status/control flags, packed into a 5-bit integer (see `FLAG_SIGN` et al.).
+        # The flags can also be accessed individually as `flag_sign`, `flag_zero`, etc.
+        self.flags = 0
+        # In lazy-flags mode, the carry and overflow flags of the last arithmetic
+        # operation, which have not been computed yet, as a tuple of the function that
+        # computes them and its arguments. See `materialize_flags`.
+        self.pending_flags = None  # type: Optional[Tuple[Any, int, int, int, int]]
         # A memory array of 16-bit words. The HERA specification requires 2**16 words
-        # to be addressable, but we start off with a considerably smaller array and
-        # expand it as necessary, to keep the start-up time fast.
-        self.memory = [0] * (2 ** 4)
+        # to be addressable. With the default list backend, we start off with a
+        # considerably smaller array and expand it as necessary, to keep the start-up
+        # time fast. The other backends have all 2**16 words from the start.
+        if self.settings.memory == MEMORY_ARRAY:
+            self.memory = array("H", bytes(2 * MEMORY_SIZE))  # type: Any
+        elif self.settings.memory == MEMORY_PAGED:
+            self.memory = PagedMemory()
+        else:
+            self.memory = [0] * (2 ** 4)
         # Used by some Tiger standard library functions for rudimentary IO.
         self.input_buffer = ""
         self.input_pos = 0
+        # The lines of input that have been provided with `feed_input`, or None if
+        # input is read from standard input. See `readline`.
+        self.input_lines = None  # type: Optional[Deque[str]]
+        # A line of input that has been provided without its newline yet.
+        self.partial_input = ""
+        self.input_closed = False
+        # The program being executed with `step`, and the straight-line lengths of its
+        # operations (see `straight_line_lengths` in `hera/cfg.py`).
+        self.code = []  # type: List[Any]
+        self.lengths = []  # type: List[int]
         # Stack of (call_address, return_address) pairs for CALL/RETURN instructions.
         # Used for warning messages and debugging.
-        self.expected_returns = []  # type: List[Tuple[int, int]]
+        self.expected_returns = CallStack(self.settings.call_stack_depth)
         # Special flag set by the HALT operation.
         self.halted = False
         # Location object for the current operation
         self.location = None
         # Number of operations that have been executed - used for throttling.
         self.op_count = 0
+        # The operation count that `run_until` is executing up to, or None if there is
+        # no limit. Used by counted loops (see `COUNTED_LOOP` in `hera/op.py`).
+        self.op_limit = None  # type: Optional[int]
         # Have warnings been issued for use of SWI and RTI instructions?
         self.warned_for_SWI = False
         self.warned_for_RTI = False
@@ -66,19 +224,57 @@ class VirtualMachine:
         for dest, val in self.settings.init:
             self.registers[dest] = val
 
+    flag_sign = flag_property(FLAG_SIGN, "sign")
+    flag_zero = flag_property(FLAG_ZERO, "zero")
+    flag_overflow = flag_property(FLAG_OVERFLOW, "overflow")
+    flag_carry = flag_property(FLAG_CARRY, "carry")
+    flag_carry_block = flag_property(FLAG_CARRY_BLOCK, "carry-block")
+
     def copy(self) -> "VirtualMachine":
         """Return a copy of the virtual machine."""
         ret = copy.copy(self)
         ret.registers = self.registers.copy()
-        ret.memory = self.memory.copy()
+        # Paged memory is copied lazily. See `hera/memory.py`.
+        ret.memory = copy.copy(self.memory)
+        ret.expected_returns = self.expected_returns.copy()
+        if self.input_lines is not None:
+            ret.input_lines = deque(self.input_lines)
         return ret
 
     def run(self, program: Program) -> None:
         """Execute a program, resetting the machine's state beforehand."""
         self.reset()
+        self.load_data(program)
+        self.resume(program)
+
+    def resume(self, program: Program) -> None:
+        """
+        Execute a program from the current state of the machine, e.g. a copy of a
+        machine that the program's data has already been loaded into.
+        """
+        if self.settings.detect_loops:
+            from .detector import LoopDetector
 
-        for data_op in program.data:
-            data_op.execute(self)
+            LoopDetector(program, self.settings).run(self)
+            return
+        elif self.settings.lazy_flags:
+            self.run_lazy(program.code)
+            return
+        elif self.settings.engine == ENGINE_CLOSURE:
+            self.run_closures([op.compile(pc) for pc, op in enumerate(program.code)])
+            return
+        elif self.settings.engine == ENGINE_JIT:
+            # Imported here because hera.jit depends on hera.op, which depends on this
+            # module.
+            from .jit import JIT
+
+            JIT(program, self.settings).run(self)
+            return
+        elif self.settings.engine == ENGINE_TIERED:
+            from .tiered import TieredEngine
+
+            TieredEngine(program, self.settings).run(self)
+            return
 
         # This loop is performance-critical, so instead of having a single loop that
         # always does the throttle-checking, we check beforehand if throttling is turned
@@ -89,39 +285,232 @@ class VirtualMachine:
                 op = program.code[self.pc]
                 self.location = op.loc
                 op.execute(self)
+        else:
+            self.run_throttled(program.code)
+
+    def run_throttled(self, code: "List[AbstractOperation]") -> None:
+        """
+        Execute a program with the default engine, starting at the current program
+        counter, until `settings.throttle` operations have been executed.
+        """
+        from .cfg import straight_line_lengths
+
+        self.run_until(code, straight_line_lengths(code), self.settings.throttle)
+
+    def run_until(
+        self, code: "List[AbstractOperation]", lengths: "List[int]", limit: int
+    ) -> None:
+        """
+        Execute a program with the default engine, starting at the current program
+        counter, until the operation count reaches `limit`. `lengths` must be the
+        straight-line lengths of the operations (see `straight_line_lengths` in
+        `hera/cfg.py`).
+
+        Every operation in `code` that does not jump must advance the program counter by
+        exactly one, so `code` may not contain superinstructions (see `FusedOperation`
+        in `hera/op.py`). The optimizer never fuses operations in throttled programs,
+        and `start` replaces them with the operations that they stand for.
+
+        Instead of counting operations one at a time, the operation count is increased
+        once for each straight-line run of operations, by the length of the run. Only
+        the last run, which may not fit under the limit, is counted one operation at a
+        time.
+
+        Operations are counted before they execute, so that `COUNTED_LOOP` (see
+        `hera/op.py`) can tell how many operations it may skip without going over
+        `limit`.
+        """
+        n = len(code)
+        self.op_limit = limit
+        try:
+            while not self.halted and self.pc < n and self.op_count < limit:
+                pc = self.pc
+                length = lengths[pc]
+                if self.op_count + length > limit:
+                    length = 1
+
+                self.op_count += length
+                try:
+                    # Every operation in the run but the last one goes to the next.
+                    for op in code[pc : pc + length]:
+                        self.location = op.loc
+                        op.execute(self)
+                except WaitingForInput:
+                    # The operation that is waiting and the rest of the run did not
+                    # execute.
+                    self.op_count -= length - (self.pc - pc)
+                    raise
+        finally:
+            self.op_limit = None
+
+    def start(self, program: Program) -> None:
+        """
+        Prepare to execute a program in slices with `step`, resetting the machine's
+        state beforehand.
+
+        The program reads its input from `feed_input` instead of from standard input,
+        so that it never blocks while waiting for a line of input.
+
+        If the program has been optimized, its superinstructions are undone, since they
+        would throw off the operation count (see `run_until`).
+        """
+        from .cfg import straight_line_lengths
+        from .optimizer import unfuse_ops
+
+        self.reset()
+        self.load_data(program)
+        self.code = unfuse_ops(program.code)
+        self.lengths = straight_line_lengths(self.code)
+        self.input_lines = deque()
+
+    def step(self, max_instructions: int) -> str:
+        """
+        Continue executing the program that was passed to `start` for at most
+        `max_instructions` operations, and return why execution stopped: one of
+        `STEP_HALTED`, `STEP_BUDGET_EXHAUSTED`, `STEP_WAITING_FOR_INPUT` (in which case
+        execution resumes with the operation that needed the input, once more has been
+        provided with `feed_input`) or `STEP_THROTTLED`.
+
+        The program is always executed with the default interpreter, and `op_count`
+        counts every operation executed, whether or not the program is throttled.
+        """
+        limit = self.op_count + max_instructions
+        throttle = self.settings.throttle
+        if throttle is not False:
+            limit = min(limit, throttle)
+
+        try:
+            self.run_until(self.code, self.lengths, limit)
+        except WaitingForInput:
+            return STEP_WAITING_FOR_INPUT
+
+        if self.halted or self.pc >= len(self.code):
+            return STEP_HALTED
+        elif throttle is not False and self.op_count >= throttle:
+            return STEP_THROTTLED
+        else:
+            return STEP_BUDGET_EXHAUSTED
+
+    def feed_input(self, text: str) -> None:
+        """
+        Provide input for a program that is executed with `step`. The text need not end
+        at the end of a line.
+        """
+        lines = (self.partial_input + text).split("\n")
+        self.partial_input = lines.pop()
+        self.input_lines.extend(lines)
+
+    def close_input(self) -> None:
+        """
+        Signal the end of the input of a program that is executed with `step`. Once all
+        the input has been read, further reads get an empty line.
+        """
+        if self.partial_input:
+            self.input_lines.append(self.partial_input)
+            self.partial_input = ""
+        self.input_closed = True
+
+    def run_lazy(self, code: "List[AbstractOperation]") -> None:
+        """
+        Execute a program in lazy-flags mode, starting at the current program counter.
+
+        Arithmetic operations do not compute their carry and overflow flags, but record
+        what is needed to compute them in `self.pending_flags`. Since these flags are
+        usually overwritten before they are ever read, they are only computed (by
+        `materialize_flags`) when an operation that reads them is executed, and when
+        execution stops.
+        """
+        steps = [lazy_step(op) for op in code]
+        locs = [op.loc for op in code]
+        n = len(code)
+        if self.settings.throttle is False:
+            while not self.halted and self.pc < n:
+                self.location = locs[self.pc]
+                steps[self.pc](self)
         else:
             while (
                 not self.halted
-                and self.pc < len(program.code)
+                and self.pc < n
                 and self.op_count < self.settings.throttle
             ):
-                op = program.code[self.pc]
-                self.location = op.loc
-                op.execute(self)
+                self.location = locs[self.pc]
+                steps[self.pc](self)
                 self.op_count += 1
 
+        self.materialize_flags()
+
+    def materialize_flags(self) -> None:
+        """
+        Compute the pending carry and overflow flags of the last arithmetic operation,
+        if any.
+        """
+        if self.pending_flags is not None:
+            function, left, right, carry, result = self.pending_flags
+            self.pending_flags = None
+            self.flags = self.flags & ~(FLAG_CARRY | FLAG_OVERFLOW) | function(
+                left, right, carry, result
+            )
+
+    def run_closures(self, closures: "List[Callable[[VirtualMachine], int]]") -> None:
+        """
+        Execute a program that has been compiled into a list of closures, one for each
+        operation, starting at the current program counter.
+
+        Each closure takes the virtual machine as its argument and returns the next
+        value of the program counter. Closures do not update `self.pc` themselves, so
+        the program counter is kept in a local variable and written back once execution
+        stops.
+        """
+        n = len(closures)
+        pc = self.pc
+        if self.settings.throttle is False:
+            while pc < n:
+                pc = closures[pc](self)
+        else:
+            throttle = self.settings.throttle
+            op_count = self.op_count
+            while pc < n and op_count < throttle:
+                pc = closures[pc](self)
+                op_count += 1
+            self.op_count = op_count
+
+        if not self.halted:
+            self.pc = pc
+
     def load_register(self, index: int) -> int:
         """Get the contents of the register with the given index."""
         return self.registers[index]
 
     def store_register(self, index: int, value: int) -> None:
-        """Store the value in the target register."""
-        if index != 0:
-            self.registers[index] = value
-            if index == 15 and value >= self.settings.data_start:
-                if not self.warned_for_overflow:
-                    self.warn(
-                        "stack has overflowed into data segment", loc=self.location
-                    )
-                    self.warned_for_overflow = True
+        """
+        Store the value in the target register. Operations that know their destination
+        register in advance store to `self.registers` directly instead, and only call
+        `check_register` if the destination is R0 or R15.
+        """
+        self.registers[index] = value
+        if index == 0 or index == 15:
+            self.check_register(index)
+
+    def check_register(self, index: int) -> None:
+        """
+        Discard a value that has just been stored in R0, or warn if a value that has
+        just been stored in R15 means that the stack has overflowed.
+        """
+        if index == 0:
+            self.registers[0] = 0
+        elif index == 15 and self.registers[15] >= self.settings.data_start:
+            if not self.warned_for_overflow:
+                self.warn("stack has overflowed into data segment", loc=self.location)
+                self.warned_for_overflow = True
 
     def set_zero_and_sign(self, value: int) -> None:
         """Set the zero and sign flags based on the value."""
-        self.flag_zero = value == 0
-        self.flag_sign = bool(value & 0x8000)
+        self.flags = self.flags & ~(FLAG_ZERO | FLAG_SIGN) | ZERO_SIGN[value]
 
     def load_memory(self, address: int) -> int:
         """Get the value at the given memory address."""
+        # Addresses wrap around at 16 bits.
+        address &= 0xFFFF
         if address >= len(self.memory):
             return 0
         else:
@@ -129,16 +518,97 @@ class VirtualMachine:
 
     def store_memory(self, address: int, value: int) -> None:
         """Store a value to a location in memory."""
+        address &= 0xFFFF
         # Extend the size of the memory array if necessary.
         if address >= len(self.memory):
             self.memory.extend([0] * (address - len(self.memory) + 1))
         self.memory[address] = value
 
+    def store_memory_block(self, address: int, values: "List[int]") -> None:
+        """
+        Store a list of values to consecutive locations in memory. Like single
+        addresses, the block wraps around at 16 bits.
+        """
+        address &= 0xFFFF
+        end = address + len(values)
+        if end > MEMORY_SIZE:
+            split = MEMORY_SIZE - address
+            self.store_memory_block(0, values[split:])
+            values = values[:split]
+            end = MEMORY_SIZE
+
+        if end > len(self.memory):
+            self.memory.extend([0] * (end - len(self.memory)))
+        if isinstance(self.memory, array) and not isinstance(values, array):
+            self.memory[address:end] = array("H", values)
+        else:
+            self.memory[address:end] = values
+
+    def load_data(self, program: Program) -> None:
+        """
+        Load the program's data segment into memory, using its precomputed image if it
+        has one.
+        """
+        image = program.data_image
+        if image is None:
+            for data_op in program.data:
+                data_op.execute(self)
+        else:
+            if image.words:
+                self.store_memory_block(image.start, image.words)
+            self.dc = image.dc
+
     def readline(self) -> None:
-        """Read a line from standard input."""
-        self.input_buffer = sys.stdin.readline().rstrip("\n")
+        """
+        Read a line from standard input, or from the input provided with `feed_input`
+        if the program was started with `start`.
+        """
+        if self.input_lines is None:
+            stdin = self.stdin if self.stdin is not None else sys.stdin
+            self.input_buffer = stdin.readline().rstrip("\n")
+        elif self.input_lines:
+            self.input_buffer = self.input_lines.popleft()
+        elif self.input_closed:
+            self.input_buffer = ""
+        else:
+            raise WaitingForInput
+
+    def print(self, *args, sep=" ", end="\n", file=None) -> None:
+        """
+        Print to the machine's standard output (or to `file`), like the built-in
+        `print`.
+        """
+        if file is None:
+            file = self.stdout if self.stdout is not None else sys.stdout
+        file.write(sep.join(map(str, args)) + end)
+
+    def flush(self) -> None:
+        """Flush the machine's standard output."""
+        stdout = self.stdout if self.stdout is not None else sys.stdout
+        stdout.flush()
 
     def warn(self, msg: str, loc) -> None:
         """Print a warning message."""
-        print_warning(self.settings, msg, loc=loc)
+        print_warning(self.settings, msg, loc=loc, file=self.stderr)
         self.warning_count += 1
+
+    def error(self, msg: str, loc) -> None:
+        """Print an error message."""
+        print_error(self.settings, msg, loc=loc, file=self.stderr)
+
+
+def lazy_step(op) -> "Callable[[VirtualMachine], None]":
+    """
+    Return the function that executes the operation in lazy-flags mode. See
+    `AbstractOperation.execute_lazy`.
+    """
+    if op.execute_lazy is not None:
+        return op.execute_lazy
+
+    execute = op.execute
+
+    def step(vm):
+        vm.materialize_flags()
+        execute(vm)
+
+    return step
@@ -20,6 +20,7 @@ setup(
     author="Ian Fisher",
     author_email="iafisher@fastmail.com",
     entry_points={"console_scripts": ["hera = hera.main:external_main"]},
+    extras_require={"lockstep": ["numpy"]},
     packages=find_packages(exclude=["tests"]),
     project_urls={"Source": "https://github.com/iafisher/hera-py"},
     classifiers=[
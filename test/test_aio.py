@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+import sys
+from io import StringIO
+from unittest.mock import patch
+
+if sys.version_info < (3, 7):
+    pytest.skip("hera.aio requires Python 3.7", allow_module_level=True)
+
+from hera.aio import AsyncRunner, run_async
+from hera.data import Settings
+from hera.loader import load_program_from_file
+from hera.runner import STATUS_ERROR, STATUS_TIMED_OUT
+from hera.vm import STEP_HALTED, STEP_THROTTLED, VirtualMachine
+
+
+ECHO_PROGRAM = """\
+SET(R1, 42)
+__eval("(vm.readline(), print(vm.input_buffer))")
+"""
+
+LOOP_PROGRAM = "LABEL(top)\nINC(R1, 1)\nBR(top)\n"
+
+CMP_PROGRAM = """\
+SET(R1, 3)
+SET(R2, 5)
+CMP(R1, R2)
+SET(R4, 7)
+INC(R5, 1)
+BL(done)
+SET(R6, 99)
+LABEL(done)
+SET(R7, 1)
+"""
+
+COUNTED_LOOP_PROGRAM = "SET(R1, 1000)\nLABEL(top)\nINC(R2, 3)\nDEC(R1, 1)\nBNZ(top)\n"
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    yield loop
+    asyncio.set_event_loop(None)
+    loop.close()
+
+
+@pytest.fixture
+def runner():
+    runner = AsyncRunner(2, quantum=1000)
+    yield runner
+    runner.close()
+
+
+def test_run_async(capsys, loop):
+    path = "test/assets/cs350/getline.hera"
+    with open(path) as f:
+        source = f.read()
+    settings = Settings()
+    vm = VirtualMachine(settings)
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm.run(load_program_from_file(path, settings))
+
+    result = loop.run_until_complete(run_async(source, stdin="hello\n"))
+
+    assert result.status == STEP_HALTED
+    assert result.registers == vm.registers
+    assert result.flags["carry_block"] == vm.flag_carry_block
+    assert result.warnings == 0
+    assert result.time > 0
+    assert capsys.readouterr().out == ""
+
+
+def test_run_async_concurrently(capsys, loop, runner):
+    inputs = ["input {}\n".format(i) for i in range(10)]
+
+    results = loop.run_until_complete(
+        asyncio.gather(*[runner.run(ECHO_PROGRAM, stdin=text) for text in inputs])
+    )
+
+    assert [result.stdout for result in results] == inputs
+    assert all(result.registers[1] == 42 for result in results)
+    assert capsys.readouterr().out == ""
+
+
+def test_run_async_with_throttle(loop, runner):
+    result = loop.run_until_complete(runner.run(LOOP_PROGRAM, throttle=2500))
+
+    assert result.status == STEP_THROTTLED
+    assert result.op_count == 2500
+
+
+def test_run_async_with_timeout(loop, runner):
+    result = loop.run_until_complete(runner.run(LOOP_PROGRAM, timeout=0.1))
+
+    assert result.status == STATUS_TIMED_OUT
+    assert result.time >= 0.1
+    assert result.op_count > 0
+
+
+def test_run_async_with_errors(capsys, loop, runner):
+    bad, failed = loop.run_until_complete(
+        asyncio.gather(
+            runner.run("SET(R1, 1)\nFOO(R1)"),
+            runner.run('SET(R1, 1)\n__eval("1 / 0")'),
+        )
+    )
+
+    assert bad.status == STATUS_ERROR
+    assert bad.registers is None
+    assert "unknown instruction `FOO`" in bad.stderr
+    assert failed.status == STATUS_ERROR
+    assert failed.registers[1] == 1
+    assert "Python exception: division by zero" in failed.stderr
+    assert capsys.readouterr().err == ""
+
+
+def test_run_async_with_settings(loop, runner):
+    settings = Settings()
+    settings.warn_return_on = False
+
+    result = loop.run_until_complete(
+        runner.run("SET(R13, 3)\nRETURN(R12, R13)", settings=settings)
+    )
+
+    assert result.status == STEP_HALTED
+    assert result.warnings == 0
+    assert settings.color
+
+
+@pytest.mark.parametrize(
+    "program", [CMP_PROGRAM, COUNTED_LOOP_PROGRAM], ids=["cmp", "counted_loop"]
+)
+def test_run_async_with_optimize(loop, runner, program):
+    settings = Settings()
+    settings.throttle = 1000000
+    expected = loop.run_until_complete(runner.run(program, settings=settings))
+    settings = Settings()
+    settings.optimize = True
+
+    result = loop.run_until_complete(runner.run(program, settings=settings))
+
+    assert result.status == STEP_HALTED
+    assert result.registers == expected.registers
+    assert result.flags == expected.flags
+    assert result.op_count == expected.op_count
+
+
+def test_cancelled_run_stops_virtual_machine(loop):
+    runner = AsyncRunner(1, quantum=1000)
+    task = loop.create_task(runner.run(LOOP_PROGRAM))
+    loop.call_later(0.1, task.cancel)
+
+    with pytest.raises(asyncio.CancelledError):
+        loop.run_until_complete(task)
+
+    # If the cancelled program were still running, it would occupy the only worker.
+    result = loop.run_until_complete(asyncio.wait_for(runner.run("SET(R1, 5)"), 5))
+    assert result.registers[1] == 5
+    runner.close()
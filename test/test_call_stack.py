@@ -0,0 +1,110 @@
+import pytest
+
+from .utils import execute_program_helper
+
+from hera.data import Settings
+from hera.op import RETURN
+from hera.vm import CallStack, VirtualMachine
+
+
+CALL_PROGRAM = """\
+SET(R1, 100)
+LABEL(top)
+  CALL(FP_alt, do_nothing)
+  DEC(R1, 1)
+  BNZ(top)
+HALT()
+
+LABEL(do_nothing)
+  RETURN(FP_alt, PC_ret)
+"""
+
+
+def test_call_stack_push_and_pop():
+    stack = CallStack(10)
+    stack.push(0xFFFF, 70000)
+    stack.push(5, 6)
+
+    assert len(stack) == 2
+    assert list(stack) == [(0xFFFF, 70000), (5, 6)]
+    assert stack.pop() == (5, 6)
+    assert stack.pop() == (0xFFFF, 70000)
+    assert not stack
+
+
+def test_call_stack_forgets_oldest_calls_when_full():
+    stack = CallStack(4)
+    for i in range(5):
+        stack.push(i, i + 1)
+
+    assert len(stack) == 5
+    assert stack.forgotten == 2
+    assert list(stack) == [(2, 3), (3, 4), (4, 5)]
+    assert [stack.pop() for _ in range(5)] == [(4, 5), (3, 4), (2, 3), None, None]
+    assert not stack
+
+
+def test_call_stack_pop_from_empty_stack():
+    with pytest.raises(IndexError):
+        CallStack(4).pop()
+
+
+def test_call_stack_copy():
+    stack = CallStack(4)
+    stack.push(1, 2)
+
+    copy = stack.copy()
+    copy.push(3, 4)
+
+    assert len(stack) == 1
+    assert copy != stack
+    copy.pop()
+    assert copy == stack
+
+
+def test_virtual_machine_copy_copies_call_stack():
+    vm = VirtualMachine()
+    vm.expected_returns.push(1, 2)
+
+    vm.copy().expected_returns.pop()
+
+    assert len(vm.expected_returns) == 1
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "closure", "jit"])
+def test_return_pops_call_stack_with_warn_return_off(engine):
+    vm = execute_program_helper(
+        CALL_PROGRAM, flags=["--warn-return-off", "--engine", engine]
+    )
+
+    assert vm.registers[1] == 0
+    assert len(vm.expected_returns) == 0
+
+
+def test_call_stack_stays_bounded_when_calls_never_return():
+    program = """\
+SET(R1, 5000)
+LABEL(top)
+CALL(FP_alt, next)
+LABEL(next)
+DEC(R1, 1)
+BNZ(top)
+"""
+    vm = execute_program_helper(program)
+
+    assert len(vm.expected_returns) == 5000
+    assert len(vm.expected_returns.entries) <= Settings().call_stack_depth
+
+
+def test_no_warning_for_return_from_forgotten_call(capsys):
+    settings = Settings(color=False)
+    settings.call_stack_depth = 2
+    vm = VirtualMachine(settings)
+    for _ in range(3):
+        vm.expected_returns.push(4, 5)
+
+    for _ in range(3):
+        RETURN.check_return_address(vm, 5)
+
+    assert vm.warning_count == 0
+    assert capsys.readouterr().err == ""
@@ -0,0 +1,128 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state
+
+from hera.data import Settings
+from hera.main import main
+from hera.vm import VirtualMachine
+
+
+def compile_helper(capsys, path, *, flags=[]):
+    main(["compile", "--no-color"] + flags + [path, "-o", "-"])
+    source = capsys.readouterr().out
+    namespace = {"__name__": "compiled"}
+    exec(compile(source, "<compiled>", "exec"), namespace)
+    return namespace["run"]
+
+
+def run_compiled(capsys, path, *, settings=None, flags=[]):
+    run = compile_helper(capsys, path, flags=flags)
+    vm = VirtualMachine(settings or Settings(color=False))
+    with patch("sys.stdin", StringIO("hello\n")):
+        run(vm)
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+def run_interpreted(capsys, path, *, flags=[]):
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["-q", "--no-color"] + flags + [path])
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_compiled_program_matches_interpreter(capsys, path):
+    expected_vm, expected_out, _ = run_interpreted(capsys, path)
+    vm, out, _ = run_compiled(capsys, path)
+
+    assert_same_state(expected_vm, vm)
+    assert out == expected_out
+
+
+@pytest.mark.parametrize("throttle", [1, 7, 100, 1000])
+def test_compiled_program_with_throttle(capsys, throttle):
+    path = "test/assets/cs350/merge_sort.hera"
+    expected_vm, _, _ = run_interpreted(
+        capsys, path, flags=["--throttle", str(throttle)]
+    )
+    settings = Settings(color=False)
+    settings.throttle = throttle
+    vm, _, _ = run_compiled(capsys, path, settings=settings)
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_compiled_program_with_big_stack(capsys):
+    path = "test/assets/cs350/record_trees.hera"
+    expected_vm, _, _ = run_interpreted(capsys, path, flags=["--big-stack"])
+    settings = Settings(color=False)
+    settings.data_start = 0xC167
+    vm, _, _ = run_compiled(capsys, path, settings=settings, flags=["--big-stack"])
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_compiled_program_can_be_run_twice(capsys):
+    path = "test/assets/cs240/fib.hera"
+    run = compile_helper(capsys, path)
+    vm = VirtualMachine(Settings(color=False))
+    run(vm)
+    registers = vm.registers.copy()
+    run(vm)
+
+    assert vm.registers == registers
+
+
+def test_compiled_program_warns_for_stack_overflow(capsys):
+    with patch("sys.stdin", StringIO("SET(SP, 0xC002)\nINC(SP, 5)")):
+        run = compile_helper(capsys, "-")
+    vm = VirtualMachine(Settings(color=False))
+    run(vm)
+
+    assert vm.registers[15] == 0xC007
+    captured = capsys.readouterr()
+    assert captured.err.count("stack has overflowed into data segment") == 1
+    assert "line 1 col 1 of <stdin>" in captured.err
+
+
+def test_compiled_program_with_eval(capsys):
+    program = """\
+SET(R1, 5)
+__eval("vm.store_register(2, vm.registers[1] + 1)")
+INC(R2, 1)
+"""
+    with patch("sys.stdin", StringIO(program)):
+        run = compile_helper(capsys, "-")
+    vm = VirtualMachine(Settings(color=False))
+    run(vm)
+
+    assert vm.registers[1] == 5
+    assert vm.registers[2] == 7
+
+
+def test_compile_writes_to_default_path(tmp_path):
+    path = tmp_path / "fib.hera"
+    with open("test/assets/cs240/fib.hera") as f:
+        path.write_text(f.read())
+
+    main(["compile", str(path)])
+
+    assert (tmp_path / "fib_hera.py").exists()
+
+
+def test_compile_with_output_flag(tmp_path):
+    output = tmp_path / "out.py"
+    main(["compile", "test/assets/cs240/fib.hera", "--output=" + str(output)])
+
+    assert "def run(vm):" in output.read_text()
+
+
+def test_output_flag_without_compile(capsys):
+    with pytest.raises(SystemExit):
+        main(["-o", "out.py", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--output is not compatible with the chosen mode" in captured.err
@@ -5,6 +5,7 @@ from hera.data import Constant, DataLabel, DEFAULT_DATA_START, Label, Program, S
 from hera.debugger import debug, Debugger, Shell
 from hera.debugger.debugger import reverse_lookup_label
 from hera.loader import load_program
+from hera.vm import CallStack
 
 
 @pytest.fixture
@@ -661,6 +662,33 @@ Call stack (last call at bottom)
     )
 
 
+def test_handle_info_with_stack_arg_and_forgotten_calls(capsys):
+    shell = load_shell(
+        """\
+CALL(FP_alt, do_nothing)
+HALT()
+
+LABEL(do_nothing)
+  RETURN(FP_alt, PC_ret)
+"""
+    )
+    shell.debugger.vm.expected_returns = CallStack(1)
+    for _ in range(3):
+        shell.debugger.vm.expected_returns.push(0, 1)
+
+    shell.handle_command("info stack")
+
+    captured = capsys.readouterr().out
+    assert (
+        captured
+        == """\
+Call stack (last call at bottom)
+  (2 earlier calls not shown)
+  <string>:1 (called from <string>:1)
+"""
+    )
+
+
 def test_handle_info_with_unrecognized_arg(shell, capsys):
     shell.handle_command("info symbols machine")
 
@@ -912,6 +940,18 @@ def test_handle_restart(shell, capsys):
     )
 
 
+def test_handle_restart_reloads_data():
+    shell = load_shell(
+        "DLABEL(x)\nINTEGER(42)\nSET(R1, x)\nSET(R2, 0)\nSTORE(R2, 0, R1)"
+    )
+    shell.handle_command("n 3")
+    assert shell.debugger.vm.load_memory(DEFAULT_DATA_START) == 0
+
+    shell.handle_command("restart")
+
+    assert shell.debugger.vm.load_memory(DEFAULT_DATA_START) == 42
+
+
 def test_handle_restart_with_too_many_args(shell, capsys):
     shell.handle_command("restart 1")
 
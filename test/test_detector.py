@@ -0,0 +1,143 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .test_engine import ALL_OPS_PROGRAM
+from .utils import PROGRAMS, assert_same_state, execute_program_helper
+
+from hera.data import Settings
+from hera.detector import loop_tops
+from hera.loader import load_program
+from hera.main import main
+from hera.vm import VirtualMachine
+
+
+def run_program(capsys, path, *, flags=[]):
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["--no-color"] + flags + [path])
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_detector_matches_interpreter(capsys, path):
+    expected_vm, expected_out, expected_err = run_program(capsys, path)
+    vm, out, err = run_program(capsys, path, flags=["--detect-loops"])
+
+    assert_same_state(expected_vm, vm)
+    assert out == expected_out
+    assert err == expected_err
+
+
+@pytest.mark.parametrize("flags", [[], ["--optimize"], ["--throttle", "30"]])
+def test_detector_matches_interpreter_on_all_ops(flags):
+    expected_vm = execute_program_helper(ALL_OPS_PROGRAM, flags=flags)
+    vm = execute_program_helper(ALL_OPS_PROGRAM, flags=["--detect-loops"] + flags)
+
+    assert_same_state(expected_vm, vm)
+
+
+def run_until_detected(program, *, throttle=False):
+    settings = Settings(color=False)
+    settings.detect_loops = True
+    settings.throttle = throttle
+    vm = VirtualMachine(settings)
+    with pytest.raises(SystemExit) as e:
+        vm.run(load_program(program, settings))
+
+    assert e.value.code == 3
+    return vm
+
+
+def test_detector_stops_infinite_loop(capsys):
+    program = """\
+SET(R1, 100)
+LABEL(top)
+INC(R2, 1)
+DEC(R2, 1)
+BR(top)
+"""
+    vm = run_until_detected(program)
+
+    assert vm.pc == 2
+    assert vm.op_count < 20
+    captured = capsys.readouterr()
+    assert "infinite loop detected at `top`, line 3" in captured.err
+
+
+def test_detector_stops_infinite_loop_with_longer_cycle(capsys):
+    program = """\
+SET(R1, 1)
+LABEL(top)
+INC(R2, 1)
+SET(R3, 7)
+AND(R2, R2, R3)
+STORE(R2, 0, R2)
+BR(top)
+"""
+    vm = run_until_detected(program, throttle=10000)
+
+    assert vm.op_count < 1000
+    captured = capsys.readouterr()
+    assert "infinite loop detected at `top`" in captured.err
+    assert "throttled" not in captured.err
+
+
+def test_detector_exits_with_error_code(capsys):
+    with pytest.raises(SystemExit) as e:
+        execute_program_helper("LABEL(top)\nBR(top)", flags=["--detect-loops"])
+
+    assert e.value.code == 3
+    captured = capsys.readouterr()
+    assert "infinite loop detected at `top`" in captured.err
+
+
+def test_detector_compares_memory(capsys):
+    # The registers cycle, but memory never repeats.
+    program = """\
+SET(R1, 1)
+LABEL(top)
+LOAD(R2, 0, R1)
+INC(R2, 1)
+STORE(R2, 0, R1)
+SET(R2, 0)
+BR(top)
+"""
+    vm = execute_program_helper(program, flags=["--detect-loops", "--throttle", "500"])
+
+    assert vm.op_count == 500
+    captured = capsys.readouterr()
+    assert "infinite loop" not in captured.err
+    assert "Program throttled after 500 instructions." in captured.err
+
+
+def test_detector_restores_virtual_machine_methods():
+    vm = execute_program_helper("SET(R1, 42)", flags=["--detect-loops"])
+
+    assert "store_memory" not in vm.__dict__
+    assert "readline" not in vm.__dict__
+
+
+def test_loop_tops():
+    program = load_program(
+        "LABEL(top)\nSET(R1, 100)\nBZR(top)\nBNZR(end)\nLABEL(end)\nBR(top)",
+        Settings(),
+    )
+
+    assert loop_tops(program) == {0}
+
+
+def test_detect_loops_requires_interpreter(capsys):
+    with pytest.raises(SystemExit):
+        main(["--detect-loops", "--engine=jit", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--detect-loops requires --engine=interpreter." in captured.err
+
+
+def test_detect_loops_with_lazy_flags(capsys):
+    with pytest.raises(SystemExit):
+        main(["--detect-loops", "--lazy-flags", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--lazy-flags and --detect-loops are incompatible." in captured.err
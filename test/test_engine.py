@@ -0,0 +1,191 @@
+"""Test that the alternative execution engines behave identically to the interpreter.
+"""
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state, execute_program_helper
+
+from hera.main import main
+
+
+ENGINES = ["closure", "jit", "tiered"]
+
+
+def run_with_engine(capsys, path, engine, *, flags=[]):
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["--engine", engine] + flags + [path])
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_engine_matches_interpreter(capsys, engine, path):
+    expected_vm, expected_out, expected_err = run_with_engine(
+        capsys, path, "interpreter"
+    )
+    vm, out, err = run_with_engine(capsys, path, engine)
+
+    assert_same_state(expected_vm, vm)
+    assert out == expected_out
+    assert err == expected_err
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("throttle", ["1", "7", "100", "1000"])
+def test_engine_matches_interpreter_with_throttle(capsys, engine, throttle):
+    path = "test/assets/cs350/merge_sort.hera"
+    flags = ["--throttle", throttle]
+    expected_vm, expected_out, expected_err = run_with_engine(
+        capsys, path, "interpreter", flags=flags
+    )
+    vm, out, err = run_with_engine(capsys, path, engine, flags=flags)
+
+    assert_same_state(expected_vm, vm)
+    assert out == expected_out
+    assert err == expected_err
+
+
+@pytest.mark.parametrize("throttle", range(1, 50))
+def test_interpreter_counts_every_operation_when_throttled(capsys, throttle):
+    # The interpreter counts operations once per straight-line run, so check it against
+    # the closure engine, which counts them one at a time.
+    program = "SET(R1, 3)\nLABEL(top)\nINC(R2, 2)\nDEC(R1, 1)\nBNZ(top)\nHALT()"
+    flags = ["--throttle", str(throttle)]
+    expected_vm = execute_program_helper(program, flags=["--engine=closure"] + flags)
+    expected_err = capsys.readouterr().err
+    vm = execute_program_helper(program, flags=flags)
+
+    assert_same_state(expected_vm, vm)
+    assert capsys.readouterr().err == expected_err
+
+
+# A program that exercises every operation that the engines specialize, with flag
+# combinations that hit the carry and overflow edge cases.
+ALL_OPS_PROGRAM = """\
+SET(R1, 0x7FFF)
+SET(R2, 0x8001)
+SET(R3, -1)
+CON()
+ADD(R4, R1, R3)
+SAVEF(R5)
+SUB(R6, R2, R1)
+SAVEF(R7)
+CBON()
+ADD(R4, R4, R1)
+SUB(R6, R6, R3)
+CCBOFF()
+MUL(R8, R1, R2)
+AND(R9, R2, R3)
+OR(R10, R1, R2)
+XOR(R10, R10, R3)
+INC(R1, 64)
+DEC(R2, 2)
+SAVEF(R5)
+CON()
+LSL(R4, R3)
+LSR(R5, R4)
+ASL(R6, R2)
+ASR(R7, R2)
+LSL8(R8, R1)
+LSR8(R9, R1)
+SAVEF(R10)
+RSTRF(R5)
+FON(0b10101)
+FOFF(0b00110)
+FSET4(0b1001)
+SAVEF(R11)
+FSET5(0b10010)
+SET(R12, 0xFFF0)
+STORE(R1, 3, R12)
+STORE(R2, 31, R12)
+LOAD(R13, 3, R12)
+LOAD(R14, 31, R12)
+LOAD(R9, 0, R0)
+CALL(FP_alt, function)
+BR(end)
+LABEL(function)
+  CMP(R1, R2)
+  BLR(1)
+  INC(R8, 1)
+  BULE(skip)
+  DEC(R8, 1)
+LABEL(skip)
+  RETURN(FP_alt, PC_ret)
+LABEL(end)
+"""
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("flags", [[], ["--optimize"], ["--throttle", "30"]])
+def test_engine_matches_interpreter_on_all_ops(engine, flags):
+    expected_vm = execute_program_helper(ALL_OPS_PROGRAM, flags=flags)
+    vm = execute_program_helper(ALL_OPS_PROGRAM, flags=["--engine", engine] + flags)
+
+    assert_same_state(expected_vm, vm)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_with_long_straight_line_code(engine):
+    program = "INC(R1, 1)\n" * 1000
+    vm = execute_program_helper(program, flags=["--engine", engine])
+
+    assert vm.registers[1] == 1000
+    assert vm.pc == 1000
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_with_debugging_ops(capsys, engine):
+    program = 'SET(R1, 5)\nprint_reg(R1)\nprint("hi")\nINC(R1, 1)\nprint_reg(R1)'
+    vm = execute_program_helper(program, flags=["--engine", engine])
+
+    assert vm.registers[1] == 6
+    captured = capsys.readouterr()
+    assert "R1 = 0x0005 = 5\nhi" in captured.out
+    assert "R1 = 0x0006 = 6" in captured.out
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_with_halt(engine):
+    program = "SET(R1, 1)\nHALT()\nSET(R1, 2)"
+    vm = execute_program_helper(program, flags=["--engine", engine])
+
+    assert vm.registers[1] == 1
+    assert vm.halted
+    assert vm.pc == 2
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_with_stack_overflow_warning(capsys, engine):
+    program = "SET(SP, 0xC002)\nINC(SP, 5)"
+    vm = execute_program_helper(program, flags=["--engine", engine])
+
+    assert vm.registers[15] == 0xC007
+    captured = capsys.readouterr()
+    assert captured.err.count("stack has overflowed into data segment") == 1
+    assert "line 1" in captured.err
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engine_ignores_writes_to_R0(engine):
+    program = "SET(R0, 5)\nINC(R0, 1)\nADD(R0, R0, R0)"
+    vm = execute_program_helper(program, flags=["--engine", engine])
+
+    assert vm.registers[0] == 0
+
+
+def test_engine_flag_with_unknown_engine(capsys):
+    with pytest.raises(SystemExit):
+        main(["--engine", "turbo", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "Unrecognized engine: turbo" in captured.err
+
+
+def test_engine_flag_with_debug_mode(capsys):
+    with pytest.raises(SystemExit):
+        main(["debug", "--engine=closure", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--engine is not compatible with the chosen mode" in captured.err
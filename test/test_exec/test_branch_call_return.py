@@ -2,7 +2,7 @@ import pytest
 from .utils import helper
 
 from hera.data import Token
-from hera.op import name_to_class
+from hera.op import Branch, name_to_class
 from hera.vm import VirtualMachine
 
 
@@ -297,3 +297,12 @@ def test_RETURN_updates_first_register(vm):
     helper(vm, "RETURN(R12, R13)")
 
     assert vm.registers[12] == 550
+
+
+def test_branch_truth_tables_match_conditions():
+    vm = VirtualMachine()
+    for cls in name_to_class.values():
+        if issubclass(cls, Branch) and "should" in cls.__dict__:
+            for flags in range(32):
+                vm.flags = flags
+                assert cls.TABLE[flags] == bool(cls.should(vm)), (cls.__name__, flags)
@@ -1,7 +1,9 @@
 import pytest
+from unittest.mock import patch
 from .utils import helper
 
 from hera.data import DEFAULT_DATA_START
+from hera.loader import load_program
 from hera.vm import VirtualMachine
 
 
@@ -61,3 +63,24 @@ def test_LP_STRING_does_not_increment_pc(vm):
     helper(vm, 'LP_STRING("hello")')
 
     assert vm.pc == 0
+
+
+def test_data_image():
+    program = load_program('LP_STRING("hi")\nDSKIP(3)\nINTEGER(-1)\nDSKIP(2)')
+
+    image = program.data_image
+    assert image.start == DEFAULT_DATA_START
+    assert list(image.words) == [2, ord("h"), ord("i"), 0, 0, 0, 0xFFFF]
+    assert image.dc == DEFAULT_DATA_START + 9
+
+
+def test_run_loads_data_image_without_executing_data_statements():
+    program = load_program('LP_STRING("hi")\nINTEGER(5)')
+    vm = VirtualMachine()
+
+    with patch("hera.op.LP_STRING.execute") as mock_execute:
+        vm.run(program)
+
+    assert mock_execute.call_count == 0
+    assert vm.memory[DEFAULT_DATA_START : DEFAULT_DATA_START + 4] == [2, 104, 105, 5]
+    assert vm.dc == DEFAULT_DATA_START + 4
@@ -1,7 +1,8 @@
 import pytest
 from .utils import helper
 
-from hera.data import Settings
+from hera.data import Settings, Token
+from hera.op import __EVAL
 from hera.vm import VirtualMachine
 
 
@@ -52,3 +53,31 @@ def test___eval_increments_pc(vm):
     helper(vm, '__eval("0")')
 
     assert vm.pc == 1
+
+
+def test___eval_is_compiled_once():
+    op1 = __EVAL(Token(Token.STRING, "vm.registers[1] + 1"))
+    op2 = __EVAL(Token(Token.STRING, "vm.registers[1] + 1"))
+
+    assert op1.code is op2.code
+
+
+def test___eval_with_syntax_error(vm, capsys):
+    with pytest.raises(SystemExit):
+        helper(vm, '__eval("1 +")')
+
+    assert "Python exception: invalid syntax" in capsys.readouterr().err
+
+
+def test_exec___intrinsic(vm, capsys):
+    vm.registers[1] = 0xFFFE
+
+    helper(vm, '__intrinsic("tiger_printint_reg")')
+
+    assert capsys.readouterr().out == "-2"
+
+
+def test___intrinsic_increments_pc(vm):
+    helper(vm, '__intrinsic("tiger_flush_reg")')
+
+    assert vm.pc == 1
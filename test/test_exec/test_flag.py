@@ -582,3 +582,44 @@ def test_FSET4_increments_pc(vm):
     helper(vm, "FSET4(0)")
 
     assert vm.pc == 1
+
+
+def test_flags_are_packed_into_an_integer(vm):
+    vm.flag_sign = True
+    vm.flag_carry = True
+
+    assert vm.flags == 0b1001
+
+    vm.flags = 0b10110
+
+    assert not vm.flag_sign
+    assert vm.flag_zero
+    assert vm.flag_overflow
+    assert not vm.flag_carry
+    assert vm.flag_carry_block
+
+
+def test_SAVEF_after_LSL_saves_carry_as_single_bit(vm):
+    vm.registers[2] = 0x8000
+
+    helper(vm, "LSL(R1, R2)")
+    helper(vm, "SAVEF(R5)")
+
+    assert vm.registers[5] == 0b1010
+
+
+def test_SAVEF_after_ASL_saves_carry_as_single_bit(vm):
+    vm.registers[2] = 0x8000
+
+    helper(vm, "ASL(R1, R2)")
+    helper(vm, "SAVEF(R5)")
+
+    assert vm.registers[5] == 0b1110
+
+
+def test_RSTRF_ignores_high_bits(vm):
+    vm.registers[5] = 0xFFE1
+
+    helper(vm, "RSTRF(R5)")
+
+    assert vm.flags == 0b00001
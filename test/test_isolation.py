@@ -0,0 +1,114 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS
+
+from hera.data import Settings
+from hera.loader import load_program, load_program_from_file
+from hera.vm import VirtualMachine
+
+
+IO_PROGRAM = """\
+print("a")
+println("b")
+SET(R1, 7)
+print_reg(R1)
+__eval("print('c', end='')")
+SET(R13, 9)
+RETURN(R12, R13)
+"""
+
+
+def make_settings(engine, lazy_flags=False):
+    settings = Settings(color=False)
+    settings.engine = engine
+    settings.lazy_flags = lazy_flags
+    return settings
+
+
+@pytest.mark.parametrize(
+    "engine,lazy_flags",
+    [("interpreter", False), ("interpreter", True), ("closure", False), ("jit", False)],
+)
+def test_virtual_machine_with_own_streams(capsys, engine, lazy_flags):
+    settings = make_settings(engine, lazy_flags)
+    program = load_program(IO_PROGRAM, settings)
+    stdout = StringIO()
+    stderr = StringIO()
+    vm = VirtualMachine(settings, stdout=stdout, stderr=stderr)
+
+    vm.run(program)
+
+    assert stdout.getvalue() == "ab\nR1 = 0x0007 = 7\nc"
+    assert "incorrect return address (got 9, expected <nothing>)" in stderr.getvalue()
+    assert vm.warning_count == 1
+    assert settings.warning_count == 0
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err == ""
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "jit"])
+def test_virtual_machine_with_own_stderr_for_errors(capsys, engine):
+    settings = make_settings(engine)
+    program = load_program('__eval("1 / 0")', settings)
+    stderr = StringIO()
+    vm = VirtualMachine(settings, stderr=stderr)
+
+    with pytest.raises(SystemExit):
+        vm.run(program)
+
+    assert "Python exception: division by zero" in stderr.getvalue()
+    assert capsys.readouterr().err == ""
+
+
+def test_virtual_machine_with_own_stdin():
+    settings = Settings()
+    program = load_program_from_file("test/assets/cs350/getline.hera", settings)
+    vm = VirtualMachine(settings, stdin=StringIO("hello\n"))
+
+    with patch("sys.stdin", StringIO("wrong\n")):
+        vm.run(program)
+
+    address = vm.registers[1]
+    assert vm.memory[address : address + 6] == [5] + [ord(c) for c in "hello"]
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "jit"])
+def test_virtual_machines_in_threads(capsys, engine):
+    programs = [
+        load_program_from_file(path, make_settings(engine)) for path in PROGRAMS
+    ]
+    capsys.readouterr()
+    expected = []
+    for program in programs:
+        vm = VirtualMachine(make_settings(engine))
+        with patch("sys.stdin", StringIO("hello\n")):
+            vm.run(program)
+        expected.append((capsys.readouterr(), vm.registers, vm.warning_count))
+
+    def run(program):
+        stdout = StringIO()
+        stderr = StringIO()
+        stdin = StringIO("hello\n")
+        settings = make_settings(engine)
+        vm = VirtualMachine(settings, stdout=stdout, stderr=stderr, stdin=stdin)
+        vm.run(program)
+        return stdout.getvalue(), stderr.getvalue(), vm.registers, vm.warning_count
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(run, programs * 4))
+
+    for i, (out, err, registers, warning_count) in enumerate(results):
+        captured, expected_registers, expected_warning_count = expected[
+            i % len(programs)
+        ]
+        assert out == captured.out
+        assert err == captured.err
+        assert registers == expected_registers
+        assert warning_count == expected_warning_count
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err == ""
@@ -0,0 +1,71 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .test_engine import ALL_OPS_PROGRAM
+from .utils import PROGRAMS, assert_same_state, execute_program_helper
+
+from hera.main import main
+
+
+def run_program(capsys, path, *, flags=[]):
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["--no-color"] + flags + [path])
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_lazy_flags_matches_interpreter(capsys, path):
+    expected_vm, expected_out, expected_err = run_program(capsys, path)
+    vm, out, err = run_program(capsys, path, flags=["--lazy-flags"])
+
+    assert_same_state(expected_vm, vm)
+    assert vm.pending_flags is None
+    assert out == expected_out
+    assert err == expected_err
+
+
+@pytest.mark.parametrize("flags", [[], ["--optimize"], ["--throttle", "30"]])
+def test_lazy_flags_matches_interpreter_on_all_ops(flags):
+    expected_vm = execute_program_helper(ALL_OPS_PROGRAM, flags=flags)
+    vm = execute_program_helper(ALL_OPS_PROGRAM, flags=["--lazy-flags"] + flags)
+
+    assert_same_state(expected_vm, vm)
+
+
+@pytest.mark.parametrize("throttle", ["1", "2", "3", "4"])
+def test_lazy_flags_computes_flags_when_throttled(throttle):
+    program = "SET(R1, 0xFFFF)\nINC(R1, 1)\nADD(R2, R1, R1)\nDEC(R2, 1)"
+    flags = ["--throttle", throttle]
+    expected_vm = execute_program_helper(program, flags=flags)
+    vm = execute_program_helper(program, flags=["--lazy-flags"] + flags)
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_lazy_flags_are_computed_for_branches():
+    program = """\
+SET(R1, 0x7FFF)
+INC(R1, 1)
+BVR(skip)
+SET(R2, 1)
+LABEL(skip)
+SET(R3, 0xFFFF)
+INC(R3, 1)
+BCR(end)
+SET(R4, 1)
+LABEL(end)
+"""
+    vm = execute_program_helper(program, flags=["--lazy-flags"])
+
+    assert vm.registers[2] == 0
+    assert vm.registers[4] == 0
+
+
+def test_lazy_flags_with_wrong_engine(capsys):
+    with pytest.raises(SystemExit):
+        main(["--lazy-flags", "--engine=jit", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--lazy-flags requires --engine=interpreter" in captured.err
@@ -0,0 +1,121 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state, execute_program_helper
+
+from hera.data import Settings
+from hera.loader import load_program, load_program_from_file
+from hera.main import main
+from hera.vm import MEMORY_SIZE
+
+lockstep = pytest.importorskip("hera.lockstep")
+pytest.importorskip("numpy")
+
+
+INITS = [[], [(1, 5)], [(1, 0xFFFF), (2, 3)], [(1, 20), (2, 0x8000)]]
+
+
+def run_interpreted(path, init):
+    initstr = ", ".join("R{}={}".format(dest, val) for dest, val in init)
+    with patch("sys.stdin", StringIO("hello\n")):
+        return main(["-q", "--no-color", "--init", initstr, path])
+
+
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_lockstep_matches_interpreter(capsys, path):
+    settings = Settings(color=False)
+    program = load_program_from_file(path, settings)
+    with patch("sys.stdin", StringIO("hello\n" * len(INITS))):
+        vms = lockstep.run_lockstep(program, INITS, settings)
+
+    for init, vm in zip(INITS, vms):
+        assert_same_state(run_interpreted(path, init), vm)
+        assert vm.stdout.getvalue() == capsys.readouterr().out
+
+
+DIVERGENT_PROGRAM = """\
+// Count down from R1 to zero, adding R1 to R2 each time, and square R3 if R1 starts
+// out odd.
+SET(R2, 0)
+LSR(R4, R1)
+BNC(loop)
+MUL(R3, R3, R3)
+LABEL(loop)
+  CMP(R1, R0)
+  BZ(end)
+  ADD(R2, R2, R1)
+  DEC(R1, 1)
+  BR(loop)
+LABEL(end)
+SAVEF(R5)
+"""
+
+
+def test_lockstep_with_divergent_lanes():
+    inits = [[(1, i), (3, i + 100)] for i in range(32)]
+    vms = lockstep.run_lockstep(load_program(DIVERGENT_PROGRAM), inits)
+
+    for init, vm in zip(inits, vms):
+        flags = ["--init", "R1={}, R3={}".format(init[0][1], init[1][1])]
+        assert_same_state(execute_program_helper(DIVERGENT_PROGRAM, flags=flags), vm)
+
+
+def test_lockstep_with_throttle():
+    settings = Settings()
+    settings.throttle = 50
+    inits = [[(1, 3)], [(1, 30)]]
+    vms = lockstep.run_lockstep(load_program(DIVERGENT_PROGRAM), inits, settings)
+
+    assert vms[0].op_count < 50
+    assert vms[1].op_count == 50
+    expected = execute_program_helper(
+        DIVERGENT_PROGRAM, flags=["--init", "R1=30", "--throttle", "50"]
+    )
+    assert_same_state(expected, vms[1])
+
+
+def test_lockstep_with_stack_overflow_warning(capsys):
+    program = load_program("INC(SP, 5)\nINC(SP, 1)")
+    inits = [[(15, 0xC000)], [(15, 0)], [(15, 0xC100)]]
+    vms = lockstep.run_lockstep(program, inits, Settings(color=False))
+
+    assert [vm.warning_count for vm in vms] == [1, 0, 1]
+    assert [vm.stderr.getvalue().count("stack has overflowed") for vm in vms] == [
+        1,
+        0,
+        1,
+    ]
+    assert capsys.readouterr().err == ""
+
+
+def test_lockstep_with_incorrect_return_address(capsys):
+    program = load_program("CALL(FP_alt, R1)\nHALT()\nRETURN(FP_alt, R13)")
+    inits = [[(1, 2), (13, 1)], [(1, 2), (13, 3)]]
+    vms = lockstep.run_lockstep(program, inits, Settings(color=False))
+
+    assert [vm.warning_count for vm in vms] == [0, 1]
+    assert "incorrect return address (got 3, expected 1)" in vms[1].stderr.getvalue()
+    assert capsys.readouterr().err == ""
+
+
+def test_lockstep_with_debugging_ops(capsys):
+    program = load_program("print_reg(R1)\nprintln(\"done\")")
+    vms = lockstep.run_lockstep(program, [[(1, 1)], [(1, 2)]])
+
+    assert vms[0].stdout.getvalue() == "R1 = 0x0001 = 1\ndone\n"
+    assert vms[1].stdout.getvalue() == "R1 = 0x0002 = 2\ndone\n"
+    assert capsys.readouterr().out == ""
+
+
+def test_lockstep_memory_address_wraps_around():
+    program = "STORE(R2, 5, R1)\nLOAD(R3, 4, R0)\nLOAD(R4, 0, R1)"
+    inits = [[(1, 0xFFFF), (2, 42)], [(1, 0xFFFE), (2, 7)]]
+    vms = lockstep.run_lockstep(load_program(program), inits)
+
+    for init, vm in zip(inits, vms):
+        initstr = "R1={}, R2={}".format(init[0][1], init[1][1])
+        expected = execute_program_helper(program, flags=["--init", initstr])
+        assert_same_state(expected, vm)
+    assert vms[0].registers[3] == 42
+    assert len(vms[0].memory) < MEMORY_SIZE
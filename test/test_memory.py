@@ -0,0 +1,149 @@
+import copy
+import pytest
+from array import array
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, execute_program_helper
+
+from hera.data import MEMORY_ARRAY, MEMORY_PAGED, Settings
+from hera.main import main
+from hera.memory import PAGE_SIZE, PagedMemory
+from hera.vm import MEMORY_SIZE, VirtualMachine
+
+
+def run_program(capsys, path, *, flags=[]):
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["--no-color"] + flags + [path])
+    captured = capsys.readouterr()
+    return vm, captured.out, captured.err
+
+
+def words(memory):
+    """Return the memory as a list, without trailing zeros."""
+    ret = list(memory)
+    while ret and ret[-1] == 0:
+        ret.pop()
+    return ret
+
+
+@pytest.mark.parametrize("memory", ["array", "paged"])
+@pytest.mark.parametrize("engine", ["interpreter", "closure", "jit", "tiered"])
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_memory_backend_matches_list_memory(capsys, path, engine, memory):
+    flags = ["--engine", engine]
+    expected_vm, expected_out, expected_err = run_program(capsys, path, flags=flags)
+    vm, out, err = run_program(capsys, path, flags=flags + ["--memory", memory])
+
+    assert len(vm.memory) == MEMORY_SIZE
+    assert vm.registers == expected_vm.registers
+    assert vm.flags == expected_vm.flags
+    assert words(vm.memory) == words(expected_vm.memory)
+    assert out == expected_out
+    assert err == expected_err
+
+
+def test_array_memory_copy():
+    settings = Settings()
+    settings.memory = MEMORY_ARRAY
+    vm = VirtualMachine(settings)
+    vm.store_memory(0xC001, 42)
+
+    snapshot = vm.copy()
+    snapshot.store_memory(0xC001, 43)
+
+    assert isinstance(snapshot.memory, array)
+    assert vm.load_memory(0xC001) == 42
+    assert snapshot.load_memory(0xC001) == 43
+
+
+@pytest.mark.parametrize("memory", ["list", "array", "paged"])
+@pytest.mark.parametrize("engine", ["interpreter", "jit"])
+def test_memory_address_wraps_around(memory, engine):
+    program = "SET(R1, 0xFFFF)\nSET(R2, 42)\nSTORE(R2, 3, R1)\nLOAD(R3, 0, R0)\n"
+    program += "LOAD(R4, 2, R0)"
+    vm = execute_program_helper(program, flags=["--memory", memory, "--engine", engine])
+
+    assert vm.registers[3] == 0
+    assert vm.registers[4] == 42
+
+
+def test_store_memory_block_with_array_memory():
+    settings = Settings()
+    settings.memory = MEMORY_ARRAY
+    vm = VirtualMachine(settings)
+
+    vm.store_memory_block(0xC001, [1, 2, 3])
+
+    assert len(vm.memory) == MEMORY_SIZE
+    assert vm.memory[0xC000:0xC005].tolist() == [0, 1, 2, 3, 0]
+
+
+def test_store_memory_block_with_list_memory():
+    vm = VirtualMachine()
+
+    vm.store_memory_block(20, [1, 2, 3])
+
+    assert vm.memory[19:] == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize("memory", ["list", "array", "paged"])
+def test_store_memory_block_wraps_around(memory):
+    settings = Settings()
+    settings.memory = memory
+    vm = VirtualMachine(settings)
+
+    vm.store_memory_block(0xFFFE, [1, 2, 3, 4])
+
+    assert vm.load_memory(0xFFFE) == 1
+    assert vm.load_memory(0xFFFF) == 2
+    assert vm.load_memory(0) == 3
+    assert vm.load_memory(1) == 4
+    assert len(vm.memory) == MEMORY_SIZE
+
+
+def test_unrecognized_memory_backend(capsys):
+    with pytest.raises(SystemExit):
+        main(["--memory=tape", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "Unrecognized memory backend: tape" in captured.err
+
+
+def test_paged_memory_copy_shares_pages():
+    settings = Settings()
+    settings.memory = MEMORY_PAGED
+    vm = VirtualMachine(settings)
+    vm.store_memory(0xC001, 42)
+    vm.store_memory(5, 7)
+
+    snapshot = vm.copy()
+    snapshot.store_memory(0xC001, 43)
+
+    assert vm.load_memory(0xC001) == 42
+    assert snapshot.load_memory(0xC001) == 43
+    assert snapshot.load_memory(5) == 7
+    # Only the page that was written to after the copy was taken is not shared.
+    shared = [a is b for a, b in zip(vm.memory.pages, snapshot.memory.pages)]
+    assert shared.count(False) == 1
+
+
+def test_paged_memory_writes_to_original_after_copy():
+    memory = PagedMemory()
+    memory[PAGE_SIZE + 1] = 1
+    snapshot = copy.copy(memory)
+
+    memory[PAGE_SIZE + 1] = 2
+
+    assert snapshot[PAGE_SIZE + 1] == 1
+    assert memory[PAGE_SIZE + 1] == 2
+    assert memory[PAGE_SIZE : PAGE_SIZE + 3] == [0, 2, 0]
+    assert snapshot != memory
+
+
+def test_paged_memory_is_default_for_debugger():
+    with patch("hera.main.debug") as mock_debug:
+        main(["debug", "test/assets/cs240/fib.hera"])
+
+    settings = mock_debug.call_args[0][1]
+    assert settings.memory == MEMORY_PAGED
@@ -0,0 +1,361 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state, execute_program_helper
+
+from hera.checker import check
+from hera.data import Settings
+from hera.main import main
+from hera.cfg import successors
+from hera.op import (
+    COUNTED_LOOP,
+    FLAGLESS_ADD,
+    FLAGLESS_INC,
+    FLAGLESS_LOAD,
+    FUSED_CMP,
+    FUSED_SET,
+    FUSED_SET_BRANCH,
+    FUSED_SET_CALL,
+    INC,
+    LOAD,
+    SETHI,
+    SUB,
+    FlaglessOperation,
+    FusedOperation,
+)
+from hera.optimizer import accelerate_loops, eliminate_dead_flags, fuse_ops, optimize
+from hera.parser import parse
+from hera.vm import STEP_BUDGET_EXHAUSTED, VirtualMachine
+
+
+def preprocess(text):
+    oplist, messages = parse(text)
+    assert not messages.errors
+    program, messages = check(oplist, Settings())
+    assert not messages.errors
+    return program
+
+
+def test_fuse_ops_with_SET():
+    code = fuse_ops(preprocess("SET(R1, 0x1234)").code)
+
+    assert len(code) == 2
+    assert isinstance(code[0], FUSED_SET)
+    assert code[0].value == 0x1234
+    assert isinstance(code[1], SETHI)
+
+
+def test_fuse_ops_with_negative_SET():
+    code = fuse_ops(preprocess("SET(R1, -5)").code)
+
+    assert code[0].value == 0xFFFB
+
+
+def test_fuse_ops_does_not_fuse_SET_of_R0_or_SP():
+    program = preprocess("SET(R0, 1)\nSET(SP, 0xC100)")
+
+    assert fuse_ops(program.code) == program.code
+
+
+def test_fuse_ops_with_branch_to_label():
+    code = fuse_ops(preprocess("LABEL(top)\nBNZ(top)").code)
+
+    assert len(code) == 3
+    assert isinstance(code[0], FUSED_SET_BRANCH)
+
+
+def test_fuse_ops_with_call_to_label():
+    code = fuse_ops(preprocess("LABEL(f)\nCALL(FP_alt, f)").code)
+
+    assert len(code) == 3
+    assert isinstance(code[0], FUSED_SET_CALL)
+
+
+def test_fuse_ops_with_CMP():
+    code = fuse_ops(preprocess("CMP(R1, R2)").code)
+
+    assert len(code) == 2
+    assert isinstance(code[0], FUSED_CMP)
+
+
+def test_fuse_ops_does_not_fuse_NEG():
+    program = preprocess("NEG(R1, R2)")
+
+    assert fuse_ops(program.code) == program.code
+
+
+def test_eliminate_dead_flags_with_overwritten_flags():
+    program = preprocess("CBON()\nINC(R1, 1)\nADD(R2, R1, R1)\nSUB(R3, R2, R1)")
+    code = eliminate_dead_flags(program)
+
+    assert isinstance(code[1], FLAGLESS_INC)
+    assert isinstance(code[2], FLAGLESS_ADD)
+    # The flags are live at the end of the program.
+    assert isinstance(code[3], SUB)
+
+
+def test_eliminate_dead_flags_keeps_carry_read_by_ADD():
+    code = eliminate_dead_flags(preprocess("INC(R1, 1)\nADD(R2, R1, R1)"))
+
+    assert isinstance(code[0], INC)
+
+
+def test_eliminate_dead_flags_keeps_flags_read_by_branch():
+    program = preprocess(
+        "LABEL(top)\nLOAD(R1, 0, R2)\nINC(R2, 1)\nLOAD(R3, 0, R2)\nBNZ(top)\nINC(R4, 1)"
+    )
+    code = eliminate_dead_flags(program)
+
+    assert isinstance(code[0], FLAGLESS_LOAD)
+    # BNZ only reads the zero flag, which LOAD overwrites.
+    assert isinstance(code[1], FLAGLESS_INC)
+    assert isinstance(code[2], LOAD)
+
+
+def test_eliminate_dead_flags_keeps_flags_read_at_branch_target():
+    program = preprocess(
+        """\
+INC(R1, 1)
+BR(skip)
+INC(R1, 1)
+INC(R1, 1)
+LABEL(skip)
+BNC(end)
+LABEL(end)
+INC(R2, 1)
+"""
+    )
+    code = eliminate_dead_flags(program)
+
+    assert isinstance(code[0], INC)
+    assert isinstance(code[4], FLAGLESS_INC)
+    assert isinstance(code[5], INC)
+
+
+def test_eliminate_dead_flags_with_unknown_branch_target():
+    program = preprocess("INC(R1, 1)\nBR(R5)\nINC(R1, 1)")
+    code = eliminate_dead_flags(program)
+
+    assert isinstance(code[0], INC)
+
+
+def test_successors_with_constant_branch_target():
+    program = preprocess("LABEL(top)\nINC(R1, 1)\nBNZ(top)\nRETURN(FP_alt, PC_ret)")
+
+    assert successors(program) == [[1], [2], [3], [0, 4], None]
+
+
+def test_successors_with_jump_between_SETLO_and_SETHI():
+    program = preprocess(
+        "SETLO(R11, 0)\nLABEL(middle)\nSETHI(R11, 0)\nBR(R11)\nBRR(middle)"
+    )
+
+    assert successors(program)[2] is None
+
+
+def test_dead_flag_elimination_preserves_flags():
+    program = """\
+CBON()
+SET(R1, 0x7FFF)
+SET(R2, 3)
+LABEL(loop)
+  LOAD(R3, 0, R2)
+  INC(R1, 1)
+  ADD(R4, R1, R2)
+  SAVEF(R5)
+  DEC(R2, 1)
+  BNZ(loop)
+INC(R1, 1)
+"""
+    expected = execute_program_helper(program)
+    vm = execute_program_helper(program, flags=["--optimize"])
+
+    assert_same_state(expected, vm)
+
+
+def test_fused_ops_preserve_flags():
+    program = """\
+SET(R1, 5)
+SET(R2, 0xFFFF)
+CMP(R1, R2)
+SAVEF(R3)
+CMP(R2, R1)
+SAVEF(R4)
+CMP(R1, R1)
+SAVEF(R5)
+"""
+    expected = execute_program_helper(program)
+    vm = execute_program_helper(program, flags=["--optimize"])
+
+    assert_same_state(expected, vm)
+
+
+def test_jump_into_middle_of_fused_op():
+    program = """\
+SET(R1, 3)
+SETLO(R2, 0x34)
+LABEL(middle)
+SETHI(R2, 0x12)
+DEC(R1, 1)
+BNZ(middle)
+"""
+    expected = execute_program_helper(program)
+    vm = execute_program_helper(program, flags=["--optimize"])
+
+    assert vm.registers[2] == 0x1234
+    assert_same_state(expected, vm)
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "closure", "jit", "tiered"])
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_optimize_matches_interpreter(capsys, engine, path):
+    with patch("sys.stdin", StringIO("hello\n")):
+        expected_vm = main([path])
+    expected = capsys.readouterr()
+
+    with patch("sys.stdin", StringIO("hello\n")):
+        vm = main(["--optimize", "--engine", engine, path])
+    captured = capsys.readouterr()
+
+    assert_same_state(expected_vm, vm)
+    assert captured.out == expected.out
+    assert captured.err == expected.err
+
+
+def test_optimize_with_throttle(capsys):
+    with patch("sys.stdin", StringIO("LABEL(start)\nSET(R1, 1)\nBR(start)")):
+        vm = main(["--optimize", "--throttle", "100", "-"])
+
+    assert vm.op_count == 100
+    assert "Program throttled after 100 instructions." in capsys.readouterr().err
+
+
+COUNTED_LOOP_PROGRAM = """\
+SET(R1, 300)
+SET(R3, 7)
+LABEL(top)
+INC(R2, 3)
+SET(R4, 0x1234)
+XOR(R5, R4, R3)
+DEC(R1, 1)
+BNZ(top)
+SET(R6, 4)
+DEC(R6, 2)
+BNZR(-1)
+"""
+
+
+def test_accelerate_loops():
+    program = preprocess(COUNTED_LOOP_PROGRAM)
+    code = accelerate_loops(program.code, program.code)
+
+    assert isinstance(code[4], COUNTED_LOOP)
+    assert code[4].counter == 1
+    assert code[4].accumulators == [(1, 0xFFFF), (2, 3)]
+    assert code[4].length == 8
+    assert isinstance(code[14], COUNTED_LOOP)
+    assert code[14].length == 2
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        # Memory and I/O side effects
+        "STORE(R2, 0, R1)",
+        "print_reg(R2)",
+        # A register that is both incremented and assigned
+        "SET(R2, 1)",
+        # Operands that change during the loop
+        "AND(R4, R2, R3)",
+        "XOR(R5, R4, R3)\nSET(R4, 1)",
+        # An operation that reads the carry flag
+        "ADD(R4, R3, R3)",
+    ],
+)
+def test_accelerate_loops_rejects_loop(body):
+    program = preprocess(
+        "SET(R1, 10)\nLABEL(top)\nINC(R2, 1)\n{}\nDEC(R1, 1)\nBNZ(top)".format(body)
+    )
+    code = accelerate_loops(program.code, program.code)
+
+    assert not any(isinstance(op, COUNTED_LOOP) for op in code)
+
+
+def test_accelerate_loops_requires_counter_to_set_flags_last():
+    program = preprocess("LABEL(top)\nDEC(R1, 1)\nINC(R2, 1)\nBNZ(top)")
+    code = accelerate_loops(program.code, program.code)
+
+    assert isinstance(code[0], COUNTED_LOOP)
+    assert code[0].counter == 2
+
+
+def test_counted_loop_iterations():
+    program = preprocess("LABEL(top)\nDEC(R1, 4)\nBNZR(-1)")
+    loop = accelerate_loops(program.code, program.code)[0]
+
+    assert loop.iterations(12) == 3
+    assert loop.iterations(0) == 2 ** 14
+    assert loop.iterations(0xFFFC) == 2 ** 14 - 1
+    # The counter skips over zero.
+    assert loop.iterations(13) is None
+
+
+@pytest.mark.parametrize("flags", [[], ["--big-stack"]])
+def test_counted_loop_matches_interpreter(capsys, flags):
+    expected_vm = execute_program_helper(COUNTED_LOOP_PROGRAM, flags=flags)
+    expected = capsys.readouterr()
+    vm = execute_program_helper(COUNTED_LOOP_PROGRAM, flags=["--optimize"] + flags)
+    captured = capsys.readouterr()
+
+    assert_same_state(expected_vm, vm)
+    assert vm.registers[2] == 900
+    assert captured.out == expected.out
+
+
+@pytest.mark.parametrize(
+    "throttle", [1, 4, 5, 6, 11, 12, 13, 20, 100, 1000, 2405, 2406, 2407, 2410, 3000]
+)
+def test_counted_loop_with_throttle(capsys, throttle):
+    flags = ["--throttle", str(throttle)]
+    expected_vm = execute_program_helper(COUNTED_LOOP_PROGRAM, flags=flags)
+    expected = capsys.readouterr()
+    vm = execute_program_helper(COUNTED_LOOP_PROGRAM, flags=["--optimize"] + flags)
+    captured = capsys.readouterr()
+
+    assert_same_state(expected_vm, vm)
+    assert captured.err == expected.err
+
+
+@pytest.mark.parametrize("budget", [1, 5, 13, 1000, 10 ** 6])
+def test_counted_loop_with_step(budget):
+    expected_vm = execute_program_helper(
+        COUNTED_LOOP_PROGRAM, flags=["--throttle", "1000000"]
+    )
+
+    vm = VirtualMachine()
+    vm.start(optimize(preprocess(COUNTED_LOOP_PROGRAM), Settings()))
+    op_count = 0
+    while vm.step(budget) == STEP_BUDGET_EXHAUSTED:
+        op_count += budget
+        assert vm.op_count == op_count
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_optimize_for_counted_execution():
+    program = preprocess(COUNTED_LOOP_PROGRAM)
+    code = optimize(program, Settings(), counted=True).code
+
+    assert not any(isinstance(op, FusedOperation) for op in code)
+    assert not any(isinstance(op, FlaglessOperation) for op in code)
+    assert isinstance(code[4], COUNTED_LOOP)
+
+
+def test_counted_loop_that_never_ends(capsys):
+    program = "SET(R1, 5)\nLABEL(top)\nDEC(R1, 2)\nBNZ(top)"
+    flags = ["--throttle", "1000"]
+    expected_vm = execute_program_helper(program, flags=flags)
+    vm = execute_program_helper(program, flags=["--optimize"] + flags)
+
+    assert_same_state(expected_vm, vm)
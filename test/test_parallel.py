@@ -0,0 +1,128 @@
+import pytest
+from unittest.mock import patch
+
+from hera.data import Settings
+from hera.loader import load_program
+from hera.main import main
+from hera.parallel import list_inputs, run_inputs
+
+
+ECHO_PROGRAM = """\
+DLABEL(greeting)
+LP_STRING("hello")
+SET(R1, greeting)
+LOAD(R2, 0, R1)
+__eval("(vm.readline(), print(vm.input_buffer))")
+"""
+
+INPUTS = ["first", "second", "third", "fourth", "fifth"]
+
+
+@pytest.fixture
+def inputs_dir(tmp_path):
+    directory = tmp_path / "inputs"
+    directory.mkdir()
+    for i, text in enumerate(INPUTS):
+        (directory / "{}.txt".format(i)).write_text(text + "\n")
+    # Subdirectories are skipped.
+    (directory / "subdir").mkdir()
+    return directory
+
+
+@pytest.fixture
+def program_path(tmp_path):
+    path = tmp_path / "echo.hera"
+    path.write_text(ECHO_PROGRAM)
+    return str(path)
+
+
+@pytest.mark.parametrize("jobs", ["1", "3"])
+def test_inputs_match_separate_runs(capsys, inputs_dir, program_path, jobs):
+    expected_out = ""
+    expected_err = ""
+    for path in list_inputs(str(inputs_dir)):
+        with open(path) as f, patch("sys.stdin", f):
+            main(["--no-color", program_path])
+        captured = capsys.readouterr()
+        expected_out += "==> {} <==\n".format(path) + captured.out
+        expected_err += captured.err
+
+    main(["--no-color", "--inputs", str(inputs_dir), "-j", jobs, program_path])
+
+    captured = capsys.readouterr()
+    assert captured.out == expected_out
+    assert captured.err == expected_err
+    assert [line for line in captured.out.splitlines() if "==>" not in line] == INPUTS
+
+
+def test_inputs_with_failed_run(capsys, tmp_path):
+    directory = tmp_path / "inputs"
+    directory.mkdir()
+    for name, text in [("a", "1"), ("b", "0"), ("c", "2")]:
+        (directory / name).write_text(text + "\n")
+    path = tmp_path / "main.hera"
+    path.write_text('__eval("(vm.readline(), print(1 // int(vm.input_buffer)))")')
+
+    with pytest.raises(SystemExit) as e:
+        main(["--no-color", "--inputs={}".format(directory), "--jobs=2", str(path)])
+
+    assert e.value.code == 3
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "==> {} <==".format(directory / "a"),
+        "1",
+        "==> {} <==".format(directory / "b"),
+        "==> {} <==".format(directory / "c"),
+        "0",
+    ]
+    assert captured.err.count("Virtual machine state after execution") == 2
+    assert "Error: Python exception: integer division or modulo by zero" in captured.err
+
+
+def test_run_inputs_with_report(inputs_dir):
+    settings = Settings(color=False)
+    settings.throttle = 10
+    program = load_program("SET(R1, 5)\nLABEL(top)\nDEC(R1, 1)\nBNZ(top)", settings)
+
+    results = run_inputs(
+        program,
+        settings,
+        list_inputs(str(inputs_dir)),
+        jobs=2,
+        report=lambda vm, settings, file: file.write(str(vm.op_count)),
+    )
+
+    assert [result.stderr for result in results] == ["10"] * len(INPUTS)
+    assert [result.exit_code for result in results] == [None] * len(INPUTS)
+    assert settings.warning_count == 0
+
+
+def test_run_inputs_with_no_inputs():
+    program = load_program("SET(R1, 5)", Settings())
+
+    assert run_inputs(program, Settings(), [], jobs=4, report=None) == []
+
+
+def test_inputs_with_missing_directory(capsys, program_path):
+    with pytest.raises(SystemExit) as e:
+        main(["--no-color", "--inputs", "does_not_exist", program_path])
+
+    assert e.value.code == 3
+    captured = capsys.readouterr()
+    assert 'Error: directory "does_not_exist" does not exist' in captured.err
+
+
+def test_jobs_requires_inputs(capsys):
+    with pytest.raises(SystemExit):
+        main(["-j", "4", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--jobs requires --inputs." in captured.err
+
+
+def test_jobs_takes_integer_argument(capsys):
+    with pytest.raises(SystemExit):
+        main(["--inputs", "dir", "--jobs", "many", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--jobs takes one integer argument." in captured.err
@@ -0,0 +1,186 @@
+import json
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS
+
+from hera.data import Settings
+from hera.loader import load_program_from_file
+from hera.main import main
+from hera.runner import STATUS_ERROR, STATUS_TIMED_OUT, find_programs, run_file
+from hera.vm import STEP_HALTED, STEP_THROTTLED, VirtualMachine
+
+
+LOOP_PROGRAM = "LABEL(top)\nINC(R1, 1)\nBR(top)\n"
+# Superinstructions in the middle of straight-line code, followed by a branch.
+CMP_PROGRAM = """\
+SET(R1, 3)
+SET(R2, 5)
+CMP(R1, R2)
+SET(R4, 7)
+INC(R5, 1)
+BL(done)
+SET(R6, 99)
+LABEL(done)
+SET(R7, 1)
+"""
+
+
+def run_batch_command(capsys, argv):
+    main(["batch"] + argv)
+    captured = capsys.readouterr()
+    assert captured.err == ""
+    return [json.loads(line) for line in captured.out.splitlines()]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_batch_matches_interpreter(capsys, jobs):
+    results = run_batch_command(capsys, ["-j", jobs, "--throttle=1000000"] + PROGRAMS)
+
+    assert [result["path"] for result in results] == PROGRAMS
+    for path, result in zip(PROGRAMS, results):
+        assert_matches_interpreter(capsys, path, result)
+
+
+def test_batch_with_optimize_matches_interpreter(capsys, tmp_path):
+    path = tmp_path / "cmp.hera"
+    path.write_text(CMP_PROGRAM)
+    paths = PROGRAMS + [str(path)]
+
+    results = run_batch_command(capsys, ["--optimize"] + paths)
+
+    assert [result["path"] for result in results] == paths
+    for path, result in zip(paths, results):
+        assert_matches_interpreter(capsys, path, result)
+    assert results[-1]["registers"][6] == 99
+    assert results[-1]["registers"][7] == 1
+
+
+def test_batch_reports_unexpected_errors_for_each_program(capsys, tmp_path):
+    bad = tmp_path / "bad.hera"
+    bad.write_text("SET(R1, 1)")
+    good = tmp_path / "good.hera"
+    good.write_text("SET(R1, 2)")
+
+    def load(path, settings):
+        if path == str(bad):
+            raise RuntimeError("something went wrong")
+        return load_program_from_file(path, settings)
+
+    with patch("hera.runner.load_program_from_file", load):
+        results = run_batch_command(capsys, ["-j", "1", str(bad), str(good)])
+
+    assert results[0]["status"] == STATUS_ERROR
+    assert "RuntimeError: something went wrong" in results[0]["stderr"]
+    assert results[1]["status"] == STEP_HALTED
+    assert results[1]["registers"][1] == 2
+
+
+def assert_matches_interpreter(capsys, path, result):
+    settings = Settings(color=False)
+    settings.throttle = 1000000
+    vm = VirtualMachine(settings)
+    with patch("sys.stdin", StringIO("")):
+        vm.run(load_program_from_file(path, settings))
+    captured = capsys.readouterr()
+
+    assert result["status"] == STEP_HALTED
+    assert result["registers"] == vm.registers
+    assert result["flags"]["carry_block"] == vm.flag_carry_block
+    assert result["flags"]["sign"] == vm.flag_sign
+    assert result["op_count"] == vm.op_count
+    assert result["stdout"] == captured.out
+    assert result["warnings"] == settings.warning_count + vm.warning_count
+
+
+def test_batch_with_throttle_and_timeout(capsys, tmp_path):
+    path = tmp_path / "loop.hera"
+    path.write_text(LOOP_PROGRAM)
+
+    [throttled] = run_batch_command(capsys, ["--throttle=500", str(path)])
+    [timed_out] = run_batch_command(capsys, ["--timeout=0.1", str(path)])
+
+    assert throttled["status"] == STEP_THROTTLED
+    assert throttled["op_count"] == 500
+    assert throttled["registers"][1] == 125
+    assert timed_out["status"] == STATUS_TIMED_OUT
+    assert timed_out["time"] >= 0.1
+    assert timed_out["op_count"] > 0
+
+
+def test_batch_with_errors(capsys, tmp_path):
+    path = tmp_path / "bad.hera"
+    path.write_text("SET(R1, 1)\nFOO(R1)\n")
+    warning = tmp_path / "warning.hera"
+    warning.write_text("SET(R1, 01)\n")
+
+    bad, missing, ok = run_batch_command(
+        capsys, [str(path), str(tmp_path / "missing.hera"), str(warning)]
+    )
+
+    assert bad["status"] == STATUS_ERROR
+    assert bad["registers"] is None
+    assert "unknown instruction `FOO`" in bad["stderr"]
+    assert missing["status"] == STATUS_ERROR
+    assert "does not exist" in missing["stderr"]
+    assert ok["status"] == STEP_HALTED
+    assert ok["registers"][1] == 1
+    assert ok["warnings"] == 1
+    assert 'Warning: consider using "0o" prefix' in ok["stderr"]
+
+
+def test_run_file_with_python_exception(tmp_path):
+    path = tmp_path / "main.hera"
+    path.write_text('SET(R1, 7)\n__eval("1 / 0")\n')
+
+    result = run_file(str(path), Settings(color=False))
+
+    assert result["status"] == STATUS_ERROR
+    assert result["registers"][1] == 7
+    assert "Python exception: division by zero" in result["stderr"]
+
+
+def test_find_programs(tmp_path):
+    for name in ["b.hera", "a.hera", "notes.txt"]:
+        (tmp_path / name).write_text("")
+
+    paths = find_programs([str(tmp_path), "main.hera"])
+
+    assert paths == [
+        str(tmp_path / "a.hera"),
+        str(tmp_path / "b.hera"),
+        "main.hera",
+    ]
+
+
+def test_batch_with_invalid_timeout(capsys):
+    with pytest.raises(SystemExit):
+        main(["batch", "--timeout", "0", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--timeout takes one positive number of seconds." in captured.err
+
+
+def test_timeout_requires_batch_mode(capsys):
+    with pytest.raises(SystemExit):
+        main(["--timeout", "1", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--timeout is not compatible with the chosen mode." in captured.err
+
+
+def test_batch_with_stdin(capsys):
+    with pytest.raises(SystemExit):
+        main(["batch", "main.hera", "-"])
+
+    captured = capsys.readouterr()
+    assert "Batch mode cannot read programs from standard input." in captured.err
+
+
+def test_too_many_paths_outside_batch_mode(capsys):
+    with pytest.raises(SystemExit):
+        main(["a.hera", "b.hera"])
+
+    captured = capsys.readouterr()
+    assert "Too many file paths supplied." in captured.err
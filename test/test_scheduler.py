@@ -0,0 +1,97 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state
+
+from hera.data import Settings
+from hera.loader import load_program, load_program_from_file
+from hera.scheduler import JOB_FAILED, Scheduler
+from hera.vm import STEP_HALTED, STEP_THROTTLED, VirtualMachine
+
+
+LOOP_PROGRAM = "LABEL(top)\nINC(R1, 1)\nBR(top)"
+
+
+def make_settings(throttle=10 ** 9):
+    settings = Settings(color=False)
+    settings.throttle = throttle
+    return settings
+
+
+@pytest.mark.parametrize("quantum", [1, 13, 10000])
+def test_scheduler_matches_individual_runs(capsys, quantum):
+    scheduler = Scheduler(quantum)
+    expected = []
+    for path in PROGRAMS:
+        settings = make_settings()
+        program = load_program_from_file(path, settings)
+        vm = VirtualMachine(settings)
+        with patch("sys.stdin", StringIO("hello\n")):
+            vm.run(program)
+        expected.append((vm, capsys.readouterr().out))
+
+        scheduler.add(program, make_settings(), stdin="hello\n", name=path)
+
+    jobs = scheduler.run()
+
+    assert [job.name for job in jobs] == PROGRAMS
+    for job, (expected_vm, expected_out) in zip(jobs, expected):
+        assert job.status == STEP_HALTED
+        assert_same_state(expected_vm, job.vm)
+        assert job.stdout.getvalue() == expected_out
+    assert capsys.readouterr().out == ""
+
+
+def test_scheduler_captures_output_of_each_program(capsys):
+    program = "SET(R1, {})\n__eval(\"print(vm.registers[1], end='')\")\n"
+    scheduler = Scheduler(1)
+    for i in range(3):
+        scheduler.add(load_program(program.format(i), Settings()))
+
+    jobs = scheduler.run()
+
+    assert [job.stdout.getvalue() for job in jobs] == ["0", "1", "2"]
+    assert capsys.readouterr().out == ""
+
+
+def test_scheduler_shares_time_fairly():
+    scheduler = Scheduler(100)
+    short = scheduler.add(load_program(LOOP_PROGRAM, Settings()), make_settings(500))
+    long = scheduler.add(load_program(LOOP_PROGRAM, Settings()), make_settings(2000))
+
+    scheduler.run()
+
+    assert short.status == long.status == STEP_THROTTLED
+    assert short.vm.op_count == 500
+    assert long.vm.op_count == 2000
+    assert short.turns == 5
+    assert long.turns == 20
+
+
+def test_scheduler_with_failed_program(capsys):
+    scheduler = Scheduler(10)
+    failed = scheduler.add(load_program('__eval("1 / 0")', Settings()), make_settings())
+    ok = scheduler.add(load_program("SET(R1, 42)", Settings()), make_settings())
+
+    scheduler.run()
+
+    assert failed.status == JOB_FAILED
+    assert failed.exit_code == 3
+    assert "Python exception: division by zero" in failed.stderr.getvalue()
+    assert ok.status == STEP_HALTED
+    assert ok.vm.registers[1] == 42
+    assert capsys.readouterr().err == ""
+
+
+def test_scheduler_warnings_are_counted_per_program():
+    scheduler = Scheduler(1)
+    warns = scheduler.add(load_program("SET(R15, 0xC001)", Settings()), make_settings())
+    quiet = scheduler.add(load_program("SET(R1, 1)", Settings()), make_settings())
+
+    scheduler.run()
+
+    assert "stack has overflowed" in warns.stderr.getvalue()
+    assert warns.vm.warning_count == 1
+    assert quiet.vm.warning_count == 0
+    assert quiet.stderr.getvalue() == ""
@@ -0,0 +1,268 @@
+import json
+import os
+import pytest
+import socket
+import stat
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from hera.data import Settings
+from hera.main import main
+from hera.runner import STATUS_ERROR, STATUS_TIMED_OUT
+from hera.server import STATUS_OK, Server, handle_request
+from hera.vm import STEP_HALTED, STEP_THROTTLED
+
+
+LOOP_PROGRAM = "LABEL(top)\nINC(R1, 1)\nBR(top)\n"
+
+CMP_PROGRAM = """\
+SET(R1, 3)
+SET(R2, 5)
+CMP(R1, R2)
+SET(R4, 7)
+INC(R5, 1)
+BL(done)
+SET(R6, 99)
+LABEL(done)
+SET(R7, 1)
+"""
+
+COUNTED_LOOP_PROGRAM = """\
+SET(R1, 1000)
+LABEL(top)
+INC(R2, 3)
+DEC(R1, 1)
+BNZ(top)
+SET(R7, 1)
+"""
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = Server(Settings(), jobs=2, allow_eval=True)
+    yield server
+    server.close()
+
+
+def serve(server, requests):
+    lines = [json.dumps(r) if isinstance(r, dict) else r for r in requests]
+    output = []
+    server.serve_stream(lines, output.append)
+    return [json.loads(line) for line in output]
+
+
+def serve_by_id(server, requests):
+    return {response["id"]: response for response in serve(server, requests)}
+
+
+def test_serve_run(server):
+    responses = serve_by_id(
+        server,
+        [
+            {"id": 1, "command": "run", "program": "SET(R1, 42)\nprint_reg(R1)"},
+            {
+                "id": 2,
+                "command": "run",
+                "program": '__eval("(vm.readline(), print(vm.input_buffer))")',
+                "stdin": "hello\n",
+            },
+        ],
+    )
+
+    assert responses[1]["status"] == STEP_HALTED
+    assert responses[1]["registers"][1] == 42
+    assert responses[1]["stdout"] == "R1 = 0x002a = 42 = '*'\n"
+    assert responses[2]["stdout"] == "hello\n"
+
+
+def test_serve_run_with_limits(server):
+    responses = serve_by_id(
+        server,
+        [
+            {"id": "t", "command": "run", "program": LOOP_PROGRAM, "throttle": 500},
+            {"id": "s", "command": "run", "program": LOOP_PROGRAM, "timeout": 0.1},
+        ],
+    )
+
+    assert responses["t"]["status"] == STEP_THROTTLED
+    assert responses["t"]["op_count"] == 500
+    assert responses["s"]["status"] == STATUS_TIMED_OUT
+    assert responses["s"]["time"] >= 0.1
+
+
+def test_serve_check(server):
+    responses = serve_by_id(
+        server,
+        [
+            {"id": 1, "command": "check", "program": "SET(R1, 01)"},
+            {"id": 2, "command": "check", "program": "FOO(R1)"},
+        ],
+    )
+
+    assert responses[1]["status"] == STATUS_OK
+    assert responses[1]["warnings"] == 1
+    assert 'Warning: consider using "0o" prefix' in responses[1]["stderr"]
+    assert responses[2]["status"] == STATUS_ERROR
+    assert "unknown instruction `FOO`" in responses[2]["stderr"]
+
+
+def test_serve_assemble_and_disassemble(server):
+    responses = serve_by_id(
+        server,
+        [
+            {"id": 1, "command": "assemble", "program": "INTEGER(5)\nSETLO(R1, 4)"},
+            {"id": 2, "command": "disassemble", "program": "e104\nzz"},
+        ],
+    )
+
+    assert responses[1]["status"] == STATUS_OK
+    assert responses[1]["code"] == ["e104"]
+    assert responses[1]["data"] == ["0005"]
+    assert responses[2]["program"] == ["SETLO(R1, 4)", "// Invalid hex literal: zz"]
+
+
+def test_serve_invalid_requests(server):
+    responses = serve(
+        server,
+        [
+            "not json",
+            "[1, 2]",
+            {"id": 1, "command": "frobnicate", "program": ""},
+            {"id": 2, "command": "run"},
+            {"id": 3, "command": "run", "program": "", "throttle": -5},
+        ],
+    )
+
+    assert [response["status"] for response in responses] == [STATUS_ERROR] * 5
+    assert responses[0]["error"] == "invalid JSON"
+    assert responses[1]["error"] == "request must be a JSON object"
+    assert responses[2]["error"] == "unknown command: frobnicate"
+    assert responses[3]["error"] == 'request must have a "program" string'
+    assert "throttle" in responses[4]["error"]
+
+
+def test_serve_with_default_limits():
+    settings = Settings()
+    settings.throttle = 100
+
+    response = handle_request({"command": "run", "program": LOOP_PROGRAM}, settings)
+
+    assert response["status"] == STEP_THROTTLED
+    assert response["op_count"] == 100
+    assert settings.warning_count == 0
+
+
+def test_serve_on_socket(server, tmp_path):
+    path = str(tmp_path / "hera.sock")
+    thread = threading.Thread(target=server.serve_socket, args=(path,))
+    thread.start()
+    try:
+        client = connect(path)
+        with client, client.makefile("rw") as f:
+            for i in range(3):
+                request = {"id": i, "command": "run", "program": "SET(R2, 7)"}
+                f.write(json.dumps(request) + "\n")
+                f.flush()
+                response = json.loads(f.readline())
+                assert response["id"] == i
+                assert response["registers"][2] == 7
+
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    finally:
+        server.shutdown()
+        thread.join()
+
+    assert not (tmp_path / "hera.sock").exists()
+
+
+def connect(path):
+    # The server thread may not have created the socket yet.
+    for _ in range(100):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+            return client
+        except OSError:
+            client.close()
+            threading.Event().wait(0.05)
+    raise AssertionError("could not connect to the server")
+
+
+def test_serve_command(capsys):
+    request = {"id": 1, "command": "run", "program": LOOP_PROGRAM}
+    with patch("sys.stdin", StringIO(json.dumps(request) + "\n")):
+        main(["serve", "-j", "1", "--throttle", "40"])
+
+    captured = capsys.readouterr()
+    [response] = [json.loads(line) for line in captured.out.splitlines()]
+    assert response["status"] == STEP_THROTTLED
+    assert response["op_count"] == 40
+
+
+def test_serve_command_with_optimize(capsys):
+    requests = [
+        {"id": 1, "command": "run", "program": CMP_PROGRAM},
+        {"id": 2, "command": "run", "program": COUNTED_LOOP_PROGRAM},
+    ]
+    lines = "".join(json.dumps(request) + "\n" for request in requests)
+    with patch("sys.stdin", StringIO(lines)):
+        main(["serve", "-j", "1", "--optimize"])
+
+    captured = capsys.readouterr()
+    responses = [json.loads(line) for line in captured.out.splitlines()]
+    responses = {response["id"]: response for response in responses}
+    assert responses[1]["status"] == STEP_HALTED
+    assert responses[1]["registers"][6] == 99
+    assert responses[1]["registers"][7] == 1
+    assert responses[2]["status"] == STEP_HALTED
+    assert responses[2]["registers"][2] == 3000
+    assert responses[2]["registers"][7] == 1
+    assert responses[2]["op_count"] == 5004
+
+
+def test_serve_disallows_eval_by_default(capsys):
+    request = {"id": 1, "command": "run", "program": '__eval("print(42)")'}
+    with patch("sys.stdin", StringIO(json.dumps(request) + "\n")):
+        main(["serve", "-j", "1"])
+
+    captured = capsys.readouterr()
+    [response] = [json.loads(line) for line in captured.out.splitlines()]
+    assert response["status"] == STATUS_ERROR
+    assert "__eval is disallowed without --allow-eval flag" in response["stderr"]
+    assert response["stdout"] == ""
+
+
+def test_serve_with_allow_eval(capsys):
+    request = {"id": 1, "command": "run", "program": '__eval("print(42)")'}
+    with patch("sys.stdin", StringIO(json.dumps(request) + "\n")):
+        main(["serve", "-j", "1", "--allow-eval"])
+
+    captured = capsys.readouterr()
+    [response] = [json.loads(line) for line in captured.out.splitlines()]
+    assert response["status"] == STEP_HALTED
+    assert response["stdout"] == "42\n"
+
+
+def test_allow_eval_requires_serve_mode(capsys):
+    with pytest.raises(SystemExit):
+        main(["--allow-eval", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--allow-eval is not compatible with the chosen mode." in captured.err
+
+
+def test_serve_with_file_path(capsys):
+    with pytest.raises(SystemExit):
+        main(["serve", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "Server mode does not take a file path." in captured.err
+
+
+def test_socket_requires_serve_mode(capsys):
+    with pytest.raises(SystemExit):
+        main(["--socket", "hera.sock", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--socket is not compatible with the chosen mode." in captured.err
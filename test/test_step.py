@@ -0,0 +1,143 @@
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from .utils import PROGRAMS, assert_same_state
+
+from hera.data import Settings
+from hera.loader import load_program, load_program_from_file
+from hera.optimizer import optimize
+from hera.vm import (
+    STEP_BUDGET_EXHAUSTED,
+    STEP_HALTED,
+    STEP_THROTTLED,
+    STEP_WAITING_FOR_INPUT,
+    VirtualMachine,
+)
+
+
+GETLINE_PROGRAM = "test/assets/cs350/getline.hera"
+
+
+def make_settings(throttle=10 ** 9):
+    settings = Settings()
+    settings.throttle = throttle
+    return settings
+
+
+@pytest.mark.parametrize("budget", [1, 7, 1000])
+@pytest.mark.parametrize("path", PROGRAMS)
+def test_step_matches_run(capsys, path, budget):
+    settings = make_settings()
+    program = load_program_from_file(path, settings)
+    expected_vm = VirtualMachine(settings)
+    with patch("sys.stdin", StringIO("hello\n")):
+        expected_vm.run(program)
+    expected_out = capsys.readouterr().out
+
+    vm = VirtualMachine(settings)
+    vm.start(program)
+    vm.feed_input("hello\n")
+    vm.close_input()
+    while vm.step(budget) == STEP_BUDGET_EXHAUSTED:
+        pass
+
+    assert_same_state(expected_vm, vm)
+    assert capsys.readouterr().out == expected_out
+
+
+def test_step_returns_when_budget_is_exhausted():
+    program = load_program("SET(R1, 10)\nLABEL(top)\nDEC(R1, 1)\nBNZ(top)", Settings())
+    vm = VirtualMachine()
+    vm.start(program)
+
+    assert vm.step(5) == STEP_BUDGET_EXHAUSTED
+    assert vm.op_count == 5
+    assert vm.step(5) == STEP_BUDGET_EXHAUSTED
+    assert vm.op_count == 10
+    assert vm.step(1000) == STEP_HALTED
+    assert vm.registers[1] == 0
+
+
+def test_step_with_halt():
+    program = load_program("SET(R1, 1)\nHALT()\nSET(R1, 2)", Settings())
+    vm = VirtualMachine()
+    vm.start(program)
+
+    assert vm.step(100) == STEP_HALTED
+    assert vm.halted
+    assert vm.step(100) == STEP_HALTED
+    assert vm.registers[1] == 1
+
+
+def test_step_with_throttle():
+    program = load_program("LABEL(top)\nINC(R1, 1)\nBR(top)", Settings())
+    vm = VirtualMachine(make_settings(throttle=20))
+    vm.start(program)
+
+    assert vm.step(15) == STEP_BUDGET_EXHAUSTED
+    assert vm.step(15) == STEP_THROTTLED
+    assert vm.op_count == 20
+
+
+def test_step_with_superinstructions():
+    program = load_program(
+        "SET(R1, 3)\nSET(R2, 5)\nCMP(R1, R2)\nINC(R5, 1)\nBL(done)\n"
+        + "SET(R6, 99)\nLABEL(done)\nSET(R7, 1)",
+        Settings(),
+    )
+    vm = VirtualMachine()
+    vm.start(optimize(program, Settings()))
+
+    assert vm.step(1000) == STEP_HALTED
+    assert vm.registers[6] == 99
+    assert vm.registers[7] == 1
+    assert vm.op_count == len(program.code)
+
+
+def test_step_waits_for_input():
+    program = load_program_from_file(GETLINE_PROGRAM, Settings())
+    vm = VirtualMachine()
+    vm.start(program)
+
+    assert vm.step(10 ** 6) == STEP_WAITING_FOR_INPUT
+    pc = vm.pc
+    assert vm.step(10 ** 6) == STEP_WAITING_FOR_INPUT
+    assert vm.pc == pc
+
+    vm.feed_input("hel")
+    assert vm.step(10 ** 6) == STEP_WAITING_FOR_INPUT
+    vm.feed_input("lo\nworld\n")
+    assert vm.step(10 ** 6) == STEP_HALTED
+
+    address = vm.registers[1]
+    assert vm.memory[address : address + 6] == [5] + [ord(c) for c in "hello"]
+    assert list(vm.input_lines) == ["world"]
+
+
+def test_step_counts_operations_when_waiting_for_input():
+    settings = make_settings()
+    program = load_program_from_file(GETLINE_PROGRAM, settings)
+    expected_vm = VirtualMachine(settings)
+    with patch("sys.stdin", StringIO("hello\n")):
+        expected_vm.run(program)
+
+    vm = VirtualMachine(settings)
+    vm.start(program)
+    assert vm.step(10 ** 6) == STEP_WAITING_FOR_INPUT
+    vm.feed_input("hello\n")
+    assert vm.step(10 ** 6) == STEP_HALTED
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_close_input():
+    program = load_program_from_file(GETLINE_PROGRAM, Settings())
+    vm = VirtualMachine()
+    vm.start(program)
+
+    vm.feed_input("no newline")
+    vm.close_input()
+
+    assert vm.step(10 ** 6) == STEP_HALTED
+    assert vm.input_buffer == "no newline"
@@ -0,0 +1,105 @@
+import json
+import pytest
+
+from .utils import assert_same_state, execute_program_helper
+
+from hera.data import Settings
+from hera.loader import load_program
+from hera.main import main
+from hera.tiered import HOT_THRESHOLD, TieredEngine
+from hera.vm import VirtualMachine
+
+
+LOOP_PROGRAM = """\
+SET(R1, 0)
+SET(R2, 200)
+LABEL(loop)
+  INC(R1, 1)
+  CMP(R1, R2)
+  BNZ(loop)
+SET(R3, 42)
+"""
+
+
+def run_tiered(program, settings=None):
+    settings = settings or Settings(color=False)
+    settings.engine = "tiered"
+    program = load_program(program, settings)
+    engine = TieredEngine(program, settings)
+    vm = VirtualMachine(settings)
+    vm.reset()
+    engine.run(vm)
+    return vm, engine
+
+
+def test_tiered_engine_compiles_hot_blocks_only():
+    vm, engine = run_tiered(LOOP_PROGRAM)
+
+    assert vm.registers[1] == 200
+    assert vm.registers[3] == 42
+    # The loop starts after the two SETs, which are four operations.
+    assert list(engine.jit.blocks) == [4]
+    assert engine.counts[4] == HOT_THRESHOLD
+
+
+def test_tiered_engine_does_not_compile_cold_code():
+    vm, engine = run_tiered(LOOP_PROGRAM.replace("200", "10"))
+
+    assert vm.registers[1] == 10
+    assert engine.jit.blocks == {}
+
+
+@pytest.mark.parametrize("throttle", ["299", "300", "301"])
+def test_tiered_engine_with_throttle(throttle):
+    flags = ["--throttle", throttle]
+    expected_vm = execute_program_helper(LOOP_PROGRAM, flags=flags)
+    vm = execute_program_helper(LOOP_PROGRAM, flags=["--engine=tiered"] + flags)
+
+    assert_same_state(expected_vm, vm)
+
+
+def test_profile_is_saved_and_loaded(tmp_path):
+    path = tmp_path / "loop.hera"
+    path.write_text(LOOP_PROGRAM)
+
+    main(["-q", "--engine=tiered", "--profile", str(path)])
+
+    profile_path = tmp_path / "loop.hera.hotness"
+    with open(str(profile_path)) as f:
+        profile = json.load(f)
+    assert profile["hot"] == [4]
+
+    settings = Settings(color=False)
+    settings.profile_path = str(profile_path)
+    program = load_program(LOOP_PROGRAM, settings)
+    engine = TieredEngine(program, settings)
+
+    assert list(engine.jit.blocks) == [4]
+
+
+def test_profile_for_a_different_program_is_ignored(tmp_path):
+    profile_path = tmp_path / "loop.hera.hotness"
+    profile_path.write_text('{"length": 3, "hot": [1]}')
+
+    settings = Settings(color=False)
+    settings.profile_path = str(profile_path)
+    program = load_program(LOOP_PROGRAM, settings)
+    engine = TieredEngine(program, settings)
+
+    assert engine.jit.blocks == {}
+
+
+def test_profile_flag_without_tiered_engine(capsys):
+    with pytest.raises(SystemExit):
+        main(["--profile", "main.hera"])
+
+    captured = capsys.readouterr()
+    assert "--profile requires --engine=tiered" in captured.err
+
+
+def test_profile_flag_with_stdin(capsys):
+    with pytest.raises(SystemExit):
+        execute_program_helper("NOP()", flags=["--engine=tiered", "--profile"])
+
+    captured = capsys.readouterr()
+    assert "--profile cannot be used with standard input" in captured.err
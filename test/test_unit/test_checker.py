@@ -444,6 +444,14 @@ def test_typecheck___eval():
     valid("__eval(\"print('hello')\")")
 
 
+def test_typecheck___intrinsic():
+    valid('__intrinsic("tiger_printint_reg")')
+
+
+def test_typecheck___intrinsic_with_unknown_function():
+    invalid('__intrinsic("print")', "unknown intrinsic")
+
+
 def test_typecheck_undefined_symbol():
     invalid("SET(R1, N)", "undefined constant")
 
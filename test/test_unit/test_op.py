@@ -5,6 +5,8 @@ from hera.op import (
     check_register,
     check_register_or_label,
     check_string,
+    ADD,
+    INC,
     SET,
 )
 
@@ -114,6 +116,17 @@ def test_check_in_range_with_valid_integers():
     assert check_in_range(SYM("n"), {"n": Constant(127)}, lo=0, hi=128) is None
 
 
+def test_op_with_ordinary_destination_is_not_specialized():
+    assert "execute" not in ADD(R(1), R(2), R(3)).__dict__
+    assert "execute" not in INC(R(14), INT(1)).__dict__
+
+
+def test_op_with_R0_or_R15_destination_is_specialized():
+    assert "execute" in ADD(R(0), R(2), R(3)).__dict__
+    assert "execute_lazy" in ADD(R(0), R(2), R(3)).__dict__
+    assert "execute" in INC(R(15), INT(1)).__dict__
+
+
 def R(i):
     return Token(Token.REGISTER, i)
 
@@ -1,3 +1,5 @@
+import pytest
+
 from .utils import execute_program_helper
 
 
@@ -30,6 +32,36 @@ Virtual machine state after execution (HERA v2.4.0):
     )
 
 
+@pytest.mark.parametrize("flags", [[], ["--lazy-flags"], ["--optimize"]])
+@pytest.mark.parametrize(
+    "op",
+    [
+        "ADD(SP, R1, R0)",
+        "ASR(SP, R1)",
+        "DEC(SP, 1)",
+        "SETHI(SP, 0xFF)",
+        "LOAD(SP, 0, R0)",
+    ],
+)
+def test_warning_for_stack_overflow_with_any_op(capsys, op, flags):
+    program = "SET(R1, 0xC002)\nSTORE(R1, 0, R0)\n" + op + "\nSET(R2, 0)"
+    execute_program_helper(program, flags=flags)
+
+    captured = capsys.readouterr().err
+    assert captured.count("stack has overflowed into data segment") == 1
+    assert "line 3" in captured
+
+
+@pytest.mark.parametrize("flags", [[], ["--lazy-flags"], ["--optimize"]])
+def test_writes_to_R0_are_discarded(flags):
+    program = "SET(R1, 5)\nSTORE(R1, 0, R0)\nSETLO(R0, 1)\nSETHI(R0, 1)\n"
+    program += "INC(R0, 1)\nDEC(R0, 1)\nADD(R0, R1, R1)\nLSL(R0, R1)\n"
+    program += "LOAD(R0, 0, R0)\nSAVEF(R0)\nSET(R2, 0)"
+    vm = execute_program_helper(program, flags=flags)
+
+    assert vm.registers[0] == 0
+
+
 def test_warning_for_zero_prefixed_octal(capsys):
     execute_program_helper("SET(R1, 016)\nSET(R2, 017)")
 
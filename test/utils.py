@@ -4,6 +4,30 @@ from unittest.mock import patch
 from hera.main import main
 
 
+# Sample programs to check the alternative execution engines and optimizations against
+# the interpreter.
+PROGRAMS = [
+    "test/assets/cs240/array.hera",
+    "test/assets/cs240/aslu.hera",
+    "test/assets/cs240/branches.hera",
+    "test/assets/cs240/call_and_return.hera",
+    "test/assets/cs240/extended_stein.hera",
+    "test/assets/cs240/factorial.hera",
+    "test/assets/cs240/fib.hera",
+    "test/assets/cs240/flag.hera",
+    "test/assets/cs240/stein.hera",
+    "test/assets/cs350/array_madness.hera",
+    "test/assets/cs350/div_and_print.hera",
+    "test/assets/cs350/getchar.hera",
+    "test/assets/cs350/getchar_ord.hera",
+    "test/assets/cs350/getline.hera",
+    "test/assets/cs350/getline_reg.hera",
+    "test/assets/cs350/lexical_scope_deep.hera",
+    "test/assets/cs350/merge_sort.hera",
+    "test/assets/cs350/record_trees.hera",
+]
+
+
 def execute_program_helper(program, *, flags=[]):
     with patch("sys.stdin", StringIO(program)):
         return main(flags + ["--no-color", "-"])
@@ -12,3 +36,16 @@ def execute_program_helper(program, *, flags=[]):
 def preprocess_program_helper(program):
     with patch("sys.stdin", StringIO(program)):
         main(["preprocess", "--no-color", "-"])
+
+
+def assert_same_state(vm1, vm2):
+    assert vm1.registers == vm2.registers
+    assert vm1.pc == vm2.pc
+    assert vm1.halted == vm2.halted
+    assert vm1.op_count == vm2.op_count
+    assert vm1.flag_sign == vm2.flag_sign
+    assert vm1.flag_zero == vm2.flag_zero
+    assert vm1.flag_overflow == vm2.flag_overflow
+    assert bool(vm1.flag_carry) == bool(vm2.flag_carry)
+    assert vm1.flag_carry_block == vm2.flag_carry_block
+    assert vm1.memory == vm2.memory